@@ -0,0 +1,250 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from metrics import trace_id_var, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+ASI_BASE_URL = os.getenv("VERITAS_ASI_BASE_URL", "https://api.asi1.ai/v1")
+ASI_TIMEOUT = float(os.getenv("VERITAS_ASI_TIMEOUT", "30"))
+# Connections kept open to the API, and requests allowed in flight at once.
+ASI_MAX_CONNECTIONS = int(os.getenv("VERITAS_ASI_MAX_CONNECTIONS", "8"))
+ASI_MAX_CONCURRENCY = int(os.getenv("VERITAS_ASI_MAX_CONCURRENCY", "8"))
+# Client-side rate limit: sustained requests per second and burst size (0 disables it).
+ASI_REQUESTS_PER_SECOND = float(os.getenv("VERITAS_ASI_REQUESTS_PER_SECOND", "5"))
+ASI_BURST = int(os.getenv("VERITAS_ASI_BURST", "10"))
+ASI_MAX_RETRIES = int(os.getenv("VERITAS_ASI_MAX_RETRIES", "4"))
+ASI_BACKOFF_BASE = float(os.getenv("VERITAS_ASI_BACKOFF_BASE", "0.5"))
+ASI_BACKOFF_MAX = float(os.getenv("VERITAS_ASI_BACKOFF_MAX", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RemoteAPIError(Exception):
+    """The remote chat API refused a request or kept failing after all retries."""
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_retry_after(value: str) -> float:
+    """Seconds to wait according to a Retry-After header (delay or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(attempt: int, response: httpx.Response = None, base: float = ASI_BACKOFF_BASE, maximum: float = ASI_BACKOFF_MAX) -> float:
+    """
+    Delay before retry number `attempt` (0-based): what the server asked for
+    in Retry-After if anything, otherwise exponential backoff with full jitter.
+    """
+    retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+    if retry_after is not None:
+        return retry_after + random.uniform(0, base)
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter for one event loop: `rate` requests per second
+    on average, bursts of up to `capacity`. `defer` blocks every caller until
+    a given delay has passed, e.g. after a 429.
+    """
+    def __init__(self, rate: float = ASI_REQUESTS_PER_SECOND, capacity: int = ASI_BURST):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def defer(self, delay: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            if self.rate <= 0:
+                return
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ASIClient:
+    """
+    Pooled client for the OpenAI-style chat completions API of ASI.
+
+    All requests go through one keep-alive `httpx.AsyncClient` that lives on
+    a private event loop thread, so connections are reused across pipeline
+    runs even though each run has its own event loop. Requests pass a token
+    bucket and a concurrency limit; 429s, transient 5xx and connection
+    errors are retried with jittered backoff, honouring Retry-After. Any
+    failure that survives the retries raises RemoteAPIError.
+    """
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = ASI_BASE_URL,
+        timeout: float = ASI_TIMEOUT,
+        max_connections: int = ASI_MAX_CONNECTIONS,
+        max_concurrency: int = ASI_MAX_CONCURRENCY,
+        requests_per_second: float = ASI_REQUESTS_PER_SECOND,
+        burst: int = ASI_BURST,
+        max_retries: int = ASI_MAX_RETRIES,
+        transport: httpx.AsyncBaseTransport = None
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.transport = transport
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="asi-client", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                transport=self.transport
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def _chat(self, message: str, system_prompt: str, model_name: str, trace_id: str = "-") -> str:
+        # Runs on the client's own loop, so take over the caller's trace id.
+        trace_id_var.set(trace_id)
+        client = self._ensure_client()
+        body = {
+            "model": model_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": message}
+            ],
+            "response_format": {"type": "text"}
+        }
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            response = None
+            try:
+                async with self._semaphore:
+                    self.stats["requests"] += 1
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post("/chat/completions", json=body)
+                    finally:
+                        STAGE_SECONDS.observe(time.perf_counter() - start, stage="asi_request")
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code < 400:
+                    return self._content(response)
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self.stats["failures"] += 1
+                    raise RemoteAPIError(f"ASI request rejected with {error}", response.status_code)
+
+            if attempt == self.max_retries:
+                break
+            delay = retry_delay(attempt, response)
+            if response is not None and response.status_code == 429:
+                # The limit is shared by every request, not only this one.
+                self.bucket.defer(delay)
+            self.stats["retries"] += 1
+            logger.warning(f"ASI request failed ({error}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        self.stats["failures"] += 1
+        raise RemoteAPIError(f"ASI request failed after {self.max_retries + 1} attempts: {error}",
+                             response.status_code if response is not None else None)
+
+    @staticmethod
+    def _content(response: httpx.Response) -> str:
+        try:
+            content = response.json()["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            raise RemoteAPIError(f"Unexpected ASI response: {response.text[:200]}", response.status_code)
+        if not content:
+            raise RemoteAPIError("ASI response holds no content", response.status_code)
+        return content
+
+    async def achat(self, message: str, system_prompt: str, model_name: str) -> str:
+        """Sends one chat request from any event loop. Cancelling it cancels the request."""
+        future = asyncio.run_coroutine_threadsafe(self._chat(message, system_prompt, model_name, trace_id_var.get()), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    def chat(self, message: str, system_prompt: str, model_name: str) -> str:
+        """Blocking form of `achat`."""
+        return asyncio.run_coroutine_threadsafe(self._chat(message, system_prompt, model_name, trace_id_var.get()), self._ensure_loop()).result()
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_asi_client(api_key: str) -> ASIClient:
+    """Process-wide ASI client, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ASIClient(api_key)
+        return _client
+
+
+def close_asi_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
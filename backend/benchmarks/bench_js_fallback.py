@@ -0,0 +1,91 @@
+"""
+Benchmark for the fallback JavaScript minifier on multi-megabyte inputs.
+
+Builds a synthetic bundle by repeating example_codes/pagerank_v2.js with a
+fresh set of identifiers per copy (as in a real bundle, the number of
+distinct names grows with the size) and times `minify_js_fallback_regex`.
+The previous per-identifier `re.sub` implementation is timed as well, up to
+--legacy-max-bytes, because it is quadratic.
+
+    python benchmarks/bench_js_fallback.py --sizes 1 4 8
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from minifier_code import JavaScriptVariableRenamer, minify_js_fallback_regex
+
+SAMPLE_PATH = os.path.join(BACKEND_DIR, "example_codes", "pagerank_v2.js")
+
+
+def legacy_minify(js_code: str) -> str:
+    """The former implementation: one re.sub over the whole source per identifier."""
+    renamer = JavaScriptVariableRenamer()
+    identifiers = set(re.findall(r'\b[a-zA-Z_$][a-zA-Z0-9_$]*\b', js_code))
+    mapping = {}
+    for identifier in sorted(identifiers):
+        if identifier not in renamer.reserved_words:
+            mapping[identifier] = renamer._get_new_name(identifier)
+    result = js_code
+    for old_name, new_name in mapping.items():
+        result = re.sub(r'\b' + re.escape(old_name) + r'\b', new_name, result)
+    result = re.sub(r'//.*?$', '', result, flags=re.MULTILINE)
+    result = re.sub(r'/\*.*?\*/', '', result, flags=re.DOTALL)
+    result = re.sub(r'\s+', ' ', result)
+    result = re.sub(r'\s*([{}();,=+\-*/&|!<>?:])\s*', r'\1', result)
+    return result.strip()
+
+
+def build_bundle(target_bytes: int) -> str:
+    with open(SAMPLE_PATH, "r") as f:
+        sample = f.read()
+    names = sorted(set(re.findall(r'\b[a-z][A-Za-z0-9_]*\b', sample)) - {
+        'function', 'const', 'let', 'for', 'in', 'of', 'if', 'return', 'while', 'length', 'keys', 'abs'
+    })
+    copies = []
+    size = 0
+    copy = 0
+    while size < target_bytes:
+        renamed = re.sub(r'\b(' + '|'.join(names) + r')\b', lambda m: f"{m.group(1)}_{copy}", sample)
+        copies.append(f"/* module {copy} */\n{renamed}")
+        size += len(copies[-1])
+        copy += 1
+    return "\n".join(copies)
+
+
+def time_call(func, source: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(source)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 8], help="Bundle sizes in MiB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-max-bytes", type=int, default=256 * 1024)
+    args = parser.parse_args()
+
+    for size_mib in args.sizes:
+        bundle = build_bundle(int(size_mib * 1024 * 1024))
+        seconds = time_call(minify_js_fallback_regex, bundle, args.repeat)
+        line = f"{len(bundle) / 1024 / 1024:6.2f} MiB: tokenizer {seconds:7.3f}s ({len(bundle) / 1024 / 1024 / seconds:5.2f} MiB/s)"
+        if len(bundle) <= args.legacy_max_bytes:
+            line += f", legacy {time_call(legacy_minify, bundle, 1):7.3f}s"
+        print(line)
+
+    small = build_bundle(args.legacy_max_bytes)
+    print(f"{len(small) / 1024:6.0f} KiB: tokenizer {time_call(minify_js_fallback_regex, small, args.repeat):7.3f}s, "
+          f"legacy {time_call(legacy_minify, small, 1):7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Micro-benchmarks for the extraction, obfuscation and scoring hot paths.
+
+Every benchmark runs over a synthetic corpus of N functions, built by
+repeating the functions of example_codes/ with fresh identifiers per copy,
+and reports functions per second (best of --repeat runs) and the peak
+memory allocated during one extra run under tracemalloc.
+
+Results can be saved as a JSON baseline and later runs compared against
+it; a benchmark whose throughput drops by more than --threshold is flagged
+and the exit status is 1.
+
+    python benchmarks/bench_suite.py --sizes 10 100 1000 --save
+    python benchmarks/bench_suite.py --sizes 10 100 1000 --threshold 0.15
+    python benchmarks/bench_suite.py --only minify_js_fallback --sizes 100000
+"""
+import os
+import re
+import ast
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+from function_boundaries import identify_function_boundaries_python, identify_function_boundaries_js
+from extract_functions import (
+    extract_functions_from_content_python, extract_functions_from_content_js, extract_functions_from_source,
+    _outermost_js_functions
+)
+from minifier_code import obfuscate_code, minify_js_fallback_regex
+from fingerprint import PackedFingerprint
+from main import hamming_distance, calculate_advanced_score, calculate_advanced_scores
+
+EXAMPLES_DIR = os.path.join(BACKEND_DIR, "example_codes")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = (10, 100, 1000)
+JS_KEYWORDS = {
+    'function', 'const', 'let', 'var', 'for', 'in', 'of', 'if', 'else', 'return', 'while', 'new',
+    'true', 'false', 'null', 'undefined', 'this', 'length', 'keys', 'abs', 'push', 'Math', 'Object'
+}
+
+
+def _rename(code: str, names: set, suffix: str) -> str:
+    if not names:
+        return code
+    pattern = re.compile(r'\b(' + '|'.join(sorted(map(re.escape, names), key=len, reverse=True)) + r')\b')
+    return pattern.sub(lambda m: f"{m.group(1)}_{suffix}", code)
+
+
+def python_samples() -> list[tuple[str, set]]:
+    """(source, names to rename) of every top-level function in the Python examples."""
+    samples = []
+    for filename in sorted(os.listdir(EXAMPLES_DIR)):
+        if not filename.endswith('.py'):
+            continue
+        with open(os.path.join(EXAMPLES_DIR, filename), 'r') as f:
+            source = f.read()
+        for node in ast.parse(source).body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                names = {node.name} | {arg.arg for arg in ast.walk(node) if isinstance(arg, ast.arg)}
+                names |= {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+                samples.append((ast.get_source_segment(source, node), names))
+    return samples
+
+
+def js_samples() -> list[tuple[str, set]]:
+    samples = []
+    for filename in sorted(os.listdir(EXAMPLES_DIR)):
+        if not filename.endswith('.js'):
+            continue
+        with open(os.path.join(EXAMPLES_DIR, filename), 'r') as f:
+            source = f.read()
+        for function in _outermost_js_functions(source):
+            code = function["fullText"]
+            samples.append((code, set(re.findall(r'\b[a-z][A-Za-z0-9_]*\b', code)) - JS_KEYWORDS))
+    return samples
+
+
+def build_corpus(samples: list[tuple[str, set]], functions: int) -> tuple[str, list[str]]:
+    """A source file of `functions` renamed copies of the samples, and the functions themselves."""
+    copies = [_rename(samples[i % len(samples)][0], samples[i % len(samples)][1], str(i // len(samples))) for i in range(functions)]
+    return "\n\n".join(copies) + "\n", copies
+
+
+def random_fingerprints(count: int, nbits: int, seed: int) -> list[PackedFingerprint]:
+    rng = np.random.default_rng(seed)
+    return [PackedFingerprint.from_bool_array(row) for row in rng.random((count, nbits)) < 0.5]
+
+
+# name -> (largest size it is run at by default, setup(size) returning the callable to time)
+BENCHMARKS = {}
+
+
+def benchmark(name: str, max_functions: int):
+    def register(setup):
+        BENCHMARKS[name] = (max_functions, setup)
+        return setup
+    return register
+
+
+@benchmark("boundaries_python", 100_000)
+def _(size):
+    source, _ = build_corpus(python_samples(), size)
+    return lambda: identify_function_boundaries_python(source)
+
+
+@benchmark("boundaries_js", 10_000)
+def _(size):
+    source, _ = build_corpus(js_samples(), size)
+    return lambda: identify_function_boundaries_js(source)
+
+
+@benchmark("extract_content_python", 100_000)
+def _(size):
+    source, _ = build_corpus(python_samples(), size)
+    return lambda: extract_functions_from_content_python(source)
+
+
+@benchmark("extract_content_js", 10_000)
+def _(size):
+    source, _ = build_corpus(js_samples(), size)
+    return lambda: extract_functions_from_content_js(source)
+
+
+@benchmark("extract_source_python", 100_000)
+def _(size):
+    source, _ = build_corpus(python_samples(), size)
+    return lambda: extract_functions_from_source(source, 'python')
+
+
+@benchmark("extract_source_js", 10_000)
+def _(size):
+    source, _ = build_corpus(js_samples(), size)
+    return lambda: extract_functions_from_source(source, 'javascript')
+
+
+@benchmark("obfuscate_python", 100_000)
+def _(size):
+    source, _ = build_corpus(python_samples(), size)
+    return lambda: obfuscate_code(source, 'python')
+
+
+@benchmark("obfuscate_js", 10_000)
+def _(size):
+    source, _ = build_corpus(js_samples(), size)
+    return lambda: obfuscate_code(source, 'javascript')
+
+
+@benchmark("minify_js_fallback", 100_000)
+def _(size):
+    source, _ = build_corpus(js_samples(), size)
+    return lambda: minify_js_fallback_regex(source)
+
+
+@benchmark("hamming_distance", 100_000)
+def _(size):
+    pairs = list(zip(random_fingerprints(size, 1024, 1), random_fingerprints(size, 1024, 2)))
+    return lambda: [hamming_distance(a, b) for a, b in pairs]
+
+
+# The score matrix holds size x size entries.
+@benchmark("advanced_score", 5_000)
+def _(size):
+    _, chunks = build_corpus(python_samples(), size)
+    fingerprints_a = random_fingerprints(size, 1024, 3)
+    # Every other function of B is a near-copy of A (5% of bits flipped), so
+    # the match selection has something to pick.
+    rng = np.random.default_rng(4)
+    fingerprints_b = [
+        PackedFingerprint.from_bool_array(fp.to_bool_array() ^ (rng.random(1024) < 0.05)) if i % 2 == 0 else other
+        for i, (fp, other) in enumerate(zip(fingerprints_a, random_fingerprints(size, 1024, 5)))
+    ]
+    return lambda: calculate_advanced_score(fingerprints_a, chunks, fingerprints_b, chunks)
+
+
+# One submission of `size` functions against 10 candidates of size / 10 functions each.
+@benchmark("advanced_scores_batch", 5_000)
+def _(size):
+    _, chunks = build_corpus(python_samples(), size)
+    fingerprints_a = random_fingerprints(size, 1024, 6)
+    fingerprints_b = random_fingerprints(size, 1024, 7)
+    step = max(1, size // 10)
+    candidates = [fingerprints_b[i:i + step] for i in range(0, size, step)]
+    return lambda: calculate_advanced_scores(fingerprints_a, chunks, candidates)
+
+
+def run_benchmark(name: str, size: int, repeat: int) -> dict:
+    run = BENCHMARKS[name][1](size)
+    run()  # warm-up: imports, caches, worker pools
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(timings)
+    return {
+        "functions": size,
+        "seconds": best,
+        "ops_per_sec": size / best if best > 0 else float("inf"),
+        "peak_bytes": peak
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Keys of the results whose throughput fell more than `threshold` below the baseline."""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference and result["ops_per_sec"] < reference["ops_per_sec"] * (1 - threshold):
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Corpus sizes in functions")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark and size")
+    parser.add_argument("--all-sizes", action="store_true", help="Ignore the per-benchmark size caps")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON baseline to compare with or save to")
+    parser.add_argument("--save", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative throughput drop flagged as a regression")
+    parser.add_argument("--output", help="Also write the results of this run as JSON")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    print(f"{'benchmark':<24}{'functions':>10}{'ops/sec':>14}{'seconds':>10}{'peak MiB':>10}{'vs base':>9}")
+    for name in args.only or BENCHMARKS:
+        max_functions = BENCHMARKS[name][0]
+        for size in args.sizes:
+            if size > max_functions and not args.all_sizes:
+                print(f"{name:<24}{size:>10}  skipped (cap {max_functions}, see --all-sizes)")
+                continue
+            key = f"{name}@{size}"
+            results[key] = result = run_benchmark(name, size, args.repeat)
+            change = ""
+            if key in baseline:
+                change = f"{result['ops_per_sec'] / baseline[key]['ops_per_sec'] - 1:+.0%}"
+            print(f"{name:<24}{size:>10}{result['ops_per_sec']:>14,.0f}{result['seconds']:>10.3f}"
+                  f"{result['peak_bytes'] / 1024 ** 2:>10.1f}{change:>9}")
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created_at": time.time(),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for key in regressions:
+        print(f"REGRESSION {key}: {results[key]['ops_per_sec']:,.0f} ops/sec vs baseline {baseline[key]['ops_per_sec']:,.0f} "
+              f"(more than {args.threshold:.0%} slower)", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,58 +1,146 @@
+import ast
 import esprima
 import json
+import logging
 from typing import List, Dict, Any
 
+from minifier_code import VariableRenamer, obfuscate_code, minify_js_fallback_regex
+
+logger = logging.getLogger(__name__)
+
+# Child fields of every esprima node type, in the order esprima's node
+# constructors assign them (source order). Scalar fields such as operators,
+# flags and literal values are left out, as are 'range' and 'loc'.
+JS_CHILD_FIELDS = {
+    'Program': ('body',),
+    'ArrayExpression': ('elements',),
+    'ArrayPattern': ('elements',),
+    'ArrowFunctionExpression': ('params', 'body'),
+    'AssignmentExpression': ('left', 'right'),
+    'AssignmentPattern': ('left', 'right'),
+    'AwaitExpression': ('argument',),
+    'BinaryExpression': ('left', 'right'),
+    'LogicalExpression': ('left', 'right'),
+    'BlockStatement': ('body',),
+    'BreakStatement': ('label',),
+    'CallExpression': ('callee', 'arguments'),
+    'CatchClause': ('param', 'body'),
+    'ClassBody': ('body',),
+    'ClassDeclaration': ('id', 'superClass', 'body'),
+    'ClassExpression': ('id', 'superClass', 'body'),
+    'ConditionalExpression': ('test', 'consequent', 'alternate'),
+    'ContinueStatement': ('label',),
+    'DebuggerStatement': (),
+    'DoWhileStatement': ('body', 'test'),
+    'EmptyStatement': (),
+    'ExportAllDeclaration': ('source',),
+    'ExportDefaultDeclaration': ('declaration',),
+    'ExportNamedDeclaration': ('declaration', 'specifiers', 'source'),
+    'ExportSpecifier': ('exported', 'local'),
+    'ExportDefaultSpecifier': ('local',),
+    'ExpressionStatement': ('expression',),
+    'FieldDefinition': ('key', 'value'),
+    'ForInStatement': ('left', 'right', 'body'),
+    'ForOfStatement': ('left', 'right', 'body'),
+    'ForStatement': ('init', 'test', 'update', 'body'),
+    'FunctionDeclaration': ('id', 'params', 'body'),
+    'FunctionExpression': ('id', 'params', 'body'),
+    'Identifier': (),
+    'IfStatement': ('test', 'consequent', 'alternate'),
+    'Import': (),
+    'ImportDeclaration': ('specifiers', 'source'),
+    'ImportDefaultSpecifier': ('local',),
+    'ImportNamespaceSpecifier': ('local',),
+    'ImportSpecifier': ('local', 'imported'),
+    'LabeledStatement': ('label', 'body'),
+    'Literal': (),
+    'MemberExpression': ('object', 'property'),
+    'MetaProperty': ('meta', 'property'),
+    'MethodDefinition': ('key', 'value'),
+    'NewExpression': ('callee', 'arguments'),
+    'ObjectExpression': ('properties',),
+    'ObjectPattern': ('properties',),
+    'Property': ('key', 'value'),
+    'RestElement': ('argument',),
+    'ReturnStatement': ('argument',),
+    'SequenceExpression': ('expressions',),
+    'SpreadElement': ('argument',),
+    'Super': (),
+    'SwitchCase': ('test', 'consequent'),
+    'SwitchStatement': ('discriminant', 'cases'),
+    'TaggedTemplateExpression': ('tag', 'quasi'),
+    'TemplateElement': (),
+    'TemplateLiteral': ('quasis', 'expressions'),
+    'ThisExpression': (),
+    'ThrowStatement': ('argument',),
+    'TryStatement': ('block', 'handler', 'finalizer'),
+    'UnaryExpression': ('argument',),
+    'UpdateExpression': ('argument',),
+    'VariableDeclaration': ('declarations',),
+    'VariableDeclarator': ('id', 'init'),
+    'WhileStatement': ('test', 'body'),
+    'WithStatement': ('object', 'body'),
+    'YieldExpression': ('argument',),
+}
+
+
 class JavaScriptFunctionVisitor:
     """
     A visitor class to traverse an Esprima AST and extract function info.
     
-    This pattern is inspired by Python's `ast.NodeVisitor` and is more
-    robust than a simple recursive walk function.
+    This pattern is inspired by Python's `ast.NodeVisitor`. The walk uses an
+    explicit stack instead of recursion, so deeply nested (e.g. minified)
+    code cannot hit the recursion limit, and looks children up in
+    JS_CHILD_FIELDS instead of reflecting over every attribute. With
+    `nested=False` the walk does not descend into a function once it has
+    been recorded, which is all the pipeline needs.
     """
-    def __init__(self, code_string: str):
+    def __init__(self, code_string: str, nested: bool = True):
         self.code_string: str = code_string
+        self.nested = nested
         self.functions: List[Dict[str, Any]] = []
-        self._context_stack: List[esprima.nodes.Node] = []
 
-    def visit(self, node: esprima.nodes.Node):
-        """Public entry point to begin traversal."""
-        if not node or not isinstance(node, esprima.nodes.Node):
-            return
-        
-        # Push current node to context stack
-        self._context_stack.append(node)
-        
-        # Dispatch to a specific visit method if it exists (e.g., visit_FunctionDeclaration)
-        method_name = f'visit_{node.type}'
-        visitor = getattr(self, method_name, self.generic_visit)
-        visitor(node)
-        
-        # Pop context after visiting node and its children
-        self._context_stack.pop()
+    @staticmethod
+    def iter_child_nodes(node: esprima.nodes.Node):
+        """Yields the direct children of `node` in source order."""
+        fields = JS_CHILD_FIELDS.get(node.type)
+        values = vars(node).values() if fields is None else (getattr(node, field, None) for field in fields)
+        for value in values:
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, esprima.nodes.Node):
+                        yield item
+            elif isinstance(value, esprima.nodes.Node):
+                yield value
 
-    def generic_visit(self, node: esprima.nodes.Node):
+    def visit(self, node: esprima.nodes.Node):
         """
-        Called if no specific visitor function exists for a node type.
-        This method is responsible for recursively visiting children.
+        Public entry point to begin traversal. Nodes are visited depth-first
+        in source order; a `visit_<type>` method that returns True marks a
+        recorded function, whose subtree is skipped unless `nested` is set.
         """
-        for value in vars(node).values():
-            if isinstance(value, list):
-                for item in value:
-                    self.visit(item)
-            else:
-                self.visit(value)
+        if not node or not isinstance(node, esprima.nodes.Node):
+            return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            visitor = getattr(self, f'visit_{node.type}', None)
+            if visitor is not None and visitor(node) and not self.nested:
+                continue
+            children = list(self.iter_child_nodes(node))
+            children.reverse()
+            stack.extend(children)
 
-    def visit_FunctionDeclaration(self, node: esprima.nodes.Node):
+    def visit_FunctionDeclaration(self, node: esprima.nodes.Node) -> bool:
         """Handles `function myFunction() {}` syntax."""
         self._extract_function_details(
             func_node=node,
             name=node.id.name if node.id else '(anonymous)',
             func_type=node.type
         )
-        # Continue traversal to find nested functions
-        self.generic_visit(node)
+        return True
 
-    def visit_VariableDeclarator(self, node: esprima.nodes.Node):
+    def visit_VariableDeclarator(self, node: esprima.nodes.Node) -> bool:
         """
         Handles function expressions and arrow functions assigned to variables,
         e.g., `const myFunc = function() {}` or `const myArrow = () => {}`.
@@ -60,11 +148,11 @@ class JavaScriptFunctionVisitor:
         if node.init and node.init.type in ['FunctionExpression', 'ArrowFunctionExpression']:
             self._extract_function_details(
                 func_node=node.init,
-                name=node.id.name,
+                name=getattr(node.id, 'name', '(pattern)'),
                 func_type=node.init.type
             )
-        # Continue traversal for other declarations or nested structures
-        self.generic_visit(node)
+            return True
+        return False
 
     def _extract_function_details(self, func_node: esprima.nodes.Node, name: str, func_type: str):
         """Helper to collect and store function information."""
@@ -81,8 +169,11 @@ class JavaScriptFunctionVisitor:
             'name': name,
             'type': func_type,
             'params': params,
-            'fullText': self.code_string[start:end]
+            'fullText': self.code_string[start:end],
+            'range': (start, end)
         }
+        if func_node.loc:
+            func_info['lines'] = (func_node.loc.start.line, func_node.loc.end.line)
         self.functions.append(func_info)
 
 
@@ -144,4 +235,84 @@ def extract_functions_from_content_python(content: str) -> list[str]:
     #     print(func)
     #     print("-" * 40)
         
-    return functions
\ No newline at end of file
+    return functions
+
+
+def _parse_js(code_string: str, options: dict):
+    """Parses as a script first and falls back to module syntax (import/export)."""
+    try:
+        return esprima.parseScript(code_string, options=options)
+    except esprima.Error:
+        return esprima.parseModule(code_string, options=options)
+
+
+def _outermost_js_functions(code_string: str, loc: bool = False) -> list:
+    """Functions found by the visitor that are not nested inside another one."""
+    visitor = JavaScriptFunctionVisitor(code_string, nested=False)
+    visitor.visit(_parse_js(code_string, {'range': True, 'loc': loc}))
+    return visitor.functions
+
+
+def extract_functions_from_source_python(code_string: str) -> list[dict]:
+    """
+    Single-pass extraction for one Python file: parses it once, renames
+    identifiers across the whole file with `VariableRenamer`, and unparses each
+    function on its own. Functions are the module-level ones and methods of
+    classes; functions nested inside another function stay part of it.
+    """
+    tree = ast.parse(code_string)
+    func_nodes = []
+    pending = [tree]
+    while pending:
+        for child in ast.iter_child_nodes(pending.pop()):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                func_nodes.append(child)
+            elif isinstance(child, ast.stmt):
+                pending.append(child)
+    func_nodes.sort(key=lambda node: node.lineno)
+
+    VariableRenamer().visit(tree)
+    return [{
+        'start_line': node.lineno,
+        'end_line': node.end_lineno,
+        'code': ast.unparse(node),
+        'language': 'python'
+    } for node in func_nodes]
+
+
+def extract_functions_from_source_js(code_string: str, minified: str = None) -> list[dict]:
+    """
+    Single-pass extraction for one JavaScript file. Line ranges come from the
+    original source; the code of each function comes from the minified file,
+    which keeps the function structure, so the n-th outermost function of
+    both parses is the same function. If the two disagree, each function is
+    renamed on its own with the pure-Python fallback instead. `minified` may
+    be passed in when the file was already minified as part of a batch.
+    """
+    functions = _outermost_js_functions(code_string, loc=True)
+    try:
+        if minified is None:
+            minified = obfuscate_code(code_string, language='javascript')
+        obfuscated = [func['fullText'] for func in _outermost_js_functions(minified)]
+    except Exception as e:
+        logger.warning(f"JavaScript minifier failed ({e}); renaming functions individually.")
+        obfuscated = []
+    if len(obfuscated) != len(functions):
+        obfuscated = [minify_js_fallback_regex(func['fullText']) for func in functions]
+    return [{
+        'start_line': func['lines'][0],
+        'end_line': func['lines'][1],
+        'code': code,
+        'language': 'javascript'
+    } for func, code in zip(functions, obfuscated)]
+
+
+def extract_functions_from_source(code_string: str, language: str, minified: str = None) -> list[dict]:
+    """
+    Extracts every function of one source file in a single pass. Each entry
+    holds the function's 1-indexed 'start_line'/'end_line' in the original
+    file, its obfuscated 'code' and its 'language'.
+    """
+    if language == 'python':
+        return extract_functions_from_source_python(code_string)
+    return extract_functions_from_source_js(code_string, minified)
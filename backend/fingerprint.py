@@ -0,0 +1,161 @@
+import base64
+import numpy as np
+
+# Number of set bits for every possible byte value, used when NumPy has no
+# native popcount (np.bitwise_count arrived in NumPy 2.0).
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+B64_PREFIX = "b64:"
+HEX_PREFIX = "hex:"
+HASH_FORMATS = ("bits", "string", "b64", "hex")
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """
+    Counts the set bits of every uint64 word in `words`.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    counts = POPCOUNT_TABLE[words.view(np.uint8)]
+    return counts.reshape(words.shape + (8,)).sum(axis=-1)
+
+
+class PackedFingerprint:
+    """
+    A sign-bit fingerprint stored eight bits per byte, most significant bit
+    first, so bit i matches character i of the legacy '0'/'1' string form.
+
+    The byte buffer is zero-padded to a whole number of 64-bit words, which
+    lets Hamming distance run as one XOR and popcount per word.
+    """
+    __slots__ = ("bytes", "nbits")
+
+    def __init__(self, packed: np.ndarray, nbits: int):
+        packed = np.asarray(packed, dtype=np.uint8).ravel()
+        padded_len = -(-len(packed) // 8) * 8
+        if padded_len != len(packed):
+            packed = np.concatenate([packed, np.zeros(padded_len - len(packed), dtype=np.uint8)])
+        self.bytes = packed
+        self.nbits = nbits
+
+    @classmethod
+    def from_bool_array(cls, bits: np.ndarray) -> "PackedFingerprint":
+        bits = np.asarray(bits, dtype=bool)
+        return cls(np.packbits(bits), len(bits))
+
+    @classmethod
+    def from_embedding(cls, embedding_vector: np.ndarray) -> "PackedFingerprint":
+        return cls.from_bool_array(np.asarray(embedding_vector) >= 0)
+
+    @classmethod
+    def from_bits(cls, bits: str) -> "PackedFingerprint":
+        """Builds a fingerprint from the legacy '0'/'1' string form."""
+        raw = np.frombuffer(bits.encode("ascii"), dtype=np.uint8)
+        if np.any((raw != ord("0")) & (raw != ord("1"))):
+            raise ValueError("Fingerprint string may only contain '0' and '1'")
+        return cls.from_bool_array(raw == ord("1"))
+
+    @classmethod
+    def from_wire(cls, value) -> "PackedFingerprint":
+        """
+        Accepts every form a fingerprint may arrive in: an existing
+        PackedFingerprint, a list of 0/1 integers, a '0'/'1' string, or the
+        compact "b64:<nbits>:<data>" / "hex:<nbits>:<data>" strings.
+        """
+        if isinstance(value, PackedFingerprint):
+            return value
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return cls.from_bool_array(np.asarray(value, dtype=np.uint8) != 0)
+        if not isinstance(value, str):
+            raise TypeError(f"Unsupported fingerprint type: {type(value).__name__}")
+        if value.startswith((B64_PREFIX, HEX_PREFIX)):
+            prefix, nbits, data = value.split(":", 2)
+            nbits = int(nbits)
+            raw = base64.b64decode(data) if prefix + ":" == B64_PREFIX else bytes.fromhex(data)
+            if len(raw) != -(-nbits // 8):
+                raise ValueError(f"Packed fingerprint holds {len(raw)} bytes, expected {-(-nbits // 8)} for {nbits} bits")
+            return cls(np.frombuffer(raw, dtype=np.uint8), nbits)
+        return cls.from_bits(value)
+
+    @property
+    def words(self) -> np.ndarray:
+        """The padded buffer viewed as uint64 words, for word-parallel popcount."""
+        return self.bytes.view(np.uint64)
+
+    def _payload(self) -> bytes:
+        return self.bytes[:-(-self.nbits // 8)].tobytes()
+
+    def to_bool_array(self) -> np.ndarray:
+        return np.unpackbits(self.bytes, count=self.nbits).astype(bool)
+
+    def to_bits(self) -> str:
+        return (np.unpackbits(self.bytes, count=self.nbits) + ord("0")).tobytes().decode("ascii")
+
+    def to_bit_list(self) -> list[int]:
+        return np.unpackbits(self.bytes, count=self.nbits).tolist()
+
+    def to_base64(self) -> str:
+        return f"{B64_PREFIX}{self.nbits}:{base64.b64encode(self._payload()).decode('ascii')}"
+
+    def to_hex(self) -> str:
+        return f"{HEX_PREFIX}{self.nbits}:{self._payload().hex()}"
+
+    def hamming(self, other: "PackedFingerprint") -> int:
+        """Number of differing bits; callers must check the lengths match."""
+        return int(popcount(np.bitwise_xor(self.words, other.words)).sum())
+
+    def __len__(self) -> int:
+        return self.nbits
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PackedFingerprint):
+            return NotImplemented
+        return self.nbits == other.nbits and np.array_equal(self.bytes, other.bytes)
+
+    def __hash__(self) -> int:
+        return hash((self.nbits, self.bytes.tobytes()))
+
+    def __repr__(self) -> str:
+        return f"PackedFingerprint(nbits={self.nbits}, {self._payload()[:8].hex()}...)"
+
+
+def stack_fingerprints(fingerprints: list) -> np.ndarray:
+    """
+    Stacks fingerprints of equal length into one contiguous (n, words) uint64 matrix.
+    """
+    if not fingerprints:
+        return np.empty((0, 0), dtype=np.uint64)
+    return np.vstack([fp.words for fp in fingerprints])
+
+
+def pairwise_hamming(words_a: np.ndarray, words_b: np.ndarray, max_block_words: int = 1 << 22) -> np.ndarray:
+    """
+    All-pairs Hamming distances between the rows of two packed matrices,
+    computed as one XOR and popcount pass. Rows of `words_a` are processed in
+    blocks so the temporary XOR buffer stays under `max_block_words` words.
+    """
+    n, m = len(words_a), len(words_b)
+    distances = np.empty((n, m), dtype=np.int64)
+    if n == 0 or m == 0:
+        return distances
+    block = max(1, max_block_words // max(1, m * words_a.shape[1]))
+    for start in range(0, n, block):
+        xor = np.bitwise_xor(words_a[start:start + block, None, :], words_b[None, :, :])
+        distances[start:start + block] = popcount(xor).sum(axis=-1, dtype=np.int64)
+    return distances
+
+
+def serialize_fingerprint(fingerprint: PackedFingerprint, hash_format: str = "bits"):
+    """
+    Converts a fingerprint to its wire form: "bits" (list of 0/1 integers, the
+    original /analyze-zip/ format), "string" ('0'/'1' text), "b64" or "hex".
+    """
+    if hash_format == "bits":
+        return fingerprint.to_bit_list()
+    if hash_format == "string":
+        return fingerprint.to_bits()
+    if hash_format == "b64":
+        return fingerprint.to_base64()
+    if hash_format == "hex":
+        return fingerprint.to_hex()
+    raise ValueError(f"Unknown hash format '{hash_format}', expected one of {HASH_FORMATS}")
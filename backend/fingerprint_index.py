@@ -0,0 +1,223 @@
+import os
+import json
+import threading
+from collections import defaultdict
+import numpy as np
+
+from fingerprint import PackedFingerprint, stack_fingerprints, pairwise_hamming
+
+# --- CONFIGURATION ---
+INDEX_PATH = os.getenv("VERITAS_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "fingerprint_index.npz"))
+
+# Each band samples BAND_BITS fingerprint bits; two functions whose raw bit
+# similarity is s collide in one band with probability s ** BAND_BITS. With
+# 32 bands of 16 bits a pair at 90% similarity is found with ~99.9% chance,
+# while random pairs (50%) almost never share a bucket.
+NUM_BANDS = 32
+BAND_BITS = 16
+# Multi-probe: each band is also looked up with up to this many of its bits
+# flipped. With one flip a pair at 80% similarity shares a probed bucket in a
+# band with chance s**16 + 16 * s**15 * (1 - s) = 14% instead of 2.8%, so it
+# is found with ~99% chance over 32 bands instead of ~60%.
+PROBE_FLIPS = 1
+
+
+class FingerprintIndex:
+    """
+    Sub-linear near-neighbour index over registered function fingerprints.
+
+    Fingerprints are bucketed with bit-sampling LSH: every band hashes a fixed
+    random subset of bit positions, so similar fingerprints share a bucket in
+    at least one band with high probability; buckets one bit flip away are
+    probed too. Query candidates are then ranked by their exact Hamming
+    distance. All fingerprints in one index must have the same number of
+    bits; the first insert fixes it.
+    """
+    def __init__(self, num_bands: int = NUM_BANDS, band_bits: int = BAND_BITS, seed: int = 0, probe_flips: int = PROBE_FLIPS):
+        if not 0 < band_bits <= 64:
+            raise ValueError("band_bits must be between 1 and 64 so bucket keys fit in one word")
+        if probe_flips not in (0, 1):
+            raise ValueError("probe_flips must be 0 or 1")
+        self.num_bands = num_bands
+        self.band_bits = band_bits
+        self.seed = seed
+        self.probe_flips = probe_flips
+        self.nbits = None
+        self.band_positions = None
+        self._probe_masks = ()
+        self.entries = []  # (submission_id, function_index) for every stored row
+        self.submissions = {}  # submission_id -> number of functions
+        self._words = np.empty((0, 0), dtype=np.uint64)
+        self._size = 0
+        self._tables = [defaultdict(list) for _ in range(num_bands)]
+        self._lock = threading.RLock()
+        # Bumped by every add; `save_if_changed` compares it with the last snapshot.
+        self._version = 0
+        self._saved_version = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _init_bands(self, nbits: int):
+        rng = np.random.default_rng(self.seed)
+        self.nbits = nbits
+        self.band_positions = np.stack([
+            np.sort(rng.choice(nbits, size=min(self.band_bits, nbits), replace=False))
+            for _ in range(self.num_bands)
+        ])
+        # Key bit of each sampled position: packbits puts the first one in the
+        # most significant bit of the (byte-padded) key.
+        sampled = self.band_positions.shape[1]
+        padded = 8 * -(-sampled // 8)
+        self._probe_masks = tuple(1 << (padded - 1 - j) for j in range(sampled)) if self.probe_flips else ()
+
+    def _band_keys(self, words: np.ndarray) -> np.ndarray:
+        """(n, num_bands) array of bucket keys for packed fingerprint rows."""
+        bits = np.unpackbits(words.view(np.uint8), axis=1, count=self.nbits)
+        sampled = bits[:, self.band_positions]  # (n, num_bands, band_bits)
+        packed = np.packbits(sampled, axis=2)
+        keys = np.zeros(packed.shape[:2], dtype=np.uint64)
+        for byte in range(packed.shape[2]):
+            keys = (keys << np.uint64(8)) | packed[:, :, byte].astype(np.uint64)
+        return keys
+
+    def _append_rows(self, words: np.ndarray):
+        needed = self._size + len(words)
+        if needed > len(self._words):
+            capacity = max(needed, 2 * len(self._words), 64)
+            grown = np.zeros((capacity, words.shape[1]), dtype=np.uint64)
+            if self._size:
+                grown[:self._size] = self._words[:self._size]
+            self._words = grown
+        self._words[self._size:needed] = words
+        self._size = needed
+
+    def add(self, submission_id: str, fingerprints: list) -> int:
+        """
+        Registers the functions of one submission. Returns the number of
+        fingerprints added.
+        """
+        fingerprints = [PackedFingerprint.from_wire(fp) for fp in fingerprints]
+        with self._lock:
+            if submission_id in self.submissions:
+                raise ValueError(f"Submission '{submission_id}' is already indexed")
+            if not fingerprints:
+                self.submissions[submission_id] = 0
+                return 0
+            if self.nbits is None:
+                self._init_bands(len(fingerprints[0]))
+            if any(len(fp) != self.nbits for fp in fingerprints):
+                raise ValueError(f"Index holds {self.nbits}-bit fingerprints")
+
+            words = stack_fingerprints(fingerprints)
+            first_row = self._size
+            self._append_rows(words)
+            for offset, keys in enumerate(self._band_keys(words).tolist()):
+                for band, key in enumerate(keys):
+                    self._tables[band][key].append(first_row + offset)
+            self.entries.extend((submission_id, i) for i in range(len(fingerprints)))
+            self.submissions[submission_id] = len(fingerprints)
+            self._version += 1
+            return len(fingerprints)
+
+    def _candidates(self, keys: list) -> np.ndarray:
+        """Rows sharing a bucket, or a bucket one flip away, with one query's band keys."""
+        rows = set()
+        for band, key in enumerate(keys):
+            table = self._tables[band]
+            rows.update(table.get(key, ()))
+            for mask in self._probe_masks:
+                rows.update(table.get(key ^ mask, ()))
+        return np.fromiter(rows, dtype=np.int64, count=len(rows))
+
+    def _rank(self, fingerprint: PackedFingerprint, rows: np.ndarray) -> list[dict]:
+        distances = pairwise_hamming(fingerprint.words[None, :], self._words[rows])[0]
+        order = np.lexsort((rows, distances))
+        return [{
+            "submission_id": self.entries[row][0],
+            "function_index": self.entries[row][1],
+            "distance": int(dist),
+            "similarity": 1.0 - dist / self.nbits
+        } for row, dist in zip(rows[order].tolist(), distances[order].tolist())]
+
+    def search_many(self, fingerprints: list, radius: int = None, top_k: int = None, exact: bool = False) -> list[list[dict]]:
+        """
+        Finds stored functions near each of `fingerprints`, closest first.
+
+        `radius` keeps hits within that Hamming distance and `top_k` caps the
+        number returned per query. The LSH lookup may miss distant
+        neighbours (see PROBE_FLIPS); only with `exact` is the whole index
+        scanned instead, which costs O(N) per query.
+        """
+        fingerprints = [PackedFingerprint.from_wire(fp) for fp in fingerprints]
+        with self._lock:
+            if self._size == 0:
+                return [[] for _ in fingerprints]
+            comparable = [i for i, fp in enumerate(fingerprints) if len(fp) == self.nbits]
+            keys = self._band_keys(stack_fingerprints([fingerprints[i] for i in comparable])).tolist() if comparable and not exact else None
+            results = [[] for _ in fingerprints]
+            for position, i in enumerate(comparable):
+                rows = np.arange(self._size) if exact else self._candidates(keys[position])
+                hits = self._rank(fingerprints[i], rows)
+                if radius is not None:
+                    hits = [hit for hit in hits if hit["distance"] <= radius]
+                results[i] = hits[:top_k] if top_k is not None else hits
+            return results
+
+    def search(self, fingerprint, radius: int = None, top_k: int = None, exact: bool = False) -> list[dict]:
+        """Single-query form of `search_many`."""
+        return self.search_many([fingerprint], radius, top_k, exact)[0]
+
+    def save(self, path: str = INDEX_PATH):
+        """
+        Writes a snapshot atomically; the LSH tables are rebuilt on load.
+        Only copying the state holds the lock, so searches and inserts go on
+        while the file is compressed and written.
+        """
+        with self._lock:
+            meta = json.dumps({
+                "num_bands": self.num_bands,
+                "band_bits": self.band_bits,
+                "seed": self.seed,
+                "probe_flips": self.probe_flips,
+                "nbits": self.nbits,
+                "entries": self.entries,
+                "submissions": self.submissions
+            })
+            words = self._words[:self._size].copy()
+            version = self._version
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, words=words, meta=np.array(meta))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._saved_version = max(self._saved_version, version)
+
+    def save_if_changed(self, path: str = INDEX_PATH) -> bool:
+        """Saves a snapshot if anything was added since the last one."""
+        with self._lock:
+            if self._version == self._saved_version:
+                return False
+        self.save(path)
+        return True
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> "FingerprintIndex":
+        with np.load(path) as snapshot:
+            meta = json.loads(str(snapshot["meta"]))
+            words = snapshot["words"]
+        index = cls(num_bands=meta["num_bands"], band_bits=meta["band_bits"], seed=meta["seed"], probe_flips=meta.get("probe_flips", PROBE_FLIPS))
+        if meta["nbits"] is not None:
+            index._init_bands(meta["nbits"])
+            index._append_rows(words)
+            for row, keys in enumerate(index._band_keys(words).tolist()):
+                for band, key in enumerate(keys):
+                    index._tables[band][key].append(row)
+        index.entries = [tuple(entry) for entry in meta["entries"]]
+        index.submissions = meta["submissions"]
+        return index
+
+    @classmethod
+    def load_or_create(cls, path: str = INDEX_PATH) -> "FingerprintIndex":
+        return cls.load(path) if os.path.exists(path) else cls()
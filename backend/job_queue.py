@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import sqlite3
+import logging
+import threading
+
+from metrics import trace_id_var, stage_timer
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+JOBS_DIR = os.getenv("VERITAS_JOBS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs"))
+JOB_WORKERS = int(os.getenv("VERITAS_JOB_WORKERS", "2"))
+JOB_QUEUE_LIMIT = int(os.getenv("VERITAS_JOB_QUEUE_LIMIT", "32"))
+JOB_RETENTION_SECONDS = int(os.getenv("VERITAS_JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+# Running jobs are refreshed by their process this often; a running job whose
+# heartbeat is older than JOB_STALE_SECONDS belonged to a process that died
+# and is queued again.
+JOB_HEARTBEAT_SECONDS = float(os.getenv("VERITAS_JOB_HEARTBEAT_SECONDS", "10"))
+JOB_STALE_SECONDS = float(os.getenv("VERITAS_JOB_STALE_SECONDS", "60"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised by `JobQueue.submit` when the configured queue limit is reached."""
+
+
+class JobQueue:
+    """
+    Persistent queue of analysis jobs served by a pool of worker threads.
+
+    Job metadata lives in SQLite and every job gets a directory holding its
+    uploaded archive and, once finished, its result. Several processes may
+    share one jobs directory: a running job records the queue that owns it
+    and a heartbeat, and is only queued again once its heartbeat is stale,
+    so jobs of a process that died (or was restarted) are picked up again
+    while those of live processes are left alone. `handler(job_dir, params)`
+    does the actual work and returns a JSON-serialisable result.
+    """
+    def __init__(self, handler, jobs_dir: str = JOBS_DIR, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_LIMIT,
+                 heartbeat_seconds: float = JOB_HEARTBEAT_SECONDS, stale_seconds: float = JOB_STALE_SECONDS):
+        self.handler = handler
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.max_queued = max_queued
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._threads = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Condition()
+        self._lock = threading.Lock()
+
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(jobs_dir, "jobs.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                owner TEXT,
+                heartbeat_at REAL
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def _execute(self, sql: str, args: tuple = ()):
+        with self._lock:
+            return self._conn.execute(sql, args)
+
+    def _query(self, sql: str, args: tuple = ()) -> list:
+        # Rows are fetched under the lock: a half-read cursor keeps its read
+        # snapshot open, and a BEGIN IMMEDIATE issued by another thread on the
+        # shared connection then fails at once instead of waiting its turn.
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def _transaction(self, body):
+        """Runs `body(conn)` in one BEGIN IMMEDIATE transaction, which holds SQLite's write lock across processes."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = body(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, job_id)
+
+    def requeue_stale(self) -> int:
+        """Queues again the running jobs whose owner stopped sending heartbeats."""
+        requeued = self._execute(
+            "UPDATE jobs SET status = ?, started_at = NULL, owner = NULL, heartbeat_at = NULL "
+            "WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (QUEUED, RUNNING, time.time() - self.stale_seconds)
+        ).rowcount
+        if requeued:
+            logger.info(f"Re-queued {requeued} job(s) whose worker stopped")
+        return requeued
+
+    def _heartbeat(self):
+        while not self._stopping.wait(self.heartbeat_seconds):
+            self._execute("UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND owner = ?", (time.time(), RUNNING, self.owner))
+            self.requeue_stale()
+
+    def start(self):
+        """Re-queues jobs of dead workers, drops expired ones and starts the workers."""
+        self.requeue_stale()
+        expired = self._query(
+            "SELECT id FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (SUCCEEDED, FAILED, time.time() - JOB_RETENTION_SECONDS)
+        )
+        for (job_id,) in expired:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+            self._execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+        self._stopping.clear()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stops the workers after their current job. A job still running when
+        the process exits is queued again once its heartbeat goes stale.
+        """
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def queued_count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,))[0][0]
+
+    def submit(self, params: dict, files: dict = None) -> str:
+        """
+        Creates a job. `files` maps file names to readable binary file objects
+        that are copied into the job directory before the job is queued.
+        The limit is checked and the job inserted in one transaction, so
+        concurrent submits (from any process) cannot overshoot it.
+        """
+        full = QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+        # Cheap early rejection before copying the upload.
+        if self.queued_count() >= self.max_queued:
+            raise full
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        for name, source in (files or {}).items():
+            with open(os.path.join(self.job_dir(job_id), name), "wb") as target:
+                shutil.copyfileobj(source, target)
+
+        def insert(conn):
+            if conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0] >= self.max_queued:
+                raise full
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), time.time())
+            )
+        try:
+            self._transaction(insert)
+        except QueueFullError:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+            raise
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str):
+        """Status record of a job, or None if it does not exist."""
+        rows = self._query(
+            "SELECT id, status, params, error, created_at, started_at, finished_at FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not rows:
+            return None
+        job = dict(zip(("job_id", "status", "params", "error", "created_at", "started_at", "finished_at"), rows[0]))
+        job["params"] = json.loads(job["params"])
+        if job["status"] == QUEUED:
+            job["queue_position"] = self._query(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?", (QUEUED, job["created_at"])
+            )[0][0]
+        return job
+
+    def result(self, job_id: str):
+        """Result of a succeeded job, or None when it has none (yet)."""
+        path = os.path.join(self.job_dir(job_id), "result.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _claim_next(self):
+        """Atomically moves the oldest queued job to running; safe across processes."""
+        while True:
+            rows = self._query(
+                "SELECT id, params FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            )
+            if not rows:
+                return None
+            row = rows[0]
+            now = time.time()
+            claimed = self._execute(
+                "UPDATE jobs SET status = ?, started_at = ?, owner = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, now, self.owner, now, row[0], QUEUED)
+            ).rowcount
+            if claimed:
+                return row[0], json.loads(row[1])
+
+    def _work(self):
+        while not self._stopping.is_set():
+            claimed = self._claim_next()
+            if claimed is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=1.0)
+                continue
+            job_id, params = claimed
+            # Everything logged while the job runs carries its id.
+            trace_id_var.set(job_id)
+            logger.info(f"Job {job_id} started")
+            try:
+                with stage_timer("job"):
+                    result = self.handler(self.job_dir(job_id), params)
+                tmp_path = os.path.join(self.job_dir(job_id), "result.json.tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(result, f)
+                os.replace(tmp_path, os.path.join(self.job_dir(job_id), "result.json"))
+                self._finish(job_id, SUCCEEDED)
+                logger.info(f"Job {job_id} succeeded")
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {str(e)}")
+                self._finish(job_id, FAILED, str(e))
+
+    def _finish(self, job_id: str, status: str, error: str = None):
+        # Only while this queue still owns the job: if its heartbeat went
+        # stale and another worker took it over, that worker reports it.
+        finished = self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = ? AND owner = ?",
+            (status, error, time.time(), job_id, RUNNING, self.owner)
+        ).rowcount
+        if not finished:
+            logger.warning(f"Job {job_id} was taken over by another worker; not recording its {status} status")
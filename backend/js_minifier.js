@@ -2,92 +2,148 @@ const babel = require('@babel/parser');
 const traverse = require('@babel/traverse').default;
 const generate = require('@babel/generator').default;
 
-// Read input from stdin
-let input = '';
-process.stdin.setEncoding('utf8');
-process.stdin.on('readable', () => {
-    const chunk = process.stdin.read();
-    if (chunk !== null) {
-        input += chunk;
+// Minifies one source file. Names are handed out per call, so every file
+// starts again from 'a' exactly like the Python VariableRenamer.
+function minify(input) {
+    // Parse JavaScript code
+    const ast = babel.parse(input, {
+        sourceType: 'module',
+        allowImportExportEverywhere: true,
+        plugins: ['jsx', 'typescript']
+    });
+    
+    // Variable renaming logic (matching Python implementation)
+    const nameMapping = new Map();
+    let counter = 0;
+    const reservedWords = new Set([
+        'var', 'let', 'const', 'function', 'return', 'if', 'else', 'for', 
+        'while', 'do', 'break', 'continue', 'switch', 'case', 'default',
+        'try', 'catch', 'finally', 'throw', 'new', 'this', 'typeof',
+        'instanceof', 'in', 'delete', 'void', 'null', 'undefined', 'true', 'false',
+        'console', 'log', 'length', 'push', 'pop', 'slice', 'splice',
+        'Object', 'Array', 'String', 'Number', 'Boolean', 'Math', 'Date',
+        'JSON', 'parseInt', 'parseFloat', 'isNaN', 'isFinite',
+        'setTimeout', 'setInterval', 'clearTimeout', 'clearInterval'
+    ]);
+    // Never handed out as new names (JS_KEYWORDS in minifier_code.py).
+    const jsKeywords = new Set([
+        'async', 'await', 'class', 'debugger', 'enum', 'export', 'extends', 'from', 'get',
+        'import', 'let', 'of', 'set', 'static', 'super', 'with', 'yield', 'arguments',
+        'NaN', 'Infinity', 'globalThis', 'window', 'document', 'require', 'module', 'exports'
+    ]);
+    
+    function counterToName(counter) {
+        let result = "";
+        while (true) {
+            result = String.fromCharCode(97 + (counter % 26)) + result;
+            counter = Math.floor(counter / 26);
+            if (counter === 0) break;
+            counter -= 1;
+        }
+        return result;
     }
-});
-
-process.stdin.on('end', () => {
-    try {
-        // Parse JavaScript code
-        const ast = babel.parse(input, {
-            sourceType: 'module',
-            allowImportExportEverywhere: true,
-            plugins: ['jsx', 'typescript']
-        });
-        
-        // Variable renaming logic (matching Python implementation)
-        const nameMapping = new Map();
-        let counter = 0;
-        const reservedWords = new Set([
-            'var', 'let', 'const', 'function', 'return', 'if', 'else', 'for', 
-            'while', 'do', 'break', 'continue', 'switch', 'case', 'default',
-            'try', 'catch', 'finally', 'throw', 'new', 'this', 'typeof',
-            'instanceof', 'in', 'delete', 'void', 'null', 'undefined', 'true', 'false',
-            'console', 'log', 'length', 'push', 'pop', 'slice', 'splice',
-            'Object', 'Array', 'String', 'Number', 'Boolean', 'Math', 'Date',
-            'JSON', 'parseInt', 'parseFloat', 'isNaN', 'isFinite',
-            'setTimeout', 'setInterval', 'clearTimeout', 'clearInterval'
-        ]);
+    
+    function getNewName(originalName) {
+        if (nameMapping.has(originalName)) {
+            return nameMapping.get(originalName);
+        }
         
-        function counterToName(counter) {
-            let result = "";
-            while (true) {
-                result = String.fromCharCode(97 + (counter % 26)) + result;
-                counter = Math.floor(counter / 26);
-                if (counter === 0) break;
-                counter -= 1;
-            }
-            return result;
+        if (reservedWords.has(originalName)) {
+            return originalName;
         }
         
-        function getNewName(originalName) {
-            if (nameMapping.has(originalName)) {
-                return nameMapping.get(originalName);
+        // Generated names skip keywords and kept names ('do', 'in', 'log'),
+        // as JavaScriptVariableRenamer does.
+        let newName;
+        do {
+            newName = counterToName(counter);
+            counter++;
+        } while (reservedWords.has(newName) || jsKeywords.has(newName));
+        nameMapping.set(originalName, newName);
+        return newName;
+    }
+    
+    // Traverse and rename variables
+    traverse(ast, {
+        Identifier(path) {
+            // Only rename if it's a binding (variable declaration/function parameter)
+            if (path.isReferencedIdentifier() || path.isBindingIdentifier()) {
+                if (!reservedWords.has(path.node.name)) {
+                    path.node.name = getNewName(path.node.name);
+                }
             }
-            
-            if (reservedWords.has(originalName)) {
-                return originalName;
+        },
+        FunctionDeclaration(path) {
+            if (!reservedWords.has(path.node.id.name)) {
+                path.node.id.name = getNewName(path.node.id.name);
             }
-            
-            const newName = counterToName(counter);
-            nameMapping.set(originalName, newName);
-            counter++;
-            return newName;
         }
-        
-        // Traverse and rename variables
-        traverse(ast, {
-            Identifier(path) {
-                // Only rename if it's a binding (variable declaration/function parameter)
-                if (path.isReferencedIdentifier() || path.isBindingIdentifier()) {
-                    if (!reservedWords.has(path.node.name)) {
-                        path.node.name = getNewName(path.node.name);
-                    }
-                }
-            },
-            FunctionDeclaration(path) {
-                if (!reservedWords.has(path.node.id.name)) {
-                    path.node.id.name = getNewName(path.node.id.name);
-                }
+    });
+    
+    // Generate code back from AST
+    const result = generate(ast, {
+        minified: true,
+        compact: true
+    });
+    
+    return result.code;
+}
+
+// Server mode: a long-lived worker that answers framed requests on
+// stdin/stdout. Each frame is a 4-byte big-endian length followed by that
+// many bytes of UTF-8 JSON. A request is an array of sources, the response
+// an array of {code} or {error} objects in the same order.
+function runServer() {
+    let buffer = Buffer.alloc(0);
+    process.stdin.on('data', (chunk) => {
+        buffer = Buffer.concat([buffer, chunk]);
+        while (buffer.length >= 4) {
+            const length = buffer.readUInt32BE(0);
+            if (buffer.length < 4 + length) {
+                break;
             }
-        });
-        
-        // Generate code back from AST
-        const result = generate(ast, {
-            minified: true,
-            compact: true
-        });
-        
-        console.log(result.code);
-        
-    } catch (error) {
-        console.error('Error:', error.message);
-        process.exit(1);
-    }
-});
\ No newline at end of file
+            const sources = JSON.parse(buffer.subarray(4, 4 + length).toString('utf8'));
+            buffer = buffer.subarray(4 + length);
+
+            const results = sources.map((source) => {
+                try {
+                    return { code: minify(source) };
+                } catch (error) {
+                    return { error: error.message };
+                }
+            });
+            const payload = Buffer.from(JSON.stringify(results), 'utf8');
+            const header = Buffer.alloc(4);
+            header.writeUInt32BE(payload.length, 0);
+            process.stdout.write(Buffer.concat([header, payload]));
+        }
+    });
+    process.stdin.on('end', () => process.exit(0));
+}
+
+function runOnce() {
+    // Read input from stdin
+    let input = '';
+    process.stdin.setEncoding('utf8');
+    process.stdin.on('readable', () => {
+        const chunk = process.stdin.read();
+        if (chunk !== null) {
+            input += chunk;
+        }
+    });
+
+    process.stdin.on('end', () => {
+        try {
+            console.log(minify(input));
+        } catch (error) {
+            console.error('Error:', error.message);
+            process.exit(1);
+        }
+    });
+}
+
+if (process.argv.includes('--server')) {
+    runServer();
+} else {
+    runOnce();
+}
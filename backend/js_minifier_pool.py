@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import queue
+import select
+import shutil
+import signal
+import struct
+import logging
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+JS_MINIFIER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "js_minifier.js")
+JS_MINIFIER_WORKERS = int(os.getenv("VERITAS_JS_MINIFIER_WORKERS", "2"))
+JS_MINIFIER_TIMEOUT = float(os.getenv("VERITAS_JS_MINIFIER_TIMEOUT", "30"))
+# Files sent to one worker per round-trip.
+JS_MINIFIER_BATCH_SIZE = int(os.getenv("VERITAS_JS_MINIFIER_BATCH_SIZE", "32"))
+
+FRAME_HEADER = struct.Struct(">I")
+
+
+class MinifierUnavailableError(Exception):
+    """Raised when no Node worker can be started or a worker crashes or times out."""
+
+
+class MinifierWorker:
+    """
+    One `node js_minifier.js --server` process. Requests and responses are
+    framed as a 4-byte big-endian length followed by UTF-8 JSON.
+    """
+    def __init__(self, node_path: str):
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [node_path, JS_MINIFIER_PATH, "--server"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._stderr,
+            cwd=os.path.dirname(JS_MINIFIER_PATH), bufsize=0
+        )
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _failure(self, reason: str) -> MinifierUnavailableError:
+        self.close()
+        self._stderr.seek(0)
+        details = self._stderr.read().decode("utf-8", "replace").strip().splitlines()
+        errors = [line for line in details if "Error" in line] or details
+        return MinifierUnavailableError(f"{reason}: {errors[0].strip()}" if errors else reason)
+
+    def _read_exact(self, size: int, deadline: float) -> bytes:
+        fd = self.process.stdout.fileno()
+        data = bytearray()
+        while len(data) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise self._failure("JavaScript minifier timed out")
+            chunk = os.read(fd, size - len(data))
+            if not chunk:
+                raise self._failure(f"JavaScript minifier exited with code {self.process.wait()}")
+            data.extend(chunk)
+        return bytes(data)
+
+    def request(self, sources: list[str], timeout: float) -> list[dict]:
+        deadline = time.monotonic() + timeout
+        payload = json.dumps(sources).encode("utf-8")
+        try:
+            self.process.stdin.write(FRAME_HEADER.pack(len(payload)) + payload)
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            raise self._failure(f"JavaScript minifier exited with code {self.process.wait()}")
+        (length,) = FRAME_HEADER.unpack(self._read_exact(FRAME_HEADER.size, deadline))
+        return json.loads(self._read_exact(length, deadline))
+
+    def close(self):
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            stream.close()
+
+
+class NodeMinifierPool:
+    """
+    Pool of long-lived Node minifier workers, so each call skips Node
+    startup and Babel loading. A worker that crashes or exceeds the timeout
+    is killed and replaced on the next request. If workers cannot be started
+    at all (Node or Babel missing), the pool marks itself unavailable and
+    callers fall back to the pure-Python minifier.
+    """
+    def __init__(self, workers: int = JS_MINIFIER_WORKERS, timeout: float = JS_MINIFIER_TIMEOUT,
+                 batch_size: int = JS_MINIFIER_BATCH_SIZE, node_path: str = None):
+        self.node_path = node_path or shutil.which("node")
+        self.workers = workers
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.available = self.node_path is not None
+        self.restarts = 0
+        self._ever_succeeded = False
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> MinifierWorker:
+        self._slots.acquire()
+        try:
+            worker = self._idle.get_nowait()
+            if worker.alive():
+                return worker
+            worker.close()
+            self.restarts += 1
+        except queue.Empty:
+            pass
+        try:
+            return MinifierWorker(self.node_path)
+        except OSError as e:
+            self._slots.release()
+            self.available = False
+            raise MinifierUnavailableError(str(e))
+
+    def _request_batch(self, sources: list[str], timeout: float) -> list[dict]:
+        worker = self._acquire()
+        try:
+            results = worker.request(sources, timeout)
+        except MinifierUnavailableError:
+            self._slots.release()
+            with self._lock:
+                if not self._ever_succeeded and worker.process.returncode != -signal.SIGKILL:
+                    # No worker has ever answered and this one exited on its
+                    # own: Node or its Babel modules are missing.
+                    self.available = False
+            raise
+        self._ever_succeeded = True
+        self._idle.put(worker)
+        self._slots.release()
+        return results
+
+    def minify_many(self, sources: list[str], timeout: float = None) -> list[dict]:
+        """
+        Minifies many sources, `batch_size` per round-trip, spread over the
+        workers. Returns one {"code": ...} or {"error": ...} per source, in order.
+        Raises MinifierUnavailableError if a batch fails twice.
+        """
+        if not self.available:
+            raise MinifierUnavailableError("Node minifier is not available")
+        timeout = timeout or self.timeout
+        batches = [sources[i:i + self.batch_size] for i in range(0, len(sources), self.batch_size)]
+
+        def run(batch):
+            try:
+                return self._request_batch(batch, timeout)
+            except MinifierUnavailableError as e:
+                if not self.available:
+                    raise
+                logger.warning(f"Restarting JavaScript minifier worker: {e}")
+                self.restarts += 1
+                return self._request_batch(batch, timeout)
+
+        if len(batches) <= 1:
+            return [result for batch in batches for result in run(batch)]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(batches))) as executor:
+            return [result for results in executor.map(run, batches) for result in results]
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_minifier_pool() -> NodeMinifierPool:
+    """Process-wide minifier pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = NodeMinifierPool()
+        return _pool
+
+
+def close_minifier_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
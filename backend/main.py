@@ -1,25 +1,33 @@
 import os
 import re
+import time
+import asyncio
+import hashlib
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import math
 import subprocess
 from collections import OrderedDict
-import requests
-
-# LangChain components for local model integration
-from langchain_community.chat_models import ChatOllama
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableSequence, RunnableLambda
+from functools import lru_cache
 
 # pyminifier for robust code obfuscation
-from minifier_code import obfuscate_code
-from extract_functions import extract_functions_from_content_python, extract_functions_from_content_js
-from pseudocode_prompt import SYSTEM_PROMPT, USER_PROMPT_TEMPLATE, PSEUDOCODE_PROMPT
-from function_boundaries import identify_function_boundaries_python, identify_function_boundaries_js
+from minifier_code import normalize_function_body, NORMALIZATION_VERSION
+from parallel_extract import extract_sources, read_sources, detect_language, EXTRACTION_VERSION
+from pseudocode_prompt import (
+    SYSTEM_PROMPT, USER_PROMPT_TEMPLATE, PSEUDOCODE_PROMPT, PROMPT_VERSION,
+    BATCH_PSEUDOCODE_PROMPT, BATCH_USER_PROMPT_TEMPLATE, BATCH_FUNCTION_HEADER
+)
+from pipeline_cache import make_cache_key
+from fingerprint import PackedFingerprint, stack_fingerprints, pairwise_hamming
+from structural_fingerprint import structural_fingerprint, prefilter_candidates, FINGERPRINT_ENGINES
+from match_selection import select_matches
+from metrics import stage_timer, FUNCTIONS, FUNCTIONS_PER_SECOND, LLM_CALLS, LLM_TOKENS, STAGE_SECONDS
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # --- CONFIGURATION ---
 # Set the name of the self-hosted model you are running with Ollama
 OLLAMA_MODEL = "deepseek-coder-v2"
@@ -27,6 +35,24 @@ load_dotenv()
 ASI_KEY = os.getenv("ASI_KEY") # Your script will load this from .env
 ASI_CHAT_MODEL = "asi1-mini"   # Or any other model your API provides
 USE_REMOTE_API = False
+# Set to 0 to skip the dummy generation/embedding that loads the model at startup.
+MODEL_WARMUP = os.getenv("VERITAS_MODEL_WARMUP", "1") == "1"
+
+# Maximum number of pseudocode generations in flight at once, and how long a
+# single generation may take before it is abandoned.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "120"))
+# Number of pseudocode strings sent to the embedding model per request.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Small functions are packed into one prompt, up to this many (estimated)
+# tokens of code per call; 0 sends every function on its own.
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "1200"))
+LLM_BATCH_SMALL_FUNCTION_TOKENS = int(os.getenv("LLM_BATCH_SMALL_FUNCTION_TOKENS", "200"))
+LLM_BATCH_MAX_FUNCTIONS = int(os.getenv("LLM_BATCH_MAX_FUNCTIONS", "8"))
+# With a structural prefilter, only functions whose AST SimHash reaches this
+# bit similarity with some reference function go to the LLM. Renamed copies
+# score 1.0; unrelated functions typically land around 0.75.
+PREFILTER_MIN_SIMILARITY = float(os.getenv("VERITAS_PREFILTER_MIN_SIMILARITY", "0.8"))
 
 # --- SCORING ALGORITHM PARAMETERS ---
 
@@ -36,7 +62,7 @@ SOFTPLUS_STEEPNESS = 20.0 # Controls how sharp the "knee" of the curve is
 VISUALIZE_MATCH_THRESHOLD = 0.1
 
 def transform_numbers(x, midpoint=0.42, gamma=9):
-    print(x)
+    logger.debug(f"Raw similarity {x}")
     if x <= midpoint:
         y = midpoint * (x / midpoint) ** gamma
     else:
@@ -71,38 +97,38 @@ def calculate_confidence_score(raw_similarity: float) -> float:
     return max(0.0, min(1.0, confidence))
 
 
-def extract_functions_from_files(filepaths: list[str]) -> tuple[list[str], dict[str, list[tuple[int, int]]]]:
+def extract_functions_from_sources(sources: list[tuple[str, str]]) -> tuple[list[str], dict[str, list[tuple[int, int]]]]:
     """
-    Step 0: Reads one or more Python files and extracts all top-level
-    functions using an indentation-based approach.
+    Step 0: Extracts the functions of (name, content) pairs, parsing each file
+    once in its own language. Files are spread over a process pool (see
+    parallel_extract). Returns the obfuscated functions in file order and
+    each file's function line ranges.
     """
-    content = ""
+    logger.info(f"Parsing {len(sources)} file(s)")
+    all_functions = []
     boundaries_dict = OrderedDict()
-    for filepath in filepaths:
-        print(f"  - Reading and parsing {filepath}...")
-        with open(filepath, 'r') as f:
-            file = f.read()
-        language = 'python' if filepath.endswith('.py') else 'javascript'
-
-        if language == 'python':
-            # Use the new helper to extract functions from the content
-            boundaries = identify_function_boundaries_python(file)
-            boundaries_dict[os.path.basename(filepath)] = boundaries
-        else:
-            boundaries = identify_function_boundaries_js(file)
-            boundaries_dict[os.path.basename(filepath)] = boundaries
-            
-        content += file + "\n"
-    
-    obfuscated_content = obfuscate_code(content, language=language)
-
-    if language == 'python':
-        all_functions = extract_functions_from_content_python(obfuscated_content)
-    else:
-        all_functions = extract_functions_from_content_js(obfuscated_content)
+    with stage_timer("extract"):
+        results = extract_sources(sources)
+    for name, functions, error in results:
+        if error is not None:
+            logger.warning(f"Could not parse {name}: {error}. Skipping.")
+        boundaries_dict[name] = [(func['start_line'], func['end_line']) for func in functions]
+        all_functions.extend(func['code'] for func in functions)
 
     return all_functions, boundaries_dict
 
+def extract_functions_from_files(filepaths: list[str]) -> tuple[list[str], dict[str, list[tuple[int, int]]]]:
+    """
+    Reads one or more Python/JavaScript files and extracts their functions.
+    """
+    return extract_functions_from_sources(read_sources(filepaths))
+
+def as_sources(files: list) -> list[tuple[str, str]]:
+    """Accepts file paths or (name, content) pairs and returns (name, content) pairs."""
+    paths = [f for f in files if isinstance(f, str)]
+    contents = dict(read_sources(paths)) if paths else {}
+    return [(f, contents[f]) if isinstance(f, str) else tuple(f) for f in files]
+
 
 def generate_pseudocode(obfuscated_code: str, llm_chain) -> str:
     """
@@ -112,6 +138,158 @@ def generate_pseudocode(obfuscated_code: str, llm_chain) -> str:
     return response
 
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for code)."""
+    return len(text) // 4 + 1
+
+
+def plan_pseudocode_batches(
+    obfuscated_codes: list[str],
+    token_budget: int = LLM_BATCH_TOKEN_BUDGET,
+    small_function_tokens: int = LLM_BATCH_SMALL_FUNCTION_TOKENS,
+    max_functions: int = LLM_BATCH_MAX_FUNCTIONS
+) -> list[list[int]]:
+    """
+    Groups function indices into LLM calls. Small functions are packed in
+    input order until the next one would exceed `token_budget` or
+    `max_functions`; larger functions get a call of their own.
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for i, obfuscated_code in enumerate(obfuscated_codes):
+        tokens = estimate_tokens(obfuscated_code)
+        if token_budget <= 0 or tokens > small_function_tokens:
+            batches.append([i])
+            continue
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_functions):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def format_function_batch(obfuscated_codes: list[str]) -> str:
+    return "\n\n".join(
+        f"{BATCH_FUNCTION_HEADER.format(number=n)}\n{code.strip()}" for n, code in enumerate(obfuscated_codes, start=1)
+    )
+
+
+BATCH_RESPONSE_HEADER_PATTERN = re.compile(r'^[#*\s]*PSEUDOCODE\s*(\d+)\s*[:*#]*\s*$', re.IGNORECASE | re.MULTILINE)
+
+def parse_batched_pseudocode(response: str, count: int) -> dict[int, str]:
+    """
+    Splits a batched answer into {0-based position: pseudocode}. Sections with
+    a number outside 1..count, repeated numbers or an empty body are dropped,
+    so those functions can be retried on their own.
+    """
+    headers = list(BATCH_RESPONSE_HEADER_PATTERN.finditer(response or ""))
+    sections = {}
+    repeated = set()
+    for header, following in zip(headers, headers[1:] + [None]):
+        number = int(header.group(1))
+        body = response[header.end():following.start() if following else len(response)]
+        body = "\n".join(line for line in body.strip().splitlines() if not line.strip().startswith("```")).strip()
+        if number in sections:
+            repeated.add(number)
+        sections[number] = body
+    return {number - 1: body for number, body in sections.items() if 1 <= number <= count and body and number not in repeated}
+
+
+async def aiter_pseudocode(
+    obfuscated_codes: list[str],
+    llm_chain,
+    max_concurrency: int = LLM_MAX_CONCURRENCY,
+    timeout: float = LLM_CALL_TIMEOUT,
+    batch_token_budget: int = LLM_BATCH_TOKEN_BUDGET
+):
+    """
+    Tool 2 (concurrent): Generates pseudocode for many functions through
+    `llm_chain.ainvoke`, with a fixed pool of workers so that at most
+    `max_concurrency` requests are in flight. Yields (index, pseudocode)
+    pairs as calls complete; a call that fails or exceeds `timeout` seconds
+    yields "".
+
+    Small functions are sent several per call (see `plan_pseudocode_batches`)
+    as {"obfuscated_functions", "count"}. Functions whose pseudocode cannot be
+    parsed out of a batched answer are retried with a call of their own.
+    """
+    queue = asyncio.Queue()
+    completed = asyncio.Queue()
+    for batch in plan_pseudocode_batches(obfuscated_codes, batch_token_budget):
+        queue.put_nowait(batch)
+
+    async def call(inputs: dict, label: str) -> str:
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(llm_chain.ainvoke(inputs), timeout)
+            LLM_CALLS.inc(outcome="success")
+            LLM_TOKENS.inc(estimate_tokens(inputs.get("obfuscated_code") or inputs["obfuscated_functions"]), direction="prompt")
+            LLM_TOKENS.inc(estimate_tokens(response), direction="completion")
+            return response
+        except asyncio.TimeoutError:
+            LLM_CALLS.inc(outcome="timeout")
+            logger.warning(f"Pseudocode generation for {label} timed out after {timeout}s.")
+        except Exception as e:
+            LLM_CALLS.inc(outcome="error")
+            logger.warning(f"Pseudocode generation for {label} failed: {e}")
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="pseudocode")
+        return ""
+
+    async def worker():
+        while True:
+            batch = await queue.get()
+            try:
+                if len(batch) == 1:
+                    i = batch[0]
+                    completed.put_nowait((i, await call({"obfuscated_code": obfuscated_codes[i]}, f"function {i+1}")))
+                    continue
+                response = await call({
+                    "obfuscated_functions": format_function_batch([obfuscated_codes[i] for i in batch]),
+                    "count": len(batch)
+                }, f"functions {batch[0]+1}-{batch[-1]+1}")
+                parsed = parse_batched_pseudocode(response, len(batch))
+                if len(parsed) < len(batch):
+                    logger.info(f"Batched answer covered {len(parsed)} of {len(batch)} functions; retrying the rest one by one.")
+                for position, i in enumerate(batch):
+                    if position in parsed:
+                        completed.put_nowait((i, parsed[position]))
+                    else:
+                        queue.put_nowait([i])
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(max_concurrency, len(obfuscated_codes)))]
+    try:
+        for _ in range(len(obfuscated_codes)):
+            yield await completed.get()
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+class FingerprintingError(RuntimeError):
+    """No function of a submission could be fingerprinted (e.g. the LLM backend is down)."""
+
+
+def run_coroutine_sync(coroutine):
+    """
+    Runs a coroutine to completion from synchronous code. When called from
+    inside a running event loop (e.g. a FastAPI handler) it runs on its own
+    loop in a helper thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Carry the caller's context (trace id) over to the helper thread.
+        return executor.submit(contextvars.copy_context().run, asyncio.run, coroutine).result()
+
+
 def generate_embedding(pseudocode: str, embedding_model) -> np.ndarray:
     """
     Tool 3: Converts the pseudocode text into a numerical vector embedding.
@@ -119,119 +297,240 @@ def generate_embedding(pseudocode: str, embedding_model) -> np.ndarray:
     embedding_list = embedding_model.embed_query(pseudocode)
     return np.array(embedding_list)
 
-def generate_fingerprint(embedding_vector: np.ndarray) -> str:
+def generate_embeddings(pseudocodes: list[str], embedding_model, batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
+    """
+    Tool 3 (batched): Embeds many pseudocode strings through `embed_documents`,
+    `batch_size` at a time, and returns them as one (n, dim) matrix.
     """
-    Tool 4: Converts the embedding vector into a binary hash string based on sign.
+    matrix = None
+    for start in range(0, len(pseudocodes), batch_size):
+        batch = np.asarray(embedding_model.embed_documents(pseudocodes[start:start + batch_size]), dtype=np.float64)
+        if matrix is None:
+            matrix = np.empty((len(pseudocodes), batch.shape[1]), dtype=np.float64)
+        matrix[start:start + len(batch)] = batch
+    return matrix if matrix is not None else np.empty((0, 0), dtype=np.float64)
+
+def generate_fingerprint(embedding_vector: np.ndarray) -> PackedFingerprint:
     """
-    binary_array = (embedding_vector >= 0).astype(int)
-    return "".join(binary_array.astype(str))
+    Tool 4: Converts the embedding vector into a bit-packed binary hash based on sign.
+    """
+    return PackedFingerprint.from_embedding(embedding_vector)
 
-def hamming_distance(fingerprint1: str, fingerprint2: str) -> int:
+def generate_fingerprints(embedding_matrix: np.ndarray) -> list[PackedFingerprint]:
     """
-    Calculates the number of differing bits between two binary strings.
+    Tool 4 (batched): Fingerprints every row of an embedding matrix at once.
+    Produces the same fingerprints as calling `generate_fingerprint` per row.
     """
+    packed_rows = np.packbits(embedding_matrix >= 0, axis=1)
+    return [PackedFingerprint(row, embedding_matrix.shape[1]) for row in packed_rows]
+
+def hamming_distance(fingerprint1, fingerprint2) -> int:
+    """
+    Calculates the number of differing bits between two fingerprints. Both
+    packed fingerprints and the legacy '0'/'1' strings are accepted.
+    """
+    fingerprint1 = PackedFingerprint.from_wire(fingerprint1)
+    fingerprint2 = PackedFingerprint.from_wire(fingerprint2)
     # Ensure fingerprints are the same length for comparison
     if len(fingerprint1) != len(fingerprint2):
         # This can happen if the embedding models produce different dimensions.
         # Handle this gracefully, e.g., by returning a max distance.
         return len(fingerprint1) 
-    return np.sum(np.array(list(fingerprint1)) != np.array(list(fingerprint2)))
+    return fingerprint1.hamming(fingerprint2)
+
+
+@lru_cache(maxsize=16)
+def confidence_lookup_table(nbits: int) -> np.ndarray:
+    """
+    Confidence score for every possible Hamming distance 0..nbits between two
+    fingerprints of `nbits` bits. Entry d is exactly
+    calculate_confidence_score(1.0 - d / nbits).
+    """
+    table = np.array([calculate_confidence_score(1.0 - (dist / nbits)) for dist in range(nbits + 1)])
+    table.setflags(write=False)
+    return table
 
 
+def calculate_score_matrix(fingerprints_a: list, fingerprints_b: list) -> np.ndarray:
+    """
+    Confidence score of every (A, B) fingerprint pair as an (n, m) matrix.
+    Distances come from one XOR+popcount pass per fingerprint length, and are
+    mapped to confidences through `confidence_lookup_table`. Pairs whose
+    lengths differ get the maximum distance, as in `hamming_distance`.
+    """
+    fingerprints_a = [PackedFingerprint.from_wire(fp) for fp in fingerprints_a]
+    fingerprints_b = [PackedFingerprint.from_wire(fp) for fp in fingerprints_b]
+    scores = np.empty((len(fingerprints_a), len(fingerprints_b)), dtype=np.float64)
+    lengths_a = np.array([len(fp) for fp in fingerprints_a], dtype=np.int64)
+    lengths_b = np.array([len(fp) for fp in fingerprints_b], dtype=np.int64)
+
+    for nbits in np.unique(lengths_a).tolist():
+        rows = np.flatnonzero(lengths_a == nbits)
+        cols = np.flatnonzero(lengths_b == nbits)
+        table = confidence_lookup_table(nbits)
+        scores[rows] = table[nbits]
+        if len(cols):
+            distances = pairwise_hamming(
+                stack_fingerprints([fingerprints_a[i] for i in rows]),
+                stack_fingerprints([fingerprints_b[j] for j in cols])
+            )
+            scores[np.ix_(rows, cols)] = table[distances]
+    return scores
+
+
+def chunk_weight(code_chunk) -> int:
+    """
+    Weight of a function in the final score: the length of its code. Callers
+    that only send lengths (as /compare-hashes/ does) pass the integer directly.
+    """
+    return code_chunk if isinstance(code_chunk, int) else len(code_chunk)
+
+
+def score_from_matrix(candidate_score_matrix: np.ndarray, weights: np.ndarray, match_mode: str = "greedy") -> tuple[float, list]:
+    """
+    Final score and visualised matches of one (A, B) pair from its score
+    matrix and the weights of A's functions: the Reconstruction Model shared
+    by `calculate_advanced_score` and `calculate_advanced_scores`.
+    """
+    if candidate_score_matrix.shape[1]:
+        # cumsum adds left to right, matching the sequential sum() of the scalar model.
+        reconstruction_scores = np.minimum(1.0, np.cumsum(candidate_score_matrix, axis=1)[:, -1])
+    else:
+        reconstruction_scores = np.zeros(len(candidate_score_matrix))
+
+    weighted_sum = reconstruction_scores * weights
+
+    selected_matches = select_matches(candidate_score_matrix, VISUALIZE_MATCH_THRESHOLD, match_mode)
+
+    weighted_sum = np.cumsum(weighted_sum)[-1]
+    total_weight = int(weights.sum())
+    
+    final_score = (weighted_sum / total_weight)
+    final_score = transform_numbers(final_score) * 100
+
+    if final_score < 0.8:
+        selected_matches = []
+    return final_score, selected_matches
+
+
+@stage_timer("scoring")
 def calculate_advanced_score(
     fingerprints_a: list, 
     code_chunks_a: list, 
     fingerprints_b: list,
-    code_chunks_b: list
+    code_chunks_b: list,
+    match_mode: str = "greedy"
 ) -> float:
     """
     Calculates the final, advanced similarity score using the Reconstruction Model
     with Code Length Weighting and the Sigmoid confidence score.
+    `match_mode` chooses how function pairs are picked for visualisation:
+    "greedy" (highest score first) or "optimal" (maximum total score).
     """
     if not fingerprints_a:
         return 0.0
 
-    reconstruction_scores = []
-    weights = []
-    candidate_score_matrix = []
+    weights = np.array([chunk_weight(code_chunks_a[i]) for i in range(len(fingerprints_a))], dtype=np.int64)
+    candidate_score_matrix = calculate_score_matrix(fingerprints_a, fingerprints_b)
+    return score_from_matrix(candidate_score_matrix, weights, match_mode)
 
-    for i, fp_a in enumerate(fingerprints_a):
-        weight = len(code_chunks_a[i])
-        weights.append(weight)
-        
-        candidate_scores = []
-        if not fingerprints_b:
-            reconstruction_scores.append(0.0)
-            continue
-            
-        for fp_b in fingerprints_b:
-            dist = hamming_distance(fp_a, fp_b)
-            raw_sim = 1.0 - (dist / len(fp_a))
-            
-            # Convert raw similarity to a meaningful confidence score
-            confidence = calculate_confidence_score(raw_sim)
-            
-            # Add to candidate set if its confidence is significant
-            candidate_scores.append(confidence)
-
-        candidate_score_matrix.append(candidate_scores)
-        reconstruction_score = min(1.0, sum(candidate_scores))
-        reconstruction_scores.append(reconstruction_score)
-
-    for vector in candidate_score_matrix:
-        print(vector)
-        
-    weighted_sum = np.array(reconstruction_scores) * np.array(weights)
-
-    selected_matches = []
-    potential_matches = []
-    for i, row in enumerate(candidate_score_matrix):
-        for j, score in enumerate(row):
-            if score > VISUALIZE_MATCH_THRESHOLD:
-                potential_matches.append((score, i, j))
-    
-    potential_matches.sort(reverse=True, key=lambda x: x[0])
-    
-    used_rows = set()
-    used_cols = set()
-    
-    for score, row, col in potential_matches:
-        if row not in used_rows and col not in used_cols:
-            selected_matches.append((score, row, col))
-            used_rows.add(row)
-            used_cols.add(col)
-
-    weighted_sum = sum(weighted_sum)
-    total_weight = sum(weights)
-    
-    final_score = (weighted_sum / total_weight)
-    final_score = transform_numbers(final_score) * 100
 
-    if final_score < 0.8:
-        selected_matches = []
-    return final_score, selected_matches
+@stage_timer("batch_scoring")
+def calculate_advanced_scores(
+    fingerprints_a: list,
+    code_chunks_a: list,
+    candidates: list,
+    match_mode: str = "greedy"
+) -> list[tuple[float, list]]:
+    """
+    `calculate_advanced_score` of A against each candidate fingerprint list
+    in `candidates`, with identical results. A is compared with the
+    fingerprints of all candidates in one `calculate_score_matrix` pass and
+    the matrix is then split into one column block per candidate, so N
+    candidates cost one distance computation instead of N.
+    """
+    if not fingerprints_a:
+        return [(0.0, []) for _ in candidates]
+
+    weights = np.array([chunk_weight(code_chunks_a[i]) for i in range(len(fingerprints_a))], dtype=np.int64)
+    candidate_score_matrix = calculate_score_matrix(fingerprints_a, [fp for fingerprints_b in candidates for fp in fingerprints_b])
+    bounds = np.cumsum([0] + [len(fingerprints_b) for fingerprints_b in candidates]).tolist()
+    return [
+        score_from_matrix(candidate_score_matrix[:, start:end], weights, match_mode)
+        for start, end in zip(bounds, bounds[1:])
+    ]
+
+
+# Fingerprint of the scoring parameters. Memoised pair scores are keyed on it,
+# so tuning any of them automatically stops old results from matching.
+SCORING_VERSION = hashlib.sha256(repr((
+    SOFTPLUS_ACTIVATION_POINT, SOFTPLUS_STEEPNESS, VISUALIZE_MATCH_THRESHOLD, transform_numbers.__defaults__
+)).encode("utf-8")).hexdigest()[:16]
+
+def model_identity() -> tuple[str, str]:
+    """The (backend, model) pair that produces pseudocode under the current configuration."""
+    if USE_REMOTE_API:
+        return "asi", ASI_CHAT_MODEL
+    return "ollama", OLLAMA_MODEL
 
-def run_pipeline_for_files(filepaths: list[str], llm_chain, embedding_model) -> tuple[list[str], list[str]]:
+def pipeline_cache_keys(func_code: str) -> tuple[str, str]:
     """
-    Orchestrates the fingerprinting process and returns both fingerprints and original code chunks.
+    Returns the (pseudocode, embedding) cache keys for one obfuscated function
+    under the currently configured backend, models and prompt version.
+    The pseudocode key is the exact obfuscated text. The embedding key uses
+    the normalised body (see `normalize_function_body`), so a function is
+    recognised even when its parameters and locals got other names; the
+    normaliser's version is part of the key.
+    """
+    backend, model = model_identity()
+    pseudocode_key = make_cache_key(func_code, model, PROMPT_VERSION, backend)
+    embedding_key = make_cache_key(
+        normalize_function_body(func_code), f"{model}+embed:{OLLAMA_MODEL}+norm:{NORMALIZATION_VERSION}", PROMPT_VERSION, backend
+    )
+    return pseudocode_key, embedding_key
+
+def file_cache_key(filepath: str, content: str) -> str:
+    """
+    Cache key for the complete analysis of one source file, by content hash.
+    It includes EXTRACTION_VERSION, so stored boundaries and code chunks are
+    not reused once extraction or renaming changes.
+    """
+    backend, model = model_identity()
+    return make_cache_key(
+        content, f"{model}+embed:{OLLAMA_MODEL}+file:{detect_language(filepath)}+extract:{EXTRACTION_VERSION}", PROMPT_VERSION, backend
+    )
+
+def lookup_file_results(sources: list[tuple[str, str]], cache) -> tuple[dict, dict]:
+    """
+    Looks up stored results for unchanged files.
+    Returns ({name: cache key}, {name: stored result}).
+    """
+    keys = {}
+    results = {}
+    for name, content in sources:
+        keys[name] = file_cache_key(name, content)
+        result = cache.get_file_result(keys[name])
+        if result is not None:
+            results[name] = result
+    return keys, results
+
+def group_duplicate_functions(functions: list[str], indices: list[int]) -> dict[int, list[int]]:
+    """
+    Groups the functions at `indices` whose normalised bodies are identical.
+    Returns {representative index: [indices of every copy, representative first]}.
+    """
+    groups = OrderedDict()
+    representatives = {}
+    for i in indices:
+        representative = representatives.setdefault(normalize_function_body(functions[i]), i)
+        groups.setdefault(representative, []).append(i)
+    return groups
+
+def assign_hashes_to_files(fingerprints: list, boundaries: dict) -> dict:
+    """
+    Splits the ordered fingerprint list back into per-file entries holding
+    each file's hashes next to its function boundaries.
     """
-    print(f"\nProcessing file: {filepaths}...")
-    
-    functions, boundaries = extract_functions_from_files(filepaths)
-    
-    print(f"Found {len(functions)} function(s). Generating fingerprints...")
-    fingerprints = []
-    for i, func_code in enumerate(functions):
-        pseudocode = generate_pseudocode(func_code, llm_chain)
-        print(f"\nFunction {i+1} Pseudocode:\n{pseudocode}\n")
-        if not pseudocode:
-              print(f"  - Failed to generate pseudocode for function {i+1}. Skipping.")
-              continue
-        embedding = generate_embedding(pseudocode, embedding_model)
-        fingerprint = generate_fingerprint(embedding)
-        fingerprints.append(fingerprint)
-        print(f"  - Fingerprint generated for function {i+1}.")
-    
     assert sum(len(x) for x in boundaries.values()) == len(fingerprints), f"Found {len(fingerprints)} fingerprints but {sum(len(x) for x in boundaries.values())} functions in boundaries"
 
     queue = fingerprints.copy()
@@ -243,73 +542,404 @@ def run_pipeline_for_files(filepaths: list[str], llm_chain, embedding_model) ->
             "boundaries": function
         }
     assert fingerprints == [x for hashes in boundaries.values() for x in hashes["hashes"]], "Correspondence error in boundaries"
-    return fingerprints, functions, boundaries
+    return boundaries
+
+async def aiter_pipeline_events(
+    files: list,
+    llm_chain,
+    embedding_model,
+    cache=None,
+    max_concurrency: int = LLM_MAX_CONCURRENCY,
+    call_timeout: float = LLM_CALL_TIMEOUT,
+    embedding_batch_size: int = EMBEDDING_BATCH_SIZE,
+    engine: str = "llm",
+    prefilter: list = None,
+    prefilter_min_similarity: float = PREFILTER_MIN_SIMILARITY
+):
+    """
+    Runs the fingerprinting pipeline over `files`, given as paths or as
+    (name, content) pairs, and yields progress as it happens:
+
+    - {"event": "boundaries", "filename", "boundaries"} for every file once parsing is done
+    - {"event": "hash", "index", "filename", "position", "fingerprint"} for every
+      function as soon as its fingerprint exists (in completion order)
+    - {"event": "summary", "fingerprints", "code_chunks", "boundaries", "stats"} at the end,
+      with the same values `run_pipeline_for_files` returns
+
+    A function whose pseudocode or embedding could not be produced (failed or
+    timed-out LLM call) gets no "hash" event and is left out of the summary:
+    its code chunk and boundary are dropped with it, and it is listed in
+    `stats["failed_functions"]` by file and line range. If every function
+    fails, FingerprintingError is raised instead of returning an empty result.
+
+    When a `PipelineCache` is given, files whose content was analysed before
+    reuse their stored boundaries, code chunks and hashes, and functions whose
+    normalised body was seen before reuse their embedding. Functions with the
+    same normalised body within the submission are only sent to the LLM and
+    embedder once; every copy gets the same fingerprint. `stats` in the
+    summary counts reused, recomputed and deduplicated functions.
+    The remaining functions are sent to the LLM concurrently, at most
+    `max_concurrency` at a time. Whatever pseudocode is ready whenever the
+    embedder is free is embedded together, up to `embedding_batch_size`.
+
+    With `engine="structural"` no model is called: every function gets a
+    SimHash of its AST shape instead (see `structural_fingerprint`). Those
+    fingerprints are not comparable with LLM ones, so the cache is bypassed.
+
+    `prefilter`, a list of structural fingerprints (e.g. of the submissions
+    this one will be compared with), gates the LLM path: functions without a
+    cached embedding are SimHashed first, and only those within
+    `prefilter_min_similarity` of some reference fingerprint get pseudocode
+    and embeddings. The others cannot be close matches; like failed ones
+    they are left out of the summary, listed in `stats["prefiltered_functions"]`.
+    """
+    if engine not in FINGERPRINT_ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(FINGERPRINT_ENGINES)}")
+    if prefilter is not None and engine != "llm":
+        raise ValueError("prefilter only applies to the llm engine")
+    if engine == "structural":
+        cache = None
+    pipeline_start = time.perf_counter()
+    sources = await asyncio.to_thread(as_sources, files)
+    filepaths = [name for name, _ in sources]
+    logger.info(f"Processing {len(filepaths)} file(s): {filepaths}")
+
+    file_keys, reused_files = await asyncio.to_thread(lookup_file_results, sources, cache) if cache is not None else ({}, {})
+    changed_sources = [(name, content) for name, content in sources if name not in reused_files]
+    changed_paths = [name for name, _ in changed_sources]
+    if reused_files:
+        logger.info(f"Reusing stored results for {len(reused_files)} unchanged file(s).")
+    changed_functions, changed_boundaries = await asyncio.to_thread(extract_functions_from_sources, changed_sources) if changed_sources else ([], OrderedDict())
+
+    # Lay the files out in upload order; unchanged files bring their stored
+    # code chunks and hashes, changed files take their share of the new functions.
+    functions = []
+    fingerprints = []
+    boundaries = OrderedDict()
+    file_slices = {}
+    changed_offset = 0
+    for filepath in filepaths:
+        start = len(functions)
+        if filepath in reused_files:
+            stored = reused_files[filepath]
+            boundaries[filepath] = stored["boundaries"]
+            functions.extend(stored["code_chunks"])
+            fingerprints.extend(PackedFingerprint.from_wire(fp) for fp in stored["hashes"])
+        else:
+            boundaries[filepath] = changed_boundaries[filepath]
+            count = len(boundaries[filepath])
+            functions.extend(changed_functions[changed_offset:changed_offset + count])
+            fingerprints.extend([None] * (len(functions) - start))
+            file_slices[filepath] = (start, len(functions))
+            changed_offset += count
+    # Functions the boundary scan did not account for are still fingerprinted.
+    functions.extend(changed_functions[changed_offset:])
+    fingerprints.extend([None] * (len(functions) - len(fingerprints)))
+    slices_aligned = changed_offset == len(changed_functions)
+    
+    logger.info(f"Found {len(functions)} function(s). Generating fingerprints...")
+    locations = []
+    for file_name, function_boundaries in boundaries.items():
+        yield {"event": "boundaries", "filename": file_name, "boundaries": function_boundaries}
+        locations.extend((file_name, position) for position in range(len(function_boundaries)))
+
+    pseudocodes = [None] * len(functions)
+    embeddings = [None] * len(functions)
+    groups = await asyncio.to_thread(group_duplicate_functions, functions, [i for i, fp in enumerate(fingerprints) if fp is None])
+    duplicates = sum(len(copies) - 1 for copies in groups.values())
+    stats = {
+        "files_reused": len(reused_files),
+        "files_processed": len(changed_paths),
+        "functions_reused": sum(fp is not None for fp in fingerprints),
+        "functions_recomputed": 0,
+        "functions_deduplicated": duplicates,
+        "dedupe_ratio": duplicates / len(functions) if functions else 0.0,
+        "engine": engine
+    }
+    if duplicates:
+        logger.info(f"{duplicates} function(s) are copies of another one and will share its fingerprint.")
+
+    def hash_event(i: int) -> dict:
+        file_name, position = locations[i] if i < len(locations) else (None, None)
+        return {"event": "hash", "index": i, "filename": file_name, "position": position, "fingerprint": fingerprints[i]}
+
+    def fan_out(i: int) -> list[dict]:
+        """Copies the fingerprint of representative `i` to all its copies."""
+        for j in groups[i]:
+            fingerprints[j] = fingerprints[i]
+        return [hash_event(j) for j in groups[i]]
+
+    def lookup_cache() -> dict:
+        keys = {}
+        for i in groups:
+            keys[i] = pseudocode_key, embedding_key = pipeline_cache_keys(functions[i])
+            embeddings[i] = cache.get_embedding(embedding_key)
+            if embeddings[i] is None:
+                pseudocodes[i] = cache.get_pseudocode(pseudocode_key)
+        return keys
+
+    for i in range(len(functions)):
+        if fingerprints[i] is not None:
+            yield hash_event(i)
+
+    if engine == "structural":
+        def fingerprint_structurally() -> dict:
+            with stage_timer("fingerprint"):
+                return {
+                    i: structural_fingerprint(functions[i], detect_language(locations[i][0]) if i < len(locations) else None)
+                    for i in groups
+                }
+        for i, fingerprint in (await asyncio.to_thread(fingerprint_structurally)).items():
+            fingerprints[i] = fingerprint
+            stats["functions_recomputed"] += 1
+            for event in fan_out(i):
+                yield event
+        # Nothing is left for the LLM and embedding stages.
+        groups = OrderedDict()
+
+    cache_keys = await asyncio.to_thread(lookup_cache) if cache is not None else {}
+    for i in groups:
+        if embeddings[i] is not None:
+            fingerprints[i] = generate_fingerprint(embeddings[i])
+            stats["functions_reused"] += 1
+            for event in fan_out(i):
+                yield event
+
+    prefiltered = set()
+    if prefilter is not None:
+        reference = [PackedFingerprint.from_wire(fp) for fp in prefilter]
+        nbits = len(reference[0]) if reference else 0
+        pending = [i for i in groups if embeddings[i] is None]
+
+        def prefilter_structurally() -> list:
+            """The pending representatives that have no structural neighbour in `reference`."""
+            if not reference:
+                return pending
+            with stage_timer("prefilter"):
+                structural = [
+                    structural_fingerprint(functions[i], detect_language(locations[i][0]) if i < len(locations) else None, nbits)
+                    for i in pending
+                ]
+                close, _ = prefilter_candidates(structural, reference, int((1.0 - prefilter_min_similarity) * nbits))
+            return [i for i, keep in zip(pending, close) if not keep]
+
+        for i in await asyncio.to_thread(prefilter_structurally):
+            prefiltered.update(groups.pop(i))
+        if prefiltered:
+            logger.info(f"Prefilter: {len(prefiltered)} function(s) have no structural neighbour and skip the LLM.")
+
+    events = asyncio.Queue()
+    ready = asyncio.Queue()
+    for i in groups:
+        if embeddings[i] is None and pseudocodes[i] is not None:
+            ready.put_nowait(i)
+
+    async def produce_pseudocode():
+        pending = [i for i in groups if embeddings[i] is None and pseudocodes[i] is None]
+        try:
+            async for k, pseudocode in aiter_pseudocode([functions[i] for i in pending], llm_chain, max_concurrency, call_timeout):
+                i = pending[k]
+                logger.debug(f"Function {i+1} pseudocode:\n{pseudocode}")
+                pseudocodes[i] = pseudocode
+                if pseudocode and cache is not None:
+                    await asyncio.to_thread(cache.put_pseudocode, cache_keys[i][0], pseudocode, PROMPT_VERSION)
+                ready.put_nowait(i)
+        finally:
+            ready.put_nowait(None)
+
+    async def embed_ready():
+        finished = False
+        while not finished:
+            batch = [await ready.get()]
+            while len(batch) < embedding_batch_size and not ready.empty():
+                batch.append(ready.get_nowait())
+            if None in batch:
+                finished = True
+                batch.remove(None)
+            for i in batch:
+                if not pseudocodes[i]:
+                    logger.warning(f"Failed to generate pseudocode for function {i+1}. Skipping.")
+            batch = [i for i in batch if pseudocodes[i]]
+            if not batch:
+                continue
+            with stage_timer("embedding"):
+                matrix = await asyncio.to_thread(generate_embeddings, [pseudocodes[i] for i in batch], embedding_model, embedding_batch_size)
+            with stage_timer("fingerprint"):
+                batch_fingerprints = generate_fingerprints(matrix)
+            if cache is not None:
+                await asyncio.to_thread(cache.put_embeddings, [(cache_keys[i][1], embedding) for i, embedding in zip(batch, matrix)], PROMPT_VERSION)
+            for i, embedding, fingerprint in zip(batch, matrix, batch_fingerprints):
+                embeddings[i] = embedding
+                fingerprints[i] = fingerprint
+                stats["functions_recomputed"] += 1
+                for event in fan_out(i):
+                    events.put_nowait(event)
+
+    async def run_stages():
+        producer = asyncio.create_task(produce_pseudocode())
+        try:
+            await embed_ready()
+            await producer
+        finally:
+            producer.cancel()
+
+    stages = asyncio.create_task(run_stages())
+    stages.add_done_callback(lambda _: events.put_nowait(None))
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+        await stages
+    finally:
+        stages.cancel()
+
+    if cache is not None and slices_aligned:
+        for filepath, (start, end) in file_slices.items():
+            if all(fp is not None for fp in fingerprints[start:end]):
+                await asyncio.to_thread(cache.put_file_result, file_keys[filepath], {
+                    "boundaries": boundaries[filepath],
+                    "code_chunks": functions[start:end],
+                    "hashes": [fp.to_base64() for fp in fingerprints[start:end]]
+                }, PROMPT_VERSION)
+
+    # Keep fingerprints, code chunks and boundaries aligned when functions
+    # failed or were prefiltered.
+    missing = [i for i, fp in enumerate(fingerprints) if fp is None]
+    failed = [i for i in missing if i not in prefiltered]
+    for outcome, indices in (("failed", failed), ("prefiltered", sorted(prefiltered))):
+        stats[f"functions_{outcome}"] = len(indices)
+        stats[f"{outcome}_functions"] = []
+    if missing:
+        boundaries = OrderedDict((file_name, list(function_boundaries)) for file_name, function_boundaries in boundaries.items())
+        for i in reversed(missing):
+            if i < len(locations):
+                file_name, position = locations[i]
+                outcome = "prefiltered" if i in prefiltered else "failed"
+                stats[f"{outcome}_functions"].append({"filename": file_name, "boundary": boundaries[file_name].pop(position)})
+        for outcome in ("failed", "prefiltered"):
+            stats[f"{outcome}_functions"].reverse()
+    if prefiltered:
+        FUNCTIONS.inc(len(prefiltered), engine=engine, outcome="prefiltered")
+    if failed:
+        logger.warning(f"{len(failed)} of {len(functions)} function(s) could not be fingerprinted and were left out.")
+        FUNCTIONS.inc(len(failed), engine=engine, outcome="failed")
+        if len(failed) == len(functions) - len(prefiltered):
+            raise FingerprintingError(f"None of the {len(failed)} function(s) sent to the LLM could be fingerprinted; is the LLM backend reachable?")
+    functions = [function for function, fp in zip(functions, fingerprints) if fp is not None]
+    fingerprints = [fp for fp in fingerprints if fp is not None]
+    elapsed = time.perf_counter() - pipeline_start
+    STAGE_SECONDS.observe(elapsed, stage="pipeline")
+    for outcome in ("reused", "recomputed", "deduplicated"):
+        FUNCTIONS.inc(stats[f"functions_{outcome}"], engine=engine, outcome=outcome)
+    FUNCTIONS_PER_SECOND.set(len(fingerprints) / elapsed if elapsed > 0 else 0.0, engine=engine)
+    logger.info(f"Fingerprints generated for {len(fingerprints)} function(s) in {elapsed:.2f}s: {stats['functions_reused']} reused, "
+                f"{stats['functions_recomputed']} recomputed, {stats['functions_deduplicated']} deduplicated.")
+    boundaries = assign_hashes_to_files(fingerprints, boundaries)
+    yield {"event": "summary", "fingerprints": fingerprints, "code_chunks": functions, "boundaries": boundaries, "stats": stats}
+
+def run_pipeline_for_files(
+    filepaths: list,
+    llm_chain,
+    embedding_model,
+    cache=None,
+    max_concurrency: int = LLM_MAX_CONCURRENCY,
+    call_timeout: float = LLM_CALL_TIMEOUT,
+    embedding_batch_size: int = EMBEDDING_BATCH_SIZE,
+    return_stats: bool = False,
+    engine: str = "llm",
+    prefilter: list = None,
+    prefilter_min_similarity: float = PREFILTER_MIN_SIMILARITY
+) -> tuple[list[PackedFingerprint], list[str]]:
+    """
+    Orchestrates the fingerprinting process and returns both fingerprints and original code chunks.
+    `filepaths` may also hold (name, content) pairs, e.g. read straight from an archive.
+    This is the blocking form of `aiter_pipeline_events` and takes the same options;
+    with `return_stats` the reuse counters are returned as a fourth value.
+    """
+    async def collect_summary():
+        async for event in aiter_pipeline_events(
+            filepaths, llm_chain, embedding_model, cache, max_concurrency, call_timeout, embedding_batch_size,
+            engine, prefilter, prefilter_min_similarity
+        ):
+            if event["event"] == "summary":
+                result = event["fingerprints"], event["code_chunks"], event["boundaries"]
+                return result + (event["stats"],) if return_stats else result
+
+    return run_coroutine_sync(collect_summary())
 
 def chat_remote(message: str, system_prompt: str, model_name: str) -> str:
-    # (Your well-written chat function is placed here)
+    """
+    Sends one chat request to the remote API through the shared pooled client
+    (see asi_client.py). Raises RemoteAPIError when the request keeps failing,
+    rather than returning an empty answer.
+    """
     if not ASI_KEY: raise ValueError("ASI_KEY environment variable is not set")
-    # ... (rest of your chat function logic) ...
-    url = "https://api.asi1.ai/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {ASI_KEY}", "Content-Type": "application/json"}
-    body = {
-        "model": model_name,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": message}
-        ],
-        "response_format": { "type": "text" }
-    }
-    try:
-        response = requests.post(url, headers=headers, json=body, timeout=30)
-        response.raise_for_status()
-        response_data = response.json()
-        print(response_data)
-        return response_data["choices"][0]["message"]["content"]
-    except Exception as e:
-        print(f"Error calling remote API: {e}")
-        return ""
+    from asi_client import get_asi_client
+    return get_asi_client(ASI_KEY).chat(message, system_prompt, model_name)
+
+async def achat_remote(message: str, system_prompt: str, model_name: str) -> str:
+    """Async form of `chat_remote`, used by the pipeline's concurrent workers."""
+    if not ASI_KEY: raise ValueError("ASI_KEY environment variable is not set")
+    from asi_client import get_asi_client
+    return await get_asi_client(ASI_KEY).achat(message, system_prompt, model_name)
 
 
 def generate_chain():
     """
     Acts as a switchboard to initialize and return the correct LLM chain
     and embedding model based on the USE_REMOTE_API flag.
+    LangChain is imported here rather than at module level, so importing this
+    module (and starting the server) does not pay for it.
     """
-    print(f"--- Configuration: USE_REMOTE_API is set to {USE_REMOTE_API} ---")
+    from langchain_community.chat_models import ChatOllama
+    from langchain_community.embeddings import OllamaEmbeddings
+    from langchain.prompts import PromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.runnables import RunnableSequence, RunnableLambda
+
+    logger.info(f"Configuration: USE_REMOTE_API is set to {USE_REMOTE_API}")
 
     if USE_REMOTE_API:
         # --- Remote API (asi1.ai) Path ---
         if not ASI_KEY:
             raise ValueError("To use the remote API, the ASI_KEY environment variable must be set.")
         
-        print(f"Using remote API model: {ASI_CHAT_MODEL}")
+        logger.info(f"Using remote API model: {ASI_CHAT_MODEL}")
 
         # 1. We create a prompt template for the user message part
+        # (the batched one is used when several functions come in at once)
         prompt = PromptTemplate.from_template(USER_PROMPT_TEMPLATE)
+        batch_prompt = PromptTemplate.from_template(BATCH_USER_PROMPT_TEMPLATE)
         
         # 2. We define a function that will be wrapped by LangChain.
         # This function now correctly formats the prompt before calling the API.
+        def format_user_prompt(inputs: dict) -> str:
+            return (batch_prompt if "obfuscated_functions" in inputs else prompt).format(**inputs)
+
         def remote_llm_func(inputs: dict) -> str:
-            # Format the user part of the prompt with the code
-            formatted_user_prompt = prompt.format(**inputs)
-            
-            # Call your original, unchanged chat_remote function
             return chat_remote(
-                message=formatted_user_prompt, # The fully formatted message
+                message=format_user_prompt(inputs), # The fully formatted message
                 system_prompt=SYSTEM_PROMPT,     # The static system instructions
                 model_name=ASI_CHAT_MODEL
             )
 
-        # 3. We wrap our new function in a RunnableLambda and add the parser
-        llm_chain = RunnableLambda(remote_llm_func) | StrOutputParser()
+        async def aremote_llm_func(inputs: dict) -> str:
+            return await achat_remote(message=format_user_prompt(inputs), system_prompt=SYSTEM_PROMPT, model_name=ASI_CHAT_MODEL)
+
+        # 3. We wrap our new function in a RunnableLambda and add the parser.
+        # `ainvoke` uses the async form, so concurrent calls share the pooled
+        # client instead of each taking a thread.
+        llm_chain = RunnableLambda(remote_llm_func, afunc=aremote_llm_func) | StrOutputParser()
 
     else:
         # --- Local Ollama Path (Unchanged) ---
-        print(f"Using local Ollama model: {OLLAMA_MODEL}")
+        logger.info(f"Using local Ollama model: {OLLAMA_MODEL}")
         
         # We combine the two prompts for the local model
         full_prompt_template = PSEUDOCODE_PROMPT
-        prompt = PromptTemplate.from_template(full_prompt_template)
+        single_prompt = PromptTemplate.from_template(full_prompt_template)
+        batch_prompt = PromptTemplate.from_template(BATCH_PSEUDOCODE_PROMPT)
+        # Batched inputs carry "obfuscated_functions" instead of "obfuscated_code".
+        prompt = RunnableLambda(lambda inputs: (batch_prompt if "obfuscated_functions" in inputs else single_prompt).invoke(inputs))
         
         llm = ChatOllama(model=OLLAMA_MODEL, temperature=0)
         llm_chain = RunnableSequence(prompt, llm, StrOutputParser())
@@ -317,8 +947,19 @@ def generate_chain():
     embedding_model = OllamaEmbeddings(model=OLLAMA_MODEL)
     return llm_chain, embedding_model
 
+def warm_up_models(llm_chain, embedding_model):
+    """
+    Sends one tiny generation and one embedding so the models are loaded
+    into memory before the first real request.
+    """
+    if not MODEL_WARMUP:
+        return
+    llm_chain.invoke({"obfuscated_code": "def a(b):\n    return b"})
+    embedding_model.embed_query("warm-up")
+
 # --- MAIN EXECUTION ---
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("Initializing CodeWitness Agent with local models via LangChain...")
 
     llm_chain, embedding_model = generate_chain()
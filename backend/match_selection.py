@@ -0,0 +1,103 @@
+import heapq
+from collections import deque
+import numpy as np
+
+MATCH_MODES = ("greedy", "optimal")
+
+# Number of candidates pulled from a row of the score matrix at a time.
+ROW_CANDIDATES = 8
+
+
+def _top_candidates(row: np.ndarray, allowed: np.ndarray, k: int) -> deque:
+    """
+    Columns of `row` among `allowed` with the k highest scores, ordered by
+    score descending and column ascending. Columns tied with the k-th score
+    are all kept so the order never depends on how argpartition breaks ties.
+    """
+    columns = np.flatnonzero(allowed)
+    if len(columns) > k:
+        values = row[columns]
+        kth_value = values[np.argpartition(-values, k - 1)[k - 1]]
+        columns = columns[values >= kth_value]
+    order = np.lexsort((columns, -row[columns]))
+    return deque(columns[order].tolist())
+
+
+def select_matches_greedy(score_matrix: np.ndarray, threshold: float, row_candidates: int = ROW_CANDIDATES) -> list[tuple[float, int, int]]:
+    """
+    Greedy one-to-one matching: repeatedly takes the highest scoring pair
+    above `threshold` whose row and column are both still free.
+
+    Gives the same result as sorting every candidate pair, but only keeps a
+    few candidates per row: a heap holds each open row's best remaining
+    column, and a row is refilled from the matrix (with used columns masked
+    out) only once its candidates are all taken.
+    """
+    n, m = score_matrix.shape
+    used_cols = np.zeros(m, dtype=bool)
+    queues = {}
+    heap = []
+
+    for i in range(n):
+        candidates = _top_candidates(score_matrix[i], score_matrix[i] > threshold, row_candidates)
+        if candidates:
+            queues[i] = candidates
+            j = candidates.popleft()
+            heap.append((-score_matrix[i, j], i, j))
+    heapq.heapify(heap)
+
+    selected_matches = []
+    while heap:
+        negative_score, i, j = heapq.heappop(heap)
+        if not used_cols[j]:
+            selected_matches.append((-negative_score, i, j))
+            used_cols[j] = True
+            del queues[i]
+            continue
+        # Column already taken: move on to this row's next free candidate.
+        candidates = queues[i]
+        while candidates and used_cols[candidates[0]]:
+            candidates.popleft()
+        if not candidates:
+            candidates.extend(_top_candidates(score_matrix[i], (score_matrix[i] > threshold) & ~used_cols, row_candidates))
+        if candidates:
+            j = candidates.popleft()
+            heapq.heappush(heap, (-score_matrix[i, j], i, j))
+        else:
+            del queues[i]
+
+    return [(float(score), int(i), int(j)) for score, i, j in selected_matches]
+
+
+def select_matches_optimal(score_matrix: np.ndarray, threshold: float) -> list[tuple[float, int, int]]:
+    """
+    One-to-one matching that maximises the total score (Hungarian algorithm).
+    Pairs at or below `threshold` are dropped afterwards. Needs SciPy.
+    """
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError as e:
+        raise ImportError("Optimal match selection requires scipy (pip install scipy)") from e
+
+    if score_matrix.size == 0:
+        return []
+    # Pairs below the threshold must never be preferred over leaving a row unmatched.
+    masked = np.where(score_matrix > threshold, score_matrix, 0.0)
+    rows, cols = linear_sum_assignment(masked, maximize=True)
+    selected_matches = [
+        (float(score_matrix[i, j]), int(i), int(j))
+        for i, j in zip(rows, cols) if score_matrix[i, j] > threshold
+    ]
+    selected_matches.sort(key=lambda match: (-match[0], match[1], match[2]))
+    return selected_matches
+
+
+def select_matches(score_matrix: np.ndarray, threshold: float, mode: str = "greedy") -> list[tuple[float, int, int]]:
+    """
+    Picks one-to-one (score, row, col) matches from an (n, m) score matrix.
+    """
+    if mode == "greedy":
+        return select_matches_greedy(score_matrix, threshold)
+    if mode == "optimal":
+        return select_matches_optimal(score_matrix, threshold)
+    raise ValueError(f"Unknown match mode '{mode}', expected one of {MATCH_MODES}")
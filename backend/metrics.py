@@ -0,0 +1,219 @@
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple, values: tuple, le: str = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """
+    Base class of the metric types: one value per combination of label
+    values, updated under a lock so threads can share it.
+    """
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def value(self, **labels) -> dict:
+        """{"count", "sum"} observed for these labels."""
+        with self._lock:
+            _, total, count = self._values.get(self._key(labels)) or (None, 0.0, 0)
+        return {"count": count, "sum": total}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, bound)} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, '+Inf')} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Metrics rendered in the Prometheus text exposition format. Collectors
+    are callables run at scrape time, for values that are cheaper to read
+    than to track (queue depth, cache size).
+    """
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "veritas_stage_seconds", "Time spent in each pipeline stage.", ("stage",)
+))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "veritas_stage_errors_total", "Pipeline stages that raised an exception.", ("stage",)
+))
+FUNCTIONS = REGISTRY.register(Counter(
+    "veritas_functions_total", "Functions processed, by how the fingerprint was obtained, or 'failed'/'prefiltered'.", ("engine", "outcome")
+))
+FUNCTIONS_PER_SECOND = REGISTRY.register(Gauge(
+    "veritas_functions_per_second", "Fingerprinting throughput of the last completed pipeline run.", ("engine",)
+))
+LLM_CALLS = REGISTRY.register(Counter(
+    "veritas_llm_calls_total", "Pseudocode generation calls.", ("outcome",)
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "veritas_llm_tokens_total", "Estimated tokens of code sent to and pseudocode received from the LLM.", ("direction",)
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "veritas_cache_lookups_total", "Pipeline cache lookups.", ("kind", "result")
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "veritas_queue_depth", "Items waiting in a queue.", ("queue",)
+))
+HTTP_REQUESTS = REGISTRY.register(Histogram(
+    "veritas_http_request_seconds", "HTTP request latency until the response starts.", ("method", "route", "status")
+))
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Records the duration of the enclosed block as one observation of `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+# --- TRACING ---
+# The trace id of the request (or job) being handled, copied into every log
+# record. Context variables follow asyncio tasks and asyncio.to_thread calls.
+trace_id_var = contextvars.ContextVar("trace_id", default="-")
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def trace(trace_id: str = None):
+    """Runs the enclosed block under `trace_id` (a fresh one by default)."""
+    token = trace_id_var.set(trace_id or new_trace_id())
+    try:
+        yield trace_id_var.get()
+    finally:
+        trace_id_var.reset(token)
+
+
+_record_factory_installed = False
+
+
+def install_trace_logging():
+    """Gives every log record a `trace_id` attribute, usable as %(trace_id)s in formats."""
+    global _record_factory_installed
+    if _record_factory_installed:
+        return
+    factory = logging.getLogRecordFactory()
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.trace_id = trace_id_var.get()
+        return record
+
+    logging.setLogRecordFactory(record_factory)
+    _record_factory_installed = True
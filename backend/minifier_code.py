@@ -1,11 +1,18 @@
 import ast
+import re
+import keyword
 import string
 from typing import Dict, Set, Any
-import subprocess
 import tempfile
 import os
 import json
 import string
+import logging
+import esprima
+from js_minifier_pool import get_minifier_pool, MinifierUnavailableError
+from metrics import stage_timer
+
+logger = logging.getLogger(__name__)
 
 class VariableRenamer(ast.NodeTransformer):
     def __init__(self):
@@ -31,9 +38,13 @@ class VariableRenamer(ast.NodeTransformer):
             return original_name
             
         # Generate new name: a, b, c, ..., z, aa, ab, ac, ...
-        new_name = self._counter_to_name(self.counter)
+        # skipping those that are keywords or names kept as they are ('if', 'len').
+        while True:
+            new_name = self._counter_to_name(self.counter)
+            self.counter += 1
+            if new_name not in self.builtin_names and not keyword.iskeyword(new_name):
+                break
         self.name_mapping[original_name] = new_name
-        self.counter += 1
         return new_name
     
     def _counter_to_name(self, counter: int) -> str:
@@ -95,9 +106,13 @@ class JavaScriptVariableRenamer:
             return original_name
             
         # Generate new name: a, b, c, ..., z, aa, ab, ac, ...
-        new_name = self._counter_to_name(self.counter)
+        # skipping those that are keywords or names kept as they are ('do', 'log').
+        while True:
+            new_name = self._counter_to_name(self.counter)
+            self.counter += 1
+            if new_name not in self.reserved_words and new_name not in JS_KEYWORDS:
+                break
         self.name_mapping[original_name] = new_name
-        self.counter += 1
         return new_name
     
     def _counter_to_name(self, counter: int) -> str:
@@ -111,58 +126,349 @@ class JavaScriptVariableRenamer:
             counter -= 1
         return result
 
+class LocalVariableRenamer(VariableRenamer):
+    """
+    VariableRenamer that only renames `bound_names` (parameters, locals and
+    the function's own name). Every other name is kept as it is and is never
+    handed out as a new name, so a kept name cannot be confused with a
+    renamed one.
+    """
+    def __init__(self, bound_names: Set[str], kept_names: Set[str]):
+        super().__init__()
+        self.bound_names = bound_names
+        self.builtin_names = self.builtin_names | kept_names
+
+    def _get_new_name(self, original_name: str) -> str:
+        if original_name not in self.bound_names:
+            return original_name
+        return super()._get_new_name(original_name)
+
+
+def _python_bound_names(tree: ast.AST) -> tuple[Set[str], Set[str]]:
+    """(names bound inside `tree`, other names it uses)."""
+    bound, used, declared_global = set(), set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.Name):
+            used.add(node.id)
+            if not isinstance(node.ctx, ast.Load):
+                bound.add(node.id)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            declared_global.update(node.names)
+    bound -= declared_global
+    return bound, used - bound
+
+
+def _normalize_python(code_string: str) -> str:
+    tree = ast.parse(code_string)
+    bound, free = _python_bound_names(tree)
+    return ast.unparse(LocalVariableRenamer(bound, free).visit(tree))
+
+
+def _js_pattern_names(node) -> list:
+    """Identifiers bound by a parameter or declaration pattern."""
+    if node is None:
+        return []
+    if node.type == 'Identifier':
+        return [node.name]
+    if node.type == 'AssignmentPattern':
+        return _js_pattern_names(node.left)
+    if node.type == 'RestElement':
+        return _js_pattern_names(node.argument)
+    if node.type == 'ArrayPattern':
+        return [name for element in node.elements for name in _js_pattern_names(element)]
+    if node.type == 'ObjectPattern':
+        return [name for prop in node.properties
+                for name in _js_pattern_names(prop.argument if prop.type == 'RestElement' else prop.value)]
+    return []
+
+
+def _normalize_js(code_string: str) -> str:
+    identifiers = set()
+    property_names = set()
+    bound = set()
+
+    def collect(node, metadata):
+        if node.type == 'Identifier':
+            identifiers.add(tuple(node.range))
+        elif node.type == 'MemberExpression' and not node.computed:
+            property_names.add(tuple(node.property.range))
+        elif node.type in ('Property', 'MethodDefinition') and not node.computed and not getattr(node, 'shorthand', False):
+            property_names.add(tuple(node.key.range))
+        if node.type in ('FunctionDeclaration', 'FunctionExpression', 'ArrowFunctionExpression'):
+            bound.update(_js_pattern_names(node.id))
+            for param in node.params:
+                bound.update(_js_pattern_names(param))
+        elif node.type in ('ClassDeclaration', 'ClassExpression'):
+            bound.update(_js_pattern_names(node.id))
+        elif node.type == 'VariableDeclarator':
+            bound.update(_js_pattern_names(node.id))
+        elif node.type == 'CatchClause':
+            bound.update(_js_pattern_names(node.param))
+
+    options = {'range': True, 'tokens': True}
+    program = None
+    # Anonymous function expressions only parse as expressions.
+    for candidate in (code_string, f"({code_string})"):
+        for parse in (esprima.parseScript, esprima.parseModule):
+            identifiers.clear()
+            property_names.clear()
+            bound.clear()
+            try:
+                program = parse(candidate, options, collect)
+                break
+            except esprima.Error:
+                continue
+        if program is not None:
+            break
+    if program is None:
+        raise ValueError("JavaScript function could not be parsed")
+
+    names = [(token.value, tuple(token.range) in identifiers and tuple(token.range) not in property_names)
+             for token in program.tokens if token.type == 'Identifier']
+    kept = {name for name, is_variable in names if not is_variable or name not in bound} | JS_FALLBACK_KEEP_NAMES
+    renamer = LocalVariableRenamer(bound, kept)
+    return " ".join(
+        renamer._get_new_name(token.value)
+        if token.type == 'Identifier' and tuple(token.range) in identifiers and tuple(token.range) not in property_names
+        else token.value
+        for token in program.tokens
+    )
+
+
+# Part of the cache key of everything stored by normalised body. Bump it
+# whenever normalize_function_body changes which functions it treats as equal.
+NORMALIZATION_VERSION = "2"
+
+def normalize_function_body(code_string: str, language: str = None) -> str:
+    """
+    Canonical form of a single function, used to recognise the same code
+    across uploads. Its parameters, locals and own name are renamed in order
+    of appearance and layout is normalised, so the result does not depend on
+    the names handed out while obfuscating the rest of the archive.
+    Attribute and property names, literals and names the function does not
+    bind itself are kept: functions that differ in any of them stay apart.
+    Code that does not parse is returned unchanged.
+    """
+    if language in (None, 'python'):
+        try:
+            return _normalize_python(code_string)
+        except SyntaxError:
+            if language == 'python':
+                return code_string
+    try:
+        return _normalize_js(code_string)
+    except ValueError:
+        return code_string
+
+
+NORMALIZATION_TOKEN_PATTERN = re.compile(r'[A-Za-z_$][A-Za-z0-9_$]*|\d[\w.]*|\S')
+
+IDENTIFIER_CHARS = set(string.ascii_letters + string.digits + '_$')
+
+JS_KEYWORDS = {
+    'async', 'await', 'class', 'debugger', 'enum', 'export', 'extends', 'from', 'get',
+    'import', 'let', 'of', 'set', 'static', 'super', 'with', 'yield', 'arguments',
+    'NaN', 'Infinity', 'globalThis', 'window', 'document', 'require', 'module', 'exports'
+}
+JS_FALLBACK_KEEP_NAMES = JavaScriptVariableRenamer().reserved_words | JS_KEYWORDS
+# Names after which a '/' starts a regular expression rather than a division.
+JS_REGEX_PRECEDING_KEYWORDS = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'case', 'do', 'else', 'yield', 'await'
+}
+# Punctuators that end an operand, so a '/' after them is a division.
+JS_OPERAND_END_PUNCTUATORS = {')', ']', '}', '++', '--'}
+
+JS_FALLBACK_TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>"(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?)
+  | (?P<name>(?:[^\W\d]|\$)[\w$]*)
+  | (?P<number>\.?\d[\w.]*)
+  | (?P<punct>>>>=?|\.\.\.|[=!]==|\*\*=|<<=|>>=|&&=|\|\|=|\?\?=|=>|[=!<>+\-*/%&|^]=|&&|\|\||\?\?|\?\.(?!\d)|\+\+|--|\*\*|<<|>>|[^\s\w$"'`])
+  | (?P<template>`)
+""", re.VERBOSE | re.DOTALL)
+JS_TEMPLATE_CHUNK_PATTERN = re.compile(r"(?:[^`\\$]|\\.|\$(?!\{))*", re.DOTALL)
+JS_REGEX_LITERAL_PATTERN = re.compile(r"/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*")
+
+
 def minify_js_fallback_regex(js_code: str) -> str:
     """
-    Fallback regex-based approach that mimics Python minifier behavior
+    Last-resort JavaScript minifier for code no parser accepts. A single
+    linear tokenizer pass drops comments, copies string, template and regex
+    literals verbatim, and renames identifiers with JavaScriptVariableRenamer
+    in order of first appearance (property names after '.' are kept).
+    Expressions inside template literals are tokenized like normal code.
+    A '/' is a division after an operand (a name other than
+    JS_REGEX_PRECEDING_KEYWORDS, a literal, or JS_OPERAND_END_PUNCTUATORS)
+    and starts a regex literal anywhere else.
     """
-    import re
-    
     renamer = JavaScriptVariableRenamer()
-    
-    # Extract all identifiers (variable names, function names)
-    identifier_pattern = r'\b[a-zA-Z_$][a-zA-Z0-9_$]*\b'
-    identifiers = set(re.findall(identifier_pattern, js_code))
-    
-    # Create mapping for non-reserved identifiers
-    mapping = {}
-    for identifier in sorted(identifiers):
-        if identifier not in renamer.reserved_words:
-            mapping[identifier] = renamer._get_new_name(identifier)
-    
-    # Replace identifiers with their shortened versions
-    result = js_code
-    for old_name, new_name in mapping.items():
-        # Use word boundaries to avoid partial replacements
-        result = re.sub(r'\b' + re.escape(old_name) + r'\b', new_name, result)
-    
-    # Basic minification (remove comments and extra whitespace)
-    # Remove single-line comments
-    result = re.sub(r'//.*?$', '', result, flags=re.MULTILINE)
-    # Remove multi-line comments
-    result = re.sub(r'/\*.*?\*/', '', result, flags=re.DOTALL)
-    # Collapse whitespace
-    result = re.sub(r'\s+', ' ', result)
-    # Remove spaces around operators and punctuation
-    result = re.sub(r'\s*([{}();,=+\-*/&|!<>?:])\s*', r'\1', result)
-    
-    return result.strip()
+    pieces = []
+    previous = ''
+    after_operand = False
+    newline_pending = False
+    template_depths = []  # brace depth at which each open '${' closes
+    depth = 0
+    pos = 0
+
+    def emit(token: str, operand: bool = False):
+        nonlocal previous, after_operand, newline_pending
+        if previous:
+            if newline_pending:
+                pieces.append('\n')
+            elif (previous[-1] in IDENTIFIER_CHARS and token[0] in IDENTIFIER_CHARS) or \
+                    (previous[-1] in '+-' and token[0] == previous[-1]):
+                pieces.append(' ')
+        newline_pending = False
+        pieces.append(token)
+        previous = token
+        after_operand = operand
+
+    def template_chunk(start: int) -> int:
+        """Emits template text from `start` up to and including '`' or '${'."""
+        end = JS_TEMPLATE_CHUNK_PATTERN.match(js_code, start + 1).end()
+        if js_code.startswith('${', end):
+            template_depths.append(depth)
+            emit(js_code[start:end + 2])
+            return end + 2
+        if end < len(js_code):
+            end += 1
+        emit(js_code[start:end], operand=True)
+        return end
+
+    while pos < len(js_code):
+        match = JS_FALLBACK_TOKEN_PATTERN.match(js_code, pos)
+        kind, token = match.lastgroup, match.group()
+        pos = match.end()
+        if kind == 'space' or kind == 'comment':
+            newline_pending = newline_pending or '\n' in token
+        elif kind == 'name':
+            operand = token not in JS_REGEX_PRECEDING_KEYWORDS
+            if previous not in ('.', '?.') and token not in JS_FALLBACK_KEEP_NAMES:
+                token = renamer._get_new_name(token)
+            emit(token, operand)
+        elif kind == 'string' or kind == 'number':
+            emit(token, operand=True)
+        elif kind == 'template':
+            pos = template_chunk(match.start())
+        elif token in ('/', '/=') and not after_operand:
+            literal = JS_REGEX_LITERAL_PATTERN.match(js_code, match.start())
+            if literal:
+                pos = literal.end()
+                token = literal.group()
+            emit(token, operand=literal is not None)
+        elif token == '{':
+            depth += 1
+            emit(token)
+        elif token == '}' and template_depths and template_depths[-1] == depth:
+            template_depths.pop()
+            pos = template_chunk(match.start())
+        else:
+            if token == '}':
+                depth -= 1
+            emit(token, operand=token in JS_OPERAND_END_PUNCTUATORS)
+
+    return ''.join(pieces)
+
+
+def minify_js_python(js_code: str) -> str:
+    """
+    Pure-Python counterpart of js_minifier.js for hosts without Node. esprima
+    parses the code, identifiers are renamed in order of appearance with
+    JavaScriptVariableRenamer (property names and object keys are left
+    alone, as Babel does) and the tokens are joined without comments or
+    redundant whitespace. Line breaks between tokens are kept so automatic
+    semicolon insertion still sees them.
+    """
+    identifiers = set()
+    property_names = set()
 
+    def collect(node, metadata):
+        if node.type == 'Identifier':
+            identifiers.add(tuple(node.range))
+        elif node.type == 'MemberExpression' and not node.computed:
+            property_names.add(tuple(node.property.range))
+        elif node.type in ('Property', 'MethodDefinition') and not node.computed and not getattr(node, 'shorthand', False):
+            property_names.add(tuple(node.key.range))
+
+    options = {'range': True, 'tokens': True}
+    try:
+        program = esprima.parseScript(js_code, options, collect)
+    except esprima.Error:
+        identifiers.clear()
+        property_names.clear()
+        program = esprima.parseModule(js_code, options, collect)
+
+    renamer = JavaScriptVariableRenamer()
+    pieces = []
+    previous_end = 0
+    for token in program.tokens:
+        start, end = token.range
+        value = token.value
+        if token.type == 'Identifier' and (start, end) in identifiers and (start, end) not in property_names:
+            value = renamer._get_new_name(value)
+        if pieces:
+            if '\n' in js_code[previous_end:start]:
+                pieces.append('\n')
+            elif (pieces[-1][-1] in IDENTIFIER_CHARS and value[0] in IDENTIFIER_CHARS) or \
+                    (pieces[-1][-1] in '+-' and value[0] == pieces[-1][-1]):
+                pieces.append(' ')
+        pieces.append(value)
+        previous_end = end
+    return ''.join(pieces)
+
+
+@stage_timer("js_minify")
+def minify_js_node_many(sources: list[str]) -> list[str]:
+    """
+    Minifies many JavaScript sources in as few round-trips to the Node worker
+    pool as possible. Sources Node did not minify, because it is missing or
+    Babel rejected them, come back as None.
+    """
+    pool = get_minifier_pool()
+    try:
+        results = pool.minify_many(sources) if pool.available else None
+    except MinifierUnavailableError as e:
+        logger.warning(f"Node minifier unavailable ({e}); using the Python minifier.")
+        results = None
+    return [results[i].get('code') if results is not None else None for i in range(len(sources))]
+
+
+def try_minify_js_python(source: str) -> str:
+    """The pure-Python minifier, or None if esprima cannot parse `source`."""
+    try:
+        return minify_js_python(source)
+    except esprima.Error:
+        return None
+
+
+def minify_js_many(sources: list[str]) -> list[str]:
+    """
+    Like `minify_js_node_many`, with the pure-Python minifier filling in for
+    Node; sources neither can parse come back as None.
+    """
+    return [
+        code if code is not None else try_minify_js_python(source)
+        for source, code in zip(sources, minify_js_node_many(sources))
+    ]
 
 
 def obfuscate_code(code_string: str, language="python") -> str:
     if language == "python":
-        print(code_string.count('\n'))
         tree = ast.parse(code_string)
         renamer = VariableRenamer()
         new_tree = renamer.visit(tree)
         normalized_code = ast.unparse(new_tree)
-        
-        print(normalized_code.count('\n'))
         return normalized_code
     else:
-
-        result = subprocess.run([
-            'node', 'js_minifier.js'
-        ], input=code_string, capture_output=True, text=True, check=True)
-        
-        return result.stdout.strip()
\ No newline at end of file
+        minified = minify_js_many([code_string])[0]
+        if minified is None:
+            raise ValueError("JavaScript source could not be parsed")
+        return minified
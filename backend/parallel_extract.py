@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import esprima
+from extract_functions import extract_functions_from_source
+from minifier_code import minify_js_node_many, try_minify_js_python
+
+# --- CONFIGURATION ---
+# 0 means one worker per CPU core.
+EXTRACT_WORKERS = int(os.getenv("VERITAS_EXTRACT_WORKERS", "0"))
+EXTRACT_CHUNKSIZE = int(os.getenv("VERITAS_EXTRACT_CHUNKSIZE", "8"))
+# Below this many files the pool's IPC costs more than it saves.
+EXTRACT_MIN_PARALLEL_FILES = int(os.getenv("VERITAS_EXTRACT_MIN_PARALLEL_FILES", "4"))
+
+# Fingerprint of the code that turns a source file into function boundaries
+# and obfuscated chunks. Stored per-file results are keyed on it, so any
+# change to extraction or renaming automatically stops old entries from matching.
+EXTRACTION_MODULES = ("parallel_extract.py", "extract_functions.py", "minifier_code.py", "js_minifier.js")
+
+
+def _extraction_version() -> str:
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in EXTRACTION_MODULES:
+        with open(os.path.join(directory, module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+EXTRACTION_VERSION = _extraction_version()
+
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+
+def detect_language(filepath: str) -> str:
+    return 'python' if filepath.endswith('.py') else 'javascript'
+
+
+def resolve_workers(workers: int = None) -> int:
+    workers = EXTRACT_WORKERS if workers is None else workers
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def extract_file(item: tuple) -> tuple[str, list[dict], str]:
+    """
+    Parses and obfuscates one (name, source[, minified]) item. Returns the
+    name, its functions and, when the file could not be parsed, the error
+    message. Runs inside the pool workers, so it must stay a picklable
+    top-level function. JavaScript that arrives without minified code is
+    minified here with the pure-Python fallback, so that cost is spread
+    over the workers too.
+    """
+    name, source, minified = item if len(item) == 3 else (*item, None)
+    language = detect_language(name)
+    try:
+        if language == 'javascript' and minified is None:
+            # "" rather than None for unparseable files, so the Node pool is not tried from the worker.
+            minified = try_minify_js_python(source) or ""
+        return name, extract_functions_from_source(source, language, minified), None
+    except (SyntaxError, ValueError, esprima.Error) as e:
+        return name, [], str(e)
+
+
+def get_executor(workers: int = None) -> ProcessPoolExecutor:
+    """
+    Shared process pool, created on first use. Workers are spawned rather than
+    forked so they never inherit the server's threads, locks or open databases.
+    """
+    global _executor, _executor_workers
+    workers = resolve_workers(workers)
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _executor_workers = workers
+        return _executor
+
+
+def shutdown_executor():
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = None
+        _executor_workers = None
+
+
+def extract_sources(sources: list[tuple[str, str]], workers: int = None, chunksize: int = None) -> list[tuple[str, list[dict], str]]:
+    """
+    Extracts the functions of many (name, source) pairs, sharding them across
+    the process pool. Results come back in input order whatever the worker
+    count, so fingerprints and boundaries stay deterministic.
+
+    When Node is available, JavaScript files are minified up front in a few
+    batched round-trips to the shared Node worker pool, rather than by every
+    process on its own. Files Node did not minify go to the workers as they
+    are, and each worker runs the Python fallback for its own files.
+    """
+    chunksize = chunksize or EXTRACT_CHUNKSIZE
+    js_positions = [i for i, (name, _) in enumerate(sources) if detect_language(name) == 'javascript']
+    minified = dict(zip(js_positions, minify_js_node_many([sources[i][1] for i in js_positions]))) if js_positions else {}
+    items = [(name, source, minified[i]) if minified.get(i) is not None else (name, source) for i, (name, source) in enumerate(sources)]
+    if resolve_workers(workers) == 1 or len(items) < EXTRACT_MIN_PARALLEL_FILES:
+        return [extract_file(item) for item in items]
+    return list(get_executor(workers).map(extract_file, items, chunksize=chunksize))
+
+
+def read_sources(filepaths: list[str]) -> list[tuple[str, str]]:
+    sources = []
+    for filepath in filepaths:
+        with open(filepath, 'r') as f:
+            sources.append((filepath, f.read()))
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallel parsing and obfuscation stage.")
+    parser.add_argument("paths", nargs="+", help="Source files or directories to scan for .py/.js files")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: VERITAS_EXTRACT_WORKERS or one per core)")
+    parser.add_argument("--chunksize", type=int, default=None, help="Files handed to a worker at a time")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per configuration")
+    args = parser.parse_args()
+
+    filepaths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                filepaths.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(('.py', '.js')))
+        else:
+            filepaths.append(path)
+    sources = read_sources(filepaths)
+    print(f"{len(sources)} files, {sum(len(source) for _, source in sources) / 1024:.0f} KiB")
+
+    baseline = None
+    for workers in sorted({1, resolve_workers(args.workers)}):
+        extract_sources(sources, workers=workers, chunksize=args.chunksize)  # warm-up: spawns the pool
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = extract_sources(sources, workers=workers, chunksize=args.chunksize)
+            timings.append(time.perf_counter() - start)
+        functions = sum(len(found) for _, found, _ in results)
+        if baseline is None:
+            baseline = results
+        elif results != baseline:
+            print("  Results differ from the serial run!", file=sys.stderr)
+        print(f"  workers={workers}: best {min(timings):.3f}s over {args.repeat} runs, {functions} functions")
+    shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+
+from metrics import CACHE_LOOKUPS
+
+# --- CONFIGURATION ---
+CACHE_PATH = os.getenv("VERITAS_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "pipeline_cache.sqlite3"))
+CACHE_MAX_ENTRIES = int(os.getenv("VERITAS_CACHE_MAX_ENTRIES", "200000"))
+CACHE_MAX_BYTES = int(os.getenv("VERITAS_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Once a bound is exceeded, entries are evicted until the cache is back under
+# this fraction of both bounds, so eviction runs in occasional batches.
+CACHE_EVICT_TO = float(os.getenv("VERITAS_CACHE_EVICT_TO", "0.9"))
+
+PSEUDOCODE_KIND = "pseudocode"
+EMBEDDING_KIND = "embedding"
+FILE_KIND = "file"
+
+
+def make_cache_key(obfuscated_code: str, model: str, prompt_version: str, backend: str) -> str:
+    """
+    Content address for one function: the obfuscated text plus everything
+    that changes what the LLM would produce for it.
+    """
+    digest = hashlib.sha256()
+    for part in (backend, model, prompt_version, obfuscated_code):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class PipelineCache:
+    """
+    Persistent, size-bounded LRU cache for generated pseudocode and embeddings.
+
+    Entries live in a single SQLite table so the cache survives restarts and
+    can be shared by several uvicorn workers on the same host. Each entry
+    records the prompt version it was produced with, so stale entries can be
+    dropped with `invalidate` once the prompt changes.
+
+    The entry count and total size are tracked in memory rather than
+    recounted on every write. They are re-read from the table before
+    evicting, since other workers write to it too.
+    """
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES,
+                 evict_to: float = CACHE_EVICT_TO):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_to = evict_to
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (key, kind)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._count, self._bytes = self._totals()
+
+    def _totals(self) -> tuple[int, int]:
+        # length() reads the value's size from the record header, without
+        # walking the overflow pages that a column stored after it needs.
+        return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length(value)), 0) FROM entries").fetchone()
+
+    def _get(self, key: str, kind: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND kind = ?", (key, kind)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(kind=kind, result="miss")
+                return None
+            self.hits += 1
+            CACHE_LOOKUPS.inc(kind=kind, result="hit")
+            self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ? AND kind = ?", (time.time(), key, kind)
+            )
+            return row[0]
+
+    def _put_many(self, items: list[tuple[str, str, bytes]], prompt_version: str):
+        """Stores (key, kind, value) entries in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for key, kind, value in items:
+                    previous = self._conn.execute(
+                        "SELECT length(value) FROM entries WHERE key = ? AND kind = ?", (key, kind)
+                    ).fetchone()
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO entries (key, kind, prompt_version, value, size, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, kind, prompt_version, value, len(value), now)
+                    )
+                    if previous is None:
+                        self._count += 1
+                        self._bytes += len(value)
+                    else:
+                        self._bytes += len(value) - previous[0]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._count, self._bytes = self._totals()
+                raise
+            if self._count > self.max_entries or self._bytes > self.max_bytes:
+                self._evict()
+
+    def _put(self, key: str, kind: str, value: bytes, prompt_version: str):
+        self._put_many([(key, kind, value)], prompt_version)
+
+    def _evict(self):
+        """
+        Drops least recently used entries until the cache is below `evict_to`
+        of both bounds. Runs only once a bound is exceeded.
+        """
+        self._count, self._bytes = self._totals()
+        if self._count <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        excess_rows = max(0, self._count - int(self.max_entries * self.evict_to))
+        excess_bytes = max(0, self._bytes - int(self.max_bytes * self.evict_to))
+        victims = []
+        freed = 0
+        for key, kind, size in self._conn.execute("SELECT key, kind, length(value) FROM entries ORDER BY last_access ASC"):
+            if len(victims) >= excess_rows and freed >= excess_bytes:
+                break
+            victims.append((key, kind))
+            freed += size
+        self._conn.execute("BEGIN")
+        self._conn.executemany("DELETE FROM entries WHERE key = ? AND kind = ?", victims)
+        self._conn.execute("COMMIT")
+        self._count -= len(victims)
+        self._bytes -= freed
+        self.evictions += len(victims)
+
+    def get_pseudocode(self, key: str):
+        value = self._get(key, PSEUDOCODE_KIND)
+        return None if value is None else value.decode("utf-8")
+
+    def put_pseudocode(self, key: str, pseudocode: str, prompt_version: str):
+        self._put(key, PSEUDOCODE_KIND, pseudocode.encode("utf-8"), prompt_version)
+
+    def get_embedding(self, key: str):
+        value = self._get(key, EMBEDDING_KIND)
+        return None if value is None else np.frombuffer(value, dtype=np.float64).copy()
+
+    def put_embedding(self, key: str, embedding: np.ndarray, prompt_version: str):
+        self._put(key, EMBEDDING_KIND, np.asarray(embedding, dtype=np.float64).tobytes(), prompt_version)
+
+    def put_embeddings(self, items: list[tuple[str, np.ndarray]], prompt_version: str):
+        """Stores the (key, embedding) pairs of one embedding batch in a single transaction."""
+        self._put_many(
+            [(key, EMBEDDING_KIND, np.asarray(embedding, dtype=np.float64).tobytes()) for key, embedding in items], prompt_version
+        )
+
+    def get_file_result(self, key: str):
+        value = self._get(key, FILE_KIND)
+        return None if value is None else json.loads(value)
+
+    def put_file_result(self, key: str, result: dict, prompt_version: str):
+        """Stores the per-file analysis (boundaries, code chunks, hashes) of an unchanged file."""
+        self._put(key, FILE_KIND, json.dumps(result).encode("utf-8"), prompt_version)
+
+    def invalidate(self, keep_prompt_version: str = None) -> int:
+        """
+        Removes cached entries. With `keep_prompt_version`, only entries produced
+        by a different prompt are dropped; without it the whole cache is cleared.
+        """
+        with self._lock:
+            if keep_prompt_version is None:
+                cursor = self._conn.execute("DELETE FROM entries")
+            else:
+                cursor = self._conn.execute("DELETE FROM entries WHERE prompt_version != ?", (keep_prompt_version,))
+            self._count, self._bytes = self._totals()
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        # The running totals, so a stats call never scans the table under the lock.
+        with self._lock:
+            count, total = self._count, self._bytes
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,3 +1,5 @@
+import hashlib
+
 PSEUDOCODE_PROMPT = """
 You are an expert in **compiler design** and **formal methods**. Your sole task is to analyze the **computational intent** of the following Python code and convert it into a simple, step-by-step, language-agnostic, debiased algorithmic pseudocode. Your output must be deterministic and focus only on the underlying algorithm.
 
@@ -132,4 +134,25 @@ ASSIGN the selected items to b
 Code:
 {obfuscated_code}
 Pseudocode:
-"""
\ No newline at end of file
+"""
+
+# Batched variant: several small functions share one copy of the rules and
+# examples above. Every function is introduced by a BATCH_FUNCTION_HEADER line
+# and the answer must repeat the number in a BATCH_PSEUDOCODE_HEADER line.
+BATCH_FUNCTION_HEADER = "### FUNCTION {number}"
+BATCH_PSEUDOCODE_HEADER = "### PSEUDOCODE {number}"
+
+BATCH_TASK_TEMPLATE = """**TASK:**
+The code below contains {count} separate functions, each introduced by a line "### FUNCTION <n>". Convert every function on its own, following the rules above. For each function output a line "### PSEUDOCODE <n>" with the same number, followed by that function's pseudocode. Output nothing else.
+
+{obfuscated_functions}
+"""
+
+BATCH_PSEUDOCODE_PROMPT = PSEUDOCODE_PROMPT[:PSEUDOCODE_PROMPT.index("**TASK:**")] + BATCH_TASK_TEMPLATE
+BATCH_USER_PROMPT_TEMPLATE = USER_PROMPT_TEMPLATE[:USER_PROMPT_TEMPLATE.index("**TASK:**")] + BATCH_TASK_TEMPLATE
+
+# Fingerprint of the prompt text. Cached pseudocode is keyed on it, so editing
+# any of the prompts above automatically stops old cache entries from matching.
+PROMPT_VERSION = hashlib.sha256(
+    (PSEUDOCODE_PROMPT + SYSTEM_PROMPT + USER_PROMPT_TEMPLATE + BATCH_TASK_TEMPLATE).encode("utf-8")
+).hexdigest()[:16]
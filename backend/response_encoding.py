@@ -0,0 +1,131 @@
+import os
+import gzip
+import json
+
+# --- CONFIGURATION ---
+# Responses smaller than this are sent uncompressed.
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("VERITAS_RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("VERITAS_RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_ZSTD_LEVEL = int(os.getenv("VERITAS_RESPONSE_ZSTD_LEVEL", "3"))
+
+RESPONSE_FORMATS = ("json", "msgpack")
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+# Preferred first when the client accepts several.
+CONTENT_ENCODINGS = ("zstd", "gzip")
+
+
+class UnsupportedFormatError(ValueError):
+    """The requested response format or encoding needs a package that is not installed."""
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError as e:
+        raise UnsupportedFormatError("MessagePack responses require msgpack (pip install msgpack)") from e
+    return msgpack
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _accepted(header: str) -> dict[str, float]:
+    """{value: q} of an Accept or Accept-Encoding header."""
+    accepted = {}
+    for part in (header or "").split(","):
+        value, _, params = part.strip().partition(";")
+        if not value:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        accepted[value.strip().lower()] = q
+    return accepted
+
+
+def negotiate_format(accept: str, requested: str = None) -> str:
+    """
+    "json" or "msgpack": an explicit `requested` format wins, otherwise
+    MessagePack when the Accept header asks for it (and prefers it to JSON).
+    """
+    if requested is not None:
+        if requested not in RESPONSE_FORMATS:
+            raise ValueError(f"response_format must be one of {', '.join(RESPONSE_FORMATS)}")
+        if requested == "msgpack":
+            _msgpack()
+        return requested
+    accepted = _accepted(accept)
+    msgpack_q = max((accepted.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES), default=0.0)
+    json_q = max(accepted.get("application/json", 0.0), accepted.get("*/*", 0.0))
+    if msgpack_q > 0 and msgpack_q >= json_q:
+        try:
+            _msgpack()
+        except UnsupportedFormatError:
+            return "json"
+        return "msgpack"
+    return "json"
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """The best compression the client accepts and this host supports, or None."""
+    accepted = _accepted(accept_encoding)
+    available = [encoding for encoding in CONTENT_ENCODINGS if encoding != "zstd" or _zstandard() is not None]
+    candidates = [encoding for encoding in available if accepted.get(encoding, accepted.get("*", 0.0)) > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda encoding: accepted.get(encoding, accepted.get("*", 0.0)))
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+    if encoding == "zstd":
+        return _zstandard().ZstdCompressor(level=RESPONSE_ZSTD_LEVEL).compress(body)
+    raise ValueError(f"Unknown content encoding '{encoding}'")
+
+
+def encode_body(payload, response_format: str = "json", encoding: str = None) -> tuple[bytes, dict]:
+    """
+    Serialises `payload` and compresses it when worthwhile. Returns the body
+    and the Content-Type / Content-Encoding headers that go with it.
+    """
+    if response_format == "msgpack":
+        body = _msgpack().packb(payload, use_bin_type=True)
+        headers = {"Content-Type": MSGPACK_MEDIA_TYPES[0]}
+    else:
+        body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, allow_nan=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+    if encoding is not None and len(body) >= RESPONSE_COMPRESS_MIN_BYTES:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    headers["Vary"] = "Accept, Accept-Encoding"
+    return body, headers
+
+
+def compact_analysis_response(response: dict, include_code_chunks: bool = True, include_boundary_hashes: bool = True) -> dict:
+    """
+    Drops the heavy, optional parts of an /analyze-zip/ payload. Without code
+    chunks the response carries their lengths as "code_lengths", which is all
+    /compare-hashes/ needs. The per-file hash lists repeat the top-level
+    "hashes" in file order, so clients can rebuild them from the boundaries.
+    """
+    if include_code_chunks and include_boundary_hashes:
+        return response
+    response = dict(response)
+    if not include_code_chunks:
+        response["code_lengths"] = [len(chunk) for chunk in response.pop("code_chunks")]
+    if not include_boundary_hashes:
+        response["boundaries_json"] = [
+            {key: value for key, value in entry.items() if key != "hashes"} for entry in response["boundaries_json"]
+        ]
+    return response
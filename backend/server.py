@@ -1,24 +1,41 @@
 import os
 import re
+import json
+import asyncio
+import time
 import numpy as np
 import math
 import subprocess
 import logging
+import threading
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Body
-from fastapi.responses import JSONResponse
-import zipfile
-import tempfile
-import shutil
-from pathlib import Path
-from main import generate_chain, run_pipeline_for_files, calculate_advanced_score
+from fastapi import FastAPI, File, UploadFile, HTTPException, Body, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from main import generate_chain, warm_up_models, run_pipeline_for_files, aiter_pipeline_events, calculate_advanced_score, FingerprintingError
+from pipeline_cache import PipelineCache
+from pseudocode_prompt import PROMPT_VERSION
+from fingerprint import HASH_FORMATS, serialize_fingerprint
+from match_selection import MATCH_MODES
+from fingerprint_index import FingerprintIndex, INDEX_PATH
+from submission_store import SubmissionStore, UnknownSubmissionError, compare_submissions
+from structural_fingerprint import FINGERPRINT_ENGINES
+from zip_ingest import read_zip_sources, ZipIngestError, ZipLimitError
+from job_queue import JobQueue, QueueFullError, QUEUED, SUCCEEDED, FAILED
+from parallel_extract import shutdown_executor
+from js_minifier_pool import close_minifier_pool
+from asi_client import close_asi_client
+from response_encoding import (
+    negotiate_format, negotiate_encoding, encode_body, compact_analysis_response, UnsupportedFormatError
+)
+from metrics import REGISTRY, CONTENT_TYPE, HTTP_REQUESTS, QUEUE_DEPTH, stage_timer, trace, install_trace_logging
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging; every line carries the trace id of the request or job it belongs to.
+install_trace_logging()
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s")
 logger = logging.getLogger(__name__)
 
 app = FastAPI(debug=True)
@@ -28,90 +45,442 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
-llm_chain, embedding_model = generate_chain()
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Runs each request under a trace id (the caller's X-Trace-Id header or a
+    fresh one), returns it in the response headers and records the latency.
+    """
+    with trace(request.headers.get("X-Trace-Id")) as trace_id:
+        start = time.perf_counter()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        HTTP_REQUESTS.observe(
+            time.perf_counter() - start,
+            method=request.method, route=route.path if route is not None else "unmatched", status=response.status_code
+        )
+        response.headers["X-Trace-Id"] = trace_id
+        return response
+# The models are created on first use (or by the warm-up task at startup),
+# so a worker accepts connections before LangChain is even imported.
+MODEL_WARMUP_RETRY_SECONDS = float(os.getenv("VERITAS_MODEL_WARMUP_RETRY_SECONDS", "15"))
+_models = None
+_models_lock = threading.Lock()
+model_status = {"state": "cold", "error": None, "warmup_seconds": None}
+
+def get_models() -> tuple:
+    """Returns (llm_chain, embedding_model), creating them on first call. Blocks."""
+    global _models
+    with _models_lock:
+        if _models is None:
+            _models = generate_chain()
+        return _models
+
+def models_for(engine: str) -> tuple:
+    """The structural engine runs without any model."""
+    return (None, None) if engine == "structural" else get_models()
+
+async def warm_up():
+    """Loads the models in the background, retrying until the model server answers."""
+    model_status["state"] = "warming"
+    start = time.perf_counter()
+    while True:
+        try:
+            await asyncio.to_thread(lambda: warm_up_models(*get_models()))
+            break
+        except Exception as e:
+            logger.error(f"Model warm-up failed, retrying in {MODEL_WARMUP_RETRY_SECONDS:.0f}s: {str(e)}")
+            model_status.update(state="failed", error=str(e))
+            await asyncio.sleep(MODEL_WARMUP_RETRY_SECONDS)
+    model_status.update(state="ready", error=None, warmup_seconds=time.perf_counter() - start)
+    logger.info(f"Models ready after {model_status['warmup_seconds']:.1f}s")
+
+pipeline_cache = PipelineCache()
+# Entries produced by an older prompt can never be hit again, so free their space.
+logger.info(f"Dropped {pipeline_cache.invalidate(keep_prompt_version=PROMPT_VERSION)} stale cache entries")
+fingerprint_index = FingerprintIndex.load_or_create(INDEX_PATH)
+logger.info(f"Loaded fingerprint index with {len(fingerprint_index)} functions from {len(fingerprint_index.submissions)} submissions")
+# Registrations are snapshotted to INDEX_PATH at most this often (and on
+# shutdown) rather than after every one; a crash loses at most this window.
+INDEX_SAVE_INTERVAL_SECONDS = float(os.getenv("VERITAS_INDEX_SAVE_INTERVAL_SECONDS", "30"))
+# With "1", submissions analysed with the LLM engine are also added to the
+# search index; otherwise clients register them through /index/register/.
+INDEX_AUTO_REGISTER = os.getenv("VERITAS_INDEX_AUTO_REGISTER", "0") == "1"
+submission_store = SubmissionStore()
+# Largest number of pairs one /submissions/compare/ request may ask for.
+COMPARE_MAX_PAIRS = int(os.getenv("VERITAS_COMPARE_MAX_PAIRS", "10000"))
+
+def validate_zip_request(zip_file: UploadFile, hash_format: str, engine: str = "llm"):
+    if not zip_file.filename.endswith('.zip'):
+        raise HTTPException(status_code=400, detail="File must be a ZIP archive")
+    if hash_format not in HASH_FORMATS:
+        raise HTTPException(status_code=400, detail=f"hash_format must be one of {', '.join(HASH_FORMATS)}")
+    if engine not in FINGERPRINT_ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine must be one of {', '.join(FINGERPRINT_ENGINES)}")
+
+def read_archive_sources(archive) -> tuple[list[tuple[str, str]], dict]:
+    """
+    Reads the Python and JavaScript sources of an archive (path or file
+    object) in memory, mapping ingestion errors to HTTP errors.
+    """
+    try:
+        with stage_timer("ingest"):
+            sources, report = read_zip_sources(archive)
+    except ZipLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ZipIngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Read {report['sources']} source file(s) from {report['members']} archive member(s): "
+                f"{report['ignored']} ignored, {report['unsupported']} unsupported, {report['duplicates']} duplicate(s)")
+    return sources, report
+
+def negotiate_response(request: Request, response_format: str = None) -> tuple[str, str]:
+    """
+    Picks the body format (the `response_format` parameter, else the Accept
+    header) and compression (Accept-Encoding) before any work is done.
+    """
+    try:
+        return negotiate_format(request.headers.get("accept"), response_format), negotiate_encoding(request.headers.get("accept-encoding"))
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def prefilter_fingerprints(submission_id: str) -> list:
+    """
+    Fingerprints of a stored structural submission, the reference set of the
+    LLM prefilter. Raises UnknownSubmissionError, or ValueError if the
+    submission was not fingerprinted with engine=structural.
+    """
+    submission = submission_store.get(submission_id)
+    if submission["metadata"].get("engine") != "structural":
+        raise ValueError(f"Submission {submission_id} was not fingerprinted with engine=structural and cannot be a prefilter")
+    return submission["fingerprints"]
+
+async def load_prefilter(submission_id: Optional[str], engine: str) -> Optional[list]:
+    if submission_id is None:
+        return None
+    if engine != "llm":
+        raise HTTPException(status_code=400, detail="prefilter_submission_id only applies to engine=llm")
+    try:
+        return await asyncio.to_thread(prefilter_fingerprints, submission_id)
+    except UnknownSubmissionError:
+        raise HTTPException(status_code=404, detail="Unknown prefilter submission")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def encoded_response(payload: dict, negotiated: tuple[str, str], status_code: int = 200) -> Response:
+    body, headers = encode_body(payload, *negotiated)
+    return Response(content=body, status_code=status_code, headers=headers)
+
+def index_submission(submission: dict, fingerprints: list, engine: str) -> dict:
+    """
+    With INDEX_AUTO_REGISTER, adds an analysed submission to the search
+    index. Structural hashes are not comparable with the LLM ones the index
+    holds, so only LLM submissions are added. Blocks.
+    """
+    indexed = INDEX_AUTO_REGISTER and engine == "llm" and bool(fingerprints)
+    if indexed:
+        try:
+            fingerprint_index.add(submission["submission_id"], fingerprints)
+        except ValueError as e:
+            logger.error(f"Indexing submission {submission['submission_id']} failed: {str(e)}")
+            indexed = False
+    return {**submission, "indexed": indexed}
+
+def build_analysis_response(fingerprints: list, code_chunks: list, boundaries_dict: dict, hash_format: str, stats: dict = None, ingest: dict = None, submission: dict = None) -> dict:
+    fingerprints_array = [serialize_fingerprint(fp, hash_format) for fp in fingerprints]
+    logger.info(f"Generated {len(fingerprints_array)} fingerprints")
+    # Per-file hashes have always been sent as '0'/'1' strings.
+    boundary_format = "string" if hash_format == "bits" else hash_format
+
+    boundaries_json_response = [{
+        "filename": filename,
+        "boundaries": functions["boundaries"],
+        "hashes": [serialize_fingerprint(fp, boundary_format) for fp in functions["hashes"]]
+    } for filename, functions in boundaries_dict.items()]
+
+    response = {
+        "status": "success",
+        "hashes": fingerprints_array,
+        "code_chunks": code_chunks,
+        "boundaries_json": boundaries_json_response
+    }
+    if stats is not None:
+        response["reuse"] = stats
+    if ingest is not None:
+        response["ingest"] = ingest
+    if submission is not None:
+        response["submission_id"] = submission["submission_id"]
+        response["submission_digest"] = submission["digest"]
+        response["indexed"] = submission.get("indexed", False)
+    return response
 
 @app.post("/analyze-zip/")
-async def analyze_zip(zip_file: UploadFile = File(...)):
+async def analyze_zip(
+    request: Request,
+    zip_file: UploadFile = File(...),
+    hash_format: str = "bits",
+    engine: str = "llm",
+    prefilter_submission_id: Optional[str] = None,
+    response_format: Optional[str] = None,
+    include_code_chunks: bool = True,
+    include_boundary_hashes: bool = True
+):
     """
     Analyzes code files from an uploaded ZIP archive.
+    `hash_format` selects how fingerprints are sent back: "bits" (a list of
+    0/1 integers per hash), "string", or the packed "b64"/"hex" forms.
+    `engine` is "llm" (pseudocode embeddings) or "structural" (local AST
+    SimHash, much faster; only comparable with other structural hashes).
+    With `prefilter_submission_id`, a submission stored with
+    engine=structural (e.g. the corpus this one will be compared with),
+    only functions structurally close to one of its functions are sent to
+    the LLM; the rest are listed under "reuse.prefiltered_functions".
+
+    The body is JSON or, when `response_format=msgpack` or the Accept header
+    asks for application/msgpack, MessagePack; it is compressed with zstd or
+    gzip according to Accept-Encoding. `include_code_chunks=false` sends only
+    the chunk lengths and `include_boundary_hashes=false` leaves out the
+    per-file copies of the hashes.
+
+    The result is stored as a submission; compare it with others by the
+    returned "submission_id" through /submissions/compare/. It is only
+    searchable through /index/search/ once its hashes are sent to
+    /index/register/, unless VERITAS_INDEX_AUTO_REGISTER=1 adds LLM results
+    automatically; "indexed" says whether that happened.
+
+    Functions the LLM failed on are left out of the hashes, code chunks and
+    boundaries and listed under "reuse.failed_functions"; if it failed on
+    every function the response is a 502.
     """
     logger.info("Request received for ZIP analysis")
-    if not zip_file.filename.endswith('.zip'):
-        raise HTTPException(status_code=400, detail="File must be a ZIP archive")
+    validate_zip_request(zip_file, hash_format, engine)
+    negotiated = negotiate_response(request, response_format)
+    prefilter = await load_prefilter(prefilter_submission_id, engine)
     
-    # Create temporary directory for extraction
-    with tempfile.TemporaryDirectory() as temp_dir:
-        zip_path = Path(temp_dir) / zip_file.filename
-        
-        # Save uploaded file
-        with open(zip_path, "wb") as buffer:
-            shutil.copyfileobj(zip_file.file, buffer)
-        
-        # Extract ZIP contents
-        extract_dir = Path(temp_dir) / "extracted"
-        extract_dir.mkdir()
-        
-        try:
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
-        except zipfile.BadZipFile:
-            raise HTTPException(status_code=400, detail="Invalid ZIP file")
-        
-        # Find Python and JavaScript files
-        supported_extensions = ['.py', '.js']
-        file_paths = []
-        
-        for ext in supported_extensions:
-            file_paths.extend(extract_dir.rglob(f'*{ext}'))
-        
-        if not file_paths:
-            raise HTTPException(status_code=400, detail="No Python or JavaScript files found in ZIP")
-        
-        # Convert to string paths
-        file_paths_str = [str(path) for path in file_paths]
-        
+    # Reading the archive and the pipeline block, so keep them off the event loop.
+    sources, ingest = await asyncio.to_thread(read_archive_sources, zip_file.file)
+
+    try:
+        llm_chain, embedding_model = await asyncio.to_thread(models_for, engine)
+        fingerprints, code_chunks, boundaries_dict, stats = await asyncio.to_thread(
+            run_pipeline_for_files, sources, llm_chain, embedding_model, cache=pipeline_cache, return_stats=True, engine=engine, prefilter=prefilter
+        )
+        submission = await asyncio.to_thread(
+            submission_store.add, fingerprints, code_chunks, metadata={"filename": zip_file.filename, "engine": engine}
+        )
+        submission = await asyncio.to_thread(index_submission, submission, fingerprints, engine)
+        response = build_analysis_response(fingerprints, code_chunks, boundaries_dict, hash_format, stats, ingest, submission)
+        return await asyncio.to_thread(
+            encoded_response, compact_analysis_response(response, include_code_chunks, include_boundary_hashes), negotiated
+        )
+
+    except FingerprintingError as e:
+        logger.error(f"Processing error: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Processing error: {str(e)}")
+    except Exception as e:
+        logger.error(f"Processing error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+
+@app.post("/analyze-zip/stream/")
+async def analyze_zip_stream(
+    zip_file: UploadFile = File(...),
+    hash_format: str = "bits",
+    engine: str = "llm",
+    prefilter_submission_id: Optional[str] = None,
+    include_code_chunks: bool = True,
+    include_boundary_hashes: bool = True
+):
+    """
+    Streaming variant of /analyze-zip/. Responds with newline-delimited JSON
+    events: "started" with the file list, "boundaries" for each parsed file,
+    "hash" for each function as soon as its fingerprint is ready, and a final
+    "summary" carrying the same payload /analyze-zip/ returns (or "error").
+    The include_* flags, `prefilter_submission_id` and index registration
+    work as they do for /analyze-zip/.
+    """
+    logger.info("Request received for streaming ZIP analysis")
+    validate_zip_request(zip_file, hash_format, engine)
+    prefilter = await load_prefilter(prefilter_submission_id, engine)
+
+    sources, ingest = await asyncio.to_thread(read_archive_sources, zip_file.file)
+
+    async def stream_events():
         try:
-            fingerprints, code_chunks, boundaries_dict = run_pipeline_for_files(file_paths_str, llm_chain, embedding_model)
-            fingerprints_array = [[int(fp[i]) for i in range(len(fp))] for fp in fingerprints]
-            logger.info(f"Generated {len(fingerprints_array)} fingerprints")
-
-            boundaries_json_response = [{
-                "filename": filename,
-                "boundaries": functions["boundaries"],
-                "hashes": functions["hashes"]
-            } for filename, functions in boundaries_dict.items()]
-
-            return JSONResponse(content={
-                "status": "success",
-                "hashes": fingerprints_array,
-                "code_chunks": code_chunks,
-                "boundaries_json": boundaries_json_response
-            })
-            
+            yield json.dumps({"event": "started", "files": [name for name, _ in sources], "ingest": ingest}) + "\n"
+            llm_chain, embedding_model = await asyncio.to_thread(models_for, engine)
+            async for event in aiter_pipeline_events(sources, llm_chain, embedding_model, cache=pipeline_cache, engine=engine, prefilter=prefilter):
+                if event["event"] == "hash":
+                    event = {**event, "fingerprint": serialize_fingerprint(event["fingerprint"], hash_format)}
+                elif event["event"] == "summary":
+                    submission = await asyncio.to_thread(
+                        submission_store.add, event["fingerprints"], event["code_chunks"], metadata={"filename": zip_file.filename, "engine": engine}
+                    )
+                    submission = await asyncio.to_thread(index_submission, submission, event["fingerprints"], engine)
+                    response = build_analysis_response(event["fingerprints"], event["code_chunks"], event["boundaries"], hash_format, event["stats"], ingest, submission)
+                    event = {"event": "summary", **compact_analysis_response(response, include_code_chunks, include_boundary_hashes)}
+                yield json.dumps(event) + "\n"
         except Exception as e:
             logger.error(f"Processing error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+            yield json.dumps({"event": "error", "detail": f"Processing error: {str(e)}"}) + "\n"
+
+    return StreamingResponse(stream_events(), media_type="application/x-ndjson")
+
+JOB_ARCHIVE_NAME = "upload.zip"
+
+def run_analysis_job(job_dir: str, params: dict) -> dict:
+    """
+    Job handler: runs the /analyze-zip/ pipeline on an archive stored in `job_dir`.
+    """
+    with stage_timer("ingest"):
+        sources, ingest = read_zip_sources(os.path.join(job_dir, JOB_ARCHIVE_NAME))
+    engine = params.get("engine", "llm")
+    prefilter = prefilter_fingerprints(params["prefilter_submission_id"]) if params.get("prefilter_submission_id") else None
+    llm_chain, embedding_model = models_for(engine)
+    fingerprints, code_chunks, boundaries_dict, stats = run_pipeline_for_files(
+        sources, llm_chain, embedding_model, cache=pipeline_cache, return_stats=True, engine=engine, prefilter=prefilter
+    )
+    submission = submission_store.add(fingerprints, code_chunks, metadata={"filename": params.get("filename"), "engine": engine})
+    submission = index_submission(submission, fingerprints, engine)
+    return build_analysis_response(fingerprints, code_chunks, boundaries_dict, params["hash_format"], stats, ingest, submission)
+
+job_queue = JobQueue(run_analysis_job)
+REGISTRY.add_collector(lambda: QUEUE_DEPTH.set(job_queue.queued_count(), queue="jobs"))
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+
+async def snapshot_index():
+    """Saves the fingerprint index periodically while it has unsaved registrations."""
+    while True:
+        await asyncio.sleep(INDEX_SAVE_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(fingerprint_index.save_if_changed, INDEX_PATH)
+        except Exception as e:
+            logger.error(f"Saving the fingerprint index failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_index_snapshots():
+    app.state.index_snapshot_task = asyncio.create_task(snapshot_index())
+
+@app.on_event("startup")
+async def start_model_warmup():
+    # Not awaited: the worker serves /healthz (and structural requests) while the models load.
+    app.state.warmup_task = asyncio.create_task(warm_up())
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return JSONResponse(content={"status": "success", "alive": True})
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness probe: 200 once the models are loaded and warm, 503 before
+    that or if the warm-up failed.
+    """
+    ready = model_status["state"] == "ready"
+    return JSONResponse(status_code=200 if ready else 503, content={"status": "success" if ready else "error", "ready": ready, **model_status})
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    app.state.warmup_task.cancel()
+    app.state.index_snapshot_task.cancel()
+    await asyncio.to_thread(fingerprint_index.save_if_changed, INDEX_PATH)
+    await asyncio.to_thread(job_queue.stop)
+    await asyncio.to_thread(shutdown_executor)
+    await asyncio.to_thread(close_minifier_pool)
+    await asyncio.to_thread(close_asi_client)
+    await asyncio.to_thread(submission_store.close)
+
+@app.post("/jobs/analyze-zip/", status_code=202)
+async def submit_analysis_job(zip_file: UploadFile = File(...), hash_format: str = "bits", engine: str = "llm", prefilter_submission_id: Optional[str] = None):
+    """
+    Queues an archive for analysis and returns a job id immediately. Poll
+    /jobs/{job_id} for progress and /jobs/{job_id}/result for the payload
+    /analyze-zip/ would have returned.
+    """
+    logger.info("Request received for queued ZIP analysis")
+    validate_zip_request(zip_file, hash_format, engine)
+    await load_prefilter(prefilter_submission_id, engine)
+    try:
+        job_id = await asyncio.to_thread(
+            job_queue.submit,
+            {"hash_format": hash_format, "engine": engine, "filename": zip_file.filename, "prefilter_submission_id": prefilter_submission_id},
+            {JOB_ARCHIVE_NAME: zip_file.file}
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    logger.info(f"Queued job {job_id}")
+    return JSONResponse(status_code=202, content={"status": "success", "job_id": job_id, "job_status": QUEUED})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Returns the status of a queued analysis job.
+    """
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    job["job_status"] = job.pop("status")
+    return JSONResponse(content={"status": "success", **job})
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(
+    request: Request,
+    job_id: str,
+    response_format: Optional[str] = None,
+    include_code_chunks: bool = True,
+    include_boundary_hashes: bool = True
+):
+    """
+    Returns the analysis result of a finished job, negotiated and trimmed
+    like the /analyze-zip/ response.
+    """
+    negotiated = negotiate_response(request, response_format)
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Processing error: {job['error']}")
+    if job["status"] != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    result = await asyncio.to_thread(job_queue.result, job_id)
+    return await asyncio.to_thread(
+        encoded_response, compact_analysis_response(result, include_code_chunks, include_boundary_hashes), negotiated
+    )
 
 class HashComparisonRequest(BaseModel):
     hashes_a: List[str]
     code_chunks_a: List[int] 
     hashes_b: List[str]
     code_chunks_b: List[int]
+    match_mode: str = "greedy"
 
 @app.post("/compare-hashes/")
 async def compare_hashes(request: HashComparisonRequest):
     """
     Compares two lists of hashes and returns a similarity score.
+    Each hash may be a '0'/'1' string or a packed "b64:"/"hex:" string.
     """
     logger.info("Request received for hash comparison")
+    if request.match_mode not in MATCH_MODES:
+        raise HTTPException(status_code=400, detail=f"match_mode must be one of {', '.join(MATCH_MODES)}")
     
     try:
         final_score, selected_matches = calculate_advanced_score(
             request.hashes_a, 
             request.code_chunks_a, 
             request.hashes_b,
-            request.code_chunks_b
+            request.code_chunks_b,
+            match_mode=request.match_mode
         )
         
         logger.info(f"Calculated similarity score: {final_score}")
@@ -126,6 +495,182 @@ async def compare_hashes(request: HashComparisonRequest):
         logger.error(f"Hash comparison error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Hash comparison error: {str(e)}")
 
+class RegisterSubmissionRequest(BaseModel):
+    submission_id: str
+    hashes: List[str]
+
+@app.post("/index/register/")
+async def register_submission(request: RegisterSubmissionRequest):
+    """
+    Adds the function fingerprints of one submission to the search index.
+    The index is written to disk by the periodic snapshot, not per request.
+    """
+    logger.info(f"Registering submission {request.submission_id} in the fingerprint index")
+    try:
+        added = await asyncio.to_thread(fingerprint_index.add, request.submission_id, request.hashes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content={"status": "success", "submission_id": request.submission_id, "functions_added": added})
+
+class StoreSubmissionRequest(BaseModel):
+    hashes: List[str]
+    code_chunks: List[int]
+    submission_id: Optional[str] = None
+    engine: str = "llm"
+
+@app.post("/submissions/")
+async def store_submission(request: StoreSubmissionRequest):
+    """
+    Stores hashes and chunk lengths obtained earlier (e.g. an /analyze-zip/
+    response from before submissions were stored) for /submissions/compare/.
+    Submissions analysed by /analyze-zip/ are stored automatically.
+    """
+    if request.engine not in FINGERPRINT_ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine must be one of {', '.join(FINGERPRINT_ENGINES)}")
+    try:
+        submission = await asyncio.to_thread(
+            submission_store.add, request.hashes, request.code_chunks, request.submission_id, {"engine": request.engine}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content={"status": "success", "submission_id": submission["submission_id"], "submission_digest": submission["digest"]})
+
+@app.get("/submissions/{submission_id}")
+async def get_submission(submission_id: str):
+    """
+    Returns what is stored about a submission, without its hashes.
+    """
+    try:
+        submission = await asyncio.to_thread(submission_store.get, submission_id)
+    except UnknownSubmissionError:
+        raise HTTPException(status_code=404, detail="Unknown submission")
+    return JSONResponse(content={
+        "status": "success",
+        "submission_id": submission_id,
+        "submission_digest": submission["digest"],
+        "functions": len(submission["fingerprints"]),
+        "created_at": submission["created_at"],
+        **submission["metadata"]
+    })
+
+@app.delete("/submissions/{submission_id}")
+async def delete_submission(submission_id: str):
+    if not await asyncio.to_thread(submission_store.delete, submission_id):
+        raise HTTPException(status_code=404, detail="Unknown submission")
+    return JSONResponse(content={"status": "success", "submission_id": submission_id})
+
+class CompareSubmissionsRequest(BaseModel):
+    query_ids: List[str]
+    candidate_ids: Optional[List[str]] = None
+    match_mode: str = "greedy"
+    include_matches: bool = True
+
+@app.post("/submissions/compare/")
+async def compare_stored_submissions(request: CompareSubmissionsRequest):
+    """
+    Compares stored submissions by id: every query against every candidate
+    (one-vs-N with a single query), or every query against every other
+    query when `candidate_ids` is omitted (N-vs-N). Each result carries the
+    score /compare-hashes/ would return for that pair. Pair scores are
+    memoised by submission digest, so repeated comparisons are not recomputed.
+    """
+    logger.info(f"Request received to compare {len(request.query_ids)} submissions against {len(request.candidate_ids or request.query_ids)}")
+    if request.match_mode not in MATCH_MODES:
+        raise HTTPException(status_code=400, detail=f"match_mode must be one of {', '.join(MATCH_MODES)}")
+    if not request.query_ids:
+        raise HTTPException(status_code=400, detail="query_ids must not be empty")
+    pairs = len(set(request.query_ids)) * len(set(request.candidate_ids if request.candidate_ids is not None else request.query_ids))
+    if pairs > COMPARE_MAX_PAIRS:
+        raise HTTPException(status_code=400, detail=f"Too many pairs ({pairs}); at most {COMPARE_MAX_PAIRS} per request")
+
+    start = time.perf_counter()
+    try:
+        results, stats = await asyncio.to_thread(
+            compare_submissions, submission_store, request.query_ids, request.candidate_ids, request.match_mode
+        )
+    except UnknownSubmissionError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not request.include_matches:
+        for result in results:
+            del result["selected_matches"]
+    logger.info(f"Compared {stats['pairs']} pairs ({stats['memoised']} memoised)")
+
+    return JSONResponse(content={
+        "status": "success",
+        "results": results,
+        "stats": stats,
+        "elapsed_ms": (time.perf_counter() - start) * 1000
+    })
+
+class FingerprintSearchRequest(BaseModel):
+    hashes: List[str]
+    radius: Optional[int] = None
+    top_k: int = 10
+    exact: bool = False
+
+@app.post("/index/search/")
+async def search_index(request: FingerprintSearchRequest):
+    """
+    Finds registered functions close to each queried hash, and ranks the
+    submissions they belong to by how many query functions they match.
+    Hits come from the LSH buckets, which can miss distant neighbours; set
+    `exact` to scan the whole index instead.
+    """
+    logger.info(f"Request received for index search over {len(request.hashes)} hashes")
+    start = time.perf_counter()
+    try:
+        function_matches = await asyncio.to_thread(
+            fingerprint_index.search_many, request.hashes, request.radius, request.top_k, request.exact
+        )
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid hash: {str(e)}")
+
+    submissions = {}
+    for query_index, hits in enumerate(function_matches):
+        for hit in hits:
+            summary = submissions.setdefault(hit["submission_id"], {"submission_id": hit["submission_id"], "query_functions": set(), "best_similarity": 0.0})
+            summary["query_functions"].add(query_index)
+            summary["best_similarity"] = max(summary["best_similarity"], hit["similarity"])
+    candidates = sorted(
+        ({**summary, "query_functions": sorted(summary["query_functions"])} for summary in submissions.values()),
+        key=lambda summary: (-len(summary["query_functions"]), -summary["best_similarity"], summary["submission_id"])
+    )
+
+    return JSONResponse(content={
+        "status": "success",
+        "candidates": candidates,
+        "function_matches": function_matches,
+        "elapsed_ms": (time.perf_counter() - start) * 1000
+    })
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, function throughput,
+    LLM calls and tokens, cache lookups, queue depth and HTTP latency.
+    """
+    return Response(content=await asyncio.to_thread(REGISTRY.render), media_type=CONTENT_TYPE)
+
+@app.get("/cache/stats/")
+async def cache_stats():
+    """
+    Returns hit/miss counters and the current size of the pipeline cache.
+    """
+    stats = await asyncio.to_thread(pipeline_cache.stats)
+    return JSONResponse(content={"status": "success", "prompt_version": PROMPT_VERSION, **stats})
+
+@app.post("/cache/invalidate/")
+async def cache_invalidate(stale_only: bool = True):
+    """
+    Drops cached pseudocode and embeddings. By default only entries produced
+    with a different prompt version are removed.
+    """
+    removed = await asyncio.to_thread(pipeline_cache.invalidate, PROMPT_VERSION if stale_only else None)
+    logger.info(f"Invalidated {removed} cache entries")
+    return JSONResponse(content={"status": "success", "removed": removed})
+
 if __name__ == "__main__":
     uvicorn.run(
         "server:app", 
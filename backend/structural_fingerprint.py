@@ -0,0 +1,218 @@
+import os
+import ast
+import hashlib
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+import esprima
+
+from fingerprint import PackedFingerprint, stack_fingerprints, pairwise_hamming
+from extract_functions import JavaScriptFunctionVisitor
+from minifier_code import NORMALIZATION_TOKEN_PATTERN
+
+# --- CONFIGURATION ---
+STRUCTURAL_FINGERPRINT_BITS = int(os.getenv("VERITAS_STRUCTURAL_FINGERPRINT_BITS", "256"))
+NGRAM_SIZES = (1, 2, 3)
+
+FINGERPRINT_ENGINES = ("llm", "structural")
+
+# Python and JavaScript node types mapped onto one vocabulary, so the same
+# algorithm written in either language yields similar features. Types not
+# listed keep their own name.
+PYTHON_LABELS = {
+    'FunctionDef': 'FUNC', 'AsyncFunctionDef': 'FUNC', 'Lambda': 'FUNC',
+    'For': 'LOOP', 'AsyncFor': 'LOOP', 'While': 'LOOP', 'comprehension': 'LOOP',
+    'ListComp': 'LIST', 'List': 'LIST', 'Tuple': 'LIST', 'SetComp': 'LIST', 'Set': 'LIST',
+    'GeneratorExp': 'LIST', 'DictComp': 'MAP', 'Dict': 'MAP',
+    'If': 'BRANCH', 'IfExp': 'BRANCH', 'Match': 'BRANCH',
+    'Return': 'RETURN', 'Yield': 'RETURN', 'YieldFrom': 'RETURN',
+    'Call': 'CALL', 'Attribute': 'ATTR', 'Subscript': 'INDEX', 'Slice': 'INDEX',
+    'Name': 'NAME', 'arg': 'NAME', 'Constant': 'CONST',
+    'Assign': 'ASSIGN', 'AnnAssign': 'ASSIGN', 'AugAssign': 'ASSIGN', 'NamedExpr': 'ASSIGN',
+    'BinOp': 'BINOP', 'BoolOp': 'LOGIC', 'UnaryOp': 'UNARY', 'Compare': 'CMP',
+    'Try': 'TRY', 'ExceptHandler': 'CATCH', 'Raise': 'THROW',
+    'Break': 'BREAK', 'Continue': 'CONTINUE', 'Expr': 'STMT',
+}
+JS_LABELS = {
+    'FunctionDeclaration': 'FUNC', 'FunctionExpression': 'FUNC', 'ArrowFunctionExpression': 'FUNC',
+    'ForStatement': 'LOOP', 'ForInStatement': 'LOOP', 'ForOfStatement': 'LOOP',
+    'WhileStatement': 'LOOP', 'DoWhileStatement': 'LOOP',
+    'ArrayExpression': 'LIST', 'ObjectExpression': 'MAP',
+    'IfStatement': 'BRANCH', 'ConditionalExpression': 'BRANCH', 'SwitchStatement': 'BRANCH',
+    'ReturnStatement': 'RETURN', 'YieldExpression': 'RETURN',
+    'CallExpression': 'CALL', 'NewExpression': 'CALL', 'Identifier': 'NAME', 'Literal': 'CONST',
+    'AssignmentExpression': 'ASSIGN', 'VariableDeclarator': 'ASSIGN', 'UpdateExpression': 'ASSIGN',
+    'BinaryExpression': 'BINOP', 'LogicalExpression': 'LOGIC', 'UnaryExpression': 'UNARY',
+    'TryStatement': 'TRY', 'CatchClause': 'CATCH', 'ThrowStatement': 'THROW',
+    'BreakStatement': 'BREAK', 'ContinueStatement': 'CONTINUE', 'ExpressionStatement': 'STMT',
+}
+CONTROL_LABELS = {'FUNC', 'LOOP', 'BRANCH', 'RETURN', 'TRY', 'CATCH', 'THROW', 'BREAK', 'CONTINUE'}
+# Structural noise that only one of the languages has.
+SKIPPED_LABELS = {'Load', 'Store', 'Del', 'arguments', 'keyword', 'BlockStatement', 'VariableDeclaration', 'Program', 'Module'}
+
+PYTHON_OPERATORS = {
+    'Add': '+', 'Sub': '-', 'Mult': '*', 'Div': '/', 'FloorDiv': '/', 'Mod': '%', 'Pow': '**',
+    'LShift': '<<', 'RShift': '>>', 'BitOr': '|', 'BitXor': '^', 'BitAnd': '&', 'MatMult': '*',
+    'And': '&&', 'Or': '||', 'Not': '!', 'USub': '-', 'UAdd': '+', 'Invert': '~',
+    'Eq': '==', 'NotEq': '!=', 'Lt': '<', 'LtE': '<=', 'Gt': '>', 'GtE': '>=',
+    'Is': '==', 'IsNot': '!=', 'In': 'in', 'NotIn': 'in',
+}
+JS_OPERATORS = {'===': '==', '!==': '!=', '++': '+', '--': '-'}
+
+
+# Fields that never lead to structure: operators are folded into their
+# parent's label and expression contexts are the same in both languages.
+PYTHON_SKIPPED_FIELDS = {'ctx', 'op', 'ops', 'type_comment', 'kind'}
+_python_child_fields = {}
+_python_labels = {}
+
+
+def _python_label(node: ast.AST) -> str:
+    op = node.ops[0] if isinstance(node, ast.Compare) else getattr(node, 'op', None)
+    key = (type(node), type(op))
+    label = _python_labels.get(key)
+    if label is None:
+        name = type(node).__name__
+        label = PYTHON_LABELS.get(name, name)
+        if op is not None:
+            label = f"{label}:{PYTHON_OPERATORS.get(type(op).__name__, type(op).__name__)}"
+        _python_labels[key] = label
+    return label
+
+
+def _python_nodes(tree: ast.AST):
+    """
+    (label, depth, control path) for every node in preorder; the path of
+    enclosing control constructs is only given for control nodes.
+    """
+    stack = [(tree, 0, ())]
+    while stack:
+        node, depth, path = stack.pop()
+        label = _python_label(node)
+        control = label.split(':')[0] in CONTROL_LABELS
+        if control:
+            path = path + (label,)
+        if type(node).__name__ not in SKIPPED_LABELS:
+            yield label, depth, path if control else None
+
+        fields = _python_child_fields.get(type(node))
+        if fields is None:
+            fields = _python_child_fields[type(node)] = tuple(f for f in node._fields if f not in PYTHON_SKIPPED_FIELDS)
+        children = []
+        for field in fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                children.extend(item for item in value if isinstance(item, ast.AST))
+            elif isinstance(value, ast.AST):
+                children.append(value)
+        children.reverse()
+        stack.extend((child, depth + 1, path) for child in children)
+
+
+def _js_label(node) -> str:
+    label = JS_LABELS.get(node.type, node.type)
+    operator = getattr(node, 'operator', None)
+    if operator is not None:
+        operator = operator.rstrip('=') if node.type == 'AssignmentExpression' else operator
+        if operator:
+            label = f"{label}:{JS_OPERATORS.get(operator, operator)}"
+    return label
+
+
+def _js_nodes(tree):
+    stack = [(tree, 0, ())]
+    while stack:
+        node, depth, path = stack.pop()
+        label = _js_label(node)
+        control = label.split(':')[0] in CONTROL_LABELS
+        if control:
+            path = path + (label,)
+        if node.type not in SKIPPED_LABELS:
+            yield label, depth, path if control else None
+        children = list(JavaScriptFunctionVisitor.iter_child_nodes(node))
+        stack.extend((child, depth + 1, path) for child in reversed(children))
+
+
+def _parse(code: str, language: str = None):
+    """Returns an iterator over the AST nodes of `code`, or None if it does not parse."""
+    if language in (None, 'python'):
+        try:
+            return _python_nodes(ast.parse(code))
+        except SyntaxError:
+            if language == 'python':
+                return None
+    # Anonymous function expressions only parse as expressions.
+    for candidate in (code, f"({code})"):
+        for parse in (esprima.parseScript, esprima.parseModule):
+            try:
+                return _js_nodes(parse(candidate))
+            except esprima.Error:
+                continue
+    return None
+
+
+def structural_features(code: str, language: str = None) -> Counter:
+    """
+    Weighted features of one function: n-grams of normalised node labels in
+    preorder, each label with its nesting depth, and the chain of enclosing
+    control-flow constructs of every control node. Identifier names and
+    literal values are ignored. Code that does not parse falls back to
+    n-grams of its token classes.
+    """
+    nodes = _parse(code, language)
+    features = Counter()
+    if nodes is None:
+        labels = ['NAME' if token[0].isalpha() or token[0] in '_$' else 'CONST' if token[0].isdigit() else token
+                  for token in NORMALIZATION_TOKEN_PATTERN.findall(code)]
+    else:
+        labels = []
+        for label, depth, path in nodes:
+            labels.append(label)
+            features[("D", min(depth, 12), label)] += 1
+            if path is not None:
+                features[("CF",) + path[-4:]] += 2
+    for n in NGRAM_SIZES:
+        features.update(zip(*(labels[i:] for i in range(n))))
+    return features
+
+
+@lru_cache(maxsize=1 << 16)
+def _feature_signs(feature: tuple, nbits: int) -> np.ndarray:
+    """+1/-1 per fingerprint bit for one feature, derived from its hash."""
+    digest = hashlib.shake_128("|".join(map(str, feature)).encode("utf-8")).digest(-(-nbits // 8))
+    bits = np.unpackbits(np.frombuffer(digest, dtype=np.uint8), count=nbits)
+    return bits.astype(np.int8) * 2 - 1
+
+
+def structural_fingerprint(code: str, language: str = None, nbits: int = STRUCTURAL_FINGERPRINT_BITS) -> PackedFingerprint:
+    """
+    SimHash of the structural features of one function: every feature votes
+    +weight/-weight on each bit according to its hash, and a bit is set when
+    the total is positive. Runs locally without any model, in the same
+    packed form as the LLM-based fingerprints.
+    """
+    features = structural_features(code, language)
+    if not features:
+        return PackedFingerprint.from_bool_array(np.zeros(nbits, dtype=bool))
+    signs = np.stack([_feature_signs(feature, nbits) for feature in features])
+    weights = np.fromiter(features.values(), dtype=np.int64, count=len(features))
+    return PackedFingerprint.from_bool_array(weights @ signs > 0)
+
+
+def structural_fingerprints(codes: list[str], language: str = None, nbits: int = STRUCTURAL_FINGERPRINT_BITS) -> list[PackedFingerprint]:
+    return [structural_fingerprint(code, language, nbits) for code in codes]
+
+
+def prefilter_candidates(fingerprints_a: list, fingerprints_b: list, max_distance: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Structural prefilter for the LLM path: returns boolean masks of the
+    functions on each side that have at least one structural neighbour on
+    the other side within `max_distance` bits. Only those are worth sending
+    to the LLM; the others cannot be close matches structurally.
+    """
+    fingerprints_a = [PackedFingerprint.from_wire(fp) for fp in fingerprints_a]
+    fingerprints_b = [PackedFingerprint.from_wire(fp) for fp in fingerprints_b]
+    if not fingerprints_a or not fingerprints_b:
+        return np.zeros(len(fingerprints_a), dtype=bool), np.zeros(len(fingerprints_b), dtype=bool)
+    close = pairwise_hamming(stack_fingerprints(fingerprints_a), stack_fingerprints(fingerprints_b)) <= max_distance
+    return close.any(axis=1), close.any(axis=0)
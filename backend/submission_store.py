@@ -0,0 +1,248 @@
+import os
+import json
+import uuid
+import hashlib
+import sqlite3
+import threading
+import time
+
+from fingerprint import PackedFingerprint
+from main import chunk_weight, calculate_advanced_scores, SCORING_VERSION
+from metrics import CACHE_LOOKUPS
+
+# --- CONFIGURATION ---
+SUBMISSIONS_PATH = os.getenv("VERITAS_SUBMISSIONS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "submissions.sqlite3"))
+# Memoised pair scores kept before the least recently used ones are dropped.
+PAIR_SCORES_MAX_ENTRIES = int(os.getenv("VERITAS_PAIR_SCORES_MAX_ENTRIES", "1000000"))
+
+PAIR_SCORE_KIND = "pair_score"
+
+
+def submission_digest(fingerprints: list, code_lengths: list) -> str:
+    """
+    Content address of a submission: its fingerprints and function lengths,
+    i.e. everything `calculate_advanced_score` looks at. Submissions with the
+    same digest score identically, whatever their id.
+    """
+    digest = hashlib.sha256()
+    for fingerprint, length in zip(fingerprints, code_lengths):
+        digest.update(fingerprint.to_base64().encode("ascii"))
+        digest.update(f":{length}\0".encode("ascii"))
+    return digest.hexdigest()
+
+
+class UnknownSubmissionError(KeyError):
+    """Raised when a submission id is not in the store."""
+
+
+class SubmissionStore:
+    """
+    Server-side store of analysed submissions and of the scores computed
+    between them.
+
+    A submission is kept as its packed fingerprints and function lengths, so
+    it can be compared by id without the client sending the hashes again.
+    Pair scores are memoised by (digest A, digest B, match mode, scoring
+    version): re-analysing an unchanged archive yields the same digest and
+    reuses the scores of the original.
+    """
+    def __init__(self, path: str = SUBMISSIONS_PATH, max_pair_scores: int = PAIR_SCORES_MAX_ENTRIES):
+        self.path = path
+        self.max_pair_scores = max_pair_scores
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                id TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                hashes TEXT NOT NULL,
+                code_lengths TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pair_scores (
+                digest_a TEXT NOT NULL,
+                digest_b TEXT NOT NULL,
+                match_mode TEXT NOT NULL,
+                scoring_version TEXT NOT NULL,
+                similarity_score REAL NOT NULL,
+                selected_matches TEXT NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (digest_a, digest_b, match_mode, scoring_version)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pair_scores_last_access ON pair_scores (last_access)")
+
+    def add(self, fingerprints: list, code_chunks: list, submission_id: str = None, metadata: dict = None) -> dict:
+        """
+        Stores a submission; `code_chunks` may be the chunks or their lengths.
+        Returns {"submission_id", "digest"}. Re-using an id replaces it.
+        """
+        fingerprints = [PackedFingerprint.from_wire(fp) for fp in fingerprints]
+        code_lengths = [chunk_weight(chunk) for chunk in code_chunks]
+        if len(fingerprints) != len(code_lengths):
+            raise ValueError(f"Got {len(fingerprints)} hashes but {len(code_lengths)} code chunks")
+        submission_id = submission_id or uuid.uuid4().hex
+        digest = submission_digest(fingerprints, code_lengths)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO submissions (id, digest, hashes, code_lengths, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (submission_id, digest, json.dumps([fp.to_base64() for fp in fingerprints]),
+                 json.dumps(code_lengths), json.dumps(metadata or {}), time.time())
+            )
+        return {"submission_id": submission_id, "digest": digest}
+
+    def get_many(self, submission_ids: list) -> dict:
+        """
+        {id: {"submission_id", "digest", "fingerprints", "code_lengths",
+        "metadata", "created_at"}} of the given ids; raises
+        UnknownSubmissionError if any of them is not stored.
+        """
+        wanted = list(dict.fromkeys(submission_ids))
+        rows = []
+        with self._lock:
+            # Stay below SQLite's limit on bound parameters.
+            for start in range(0, len(wanted), 500):
+                chunk = wanted[start:start + 500]
+                rows += self._conn.execute(
+                    f"SELECT id, digest, hashes, code_lengths, metadata, created_at FROM submissions WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+        submissions = {
+            submission_id: {
+                "submission_id": submission_id,
+                "digest": digest,
+                "fingerprints": [PackedFingerprint.from_wire(fp) for fp in json.loads(hashes)],
+                "code_lengths": json.loads(code_lengths),
+                "metadata": json.loads(metadata),
+                "created_at": created_at
+            }
+            for submission_id, digest, hashes, code_lengths, metadata, created_at in rows
+        }
+        missing = [submission_id for submission_id in wanted if submission_id not in submissions]
+        if missing:
+            raise UnknownSubmissionError(f"Unknown submission id(s): {', '.join(missing)}")
+        return submissions
+
+    def get(self, submission_id: str) -> dict:
+        return self.get_many([submission_id])[submission_id]
+
+    def delete(self, submission_id: str) -> bool:
+        """Removes a submission; its memoised scores stay, as other ids may share its digest."""
+        with self._lock:
+            return self._conn.execute("DELETE FROM submissions WHERE id = ?", (submission_id,)).rowcount > 0
+
+    def get_pair_scores(self, pairs: list, match_mode: str, scoring_version: str) -> dict:
+        """{(digest_a, digest_b): (similarity_score, selected_matches)} of the memoised pairs among `pairs`."""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for digest_a, digest_b in set(pairs):
+                row = self._conn.execute(
+                    "SELECT similarity_score, selected_matches FROM pair_scores "
+                    "WHERE digest_a = ? AND digest_b = ? AND match_mode = ? AND scoring_version = ?",
+                    (digest_a, digest_b, match_mode, scoring_version)
+                ).fetchone()
+                CACHE_LOOKUPS.inc(kind=PAIR_SCORE_KIND, result="miss" if row is None else "hit")
+                if row is not None:
+                    found[(digest_a, digest_b)] = (row[0], [tuple(match) for match in json.loads(row[1])])
+            if found:
+                self._conn.executemany(
+                    "UPDATE pair_scores SET last_access = ? WHERE digest_a = ? AND digest_b = ? AND match_mode = ? AND scoring_version = ?",
+                    [(now, digest_a, digest_b, match_mode, scoring_version) for digest_a, digest_b in found]
+                )
+        return found
+
+    def put_pair_scores(self, scores: dict, match_mode: str, scoring_version: str):
+        """Memoises {(digest_a, digest_b): (similarity_score, selected_matches)}."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pair_scores "
+                "(digest_a, digest_b, match_mode, scoring_version, similarity_score, selected_matches, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(digest_a, digest_b, match_mode, scoring_version, float(score), json.dumps(matches), now)
+                 for (digest_a, digest_b), (score, matches) in scores.items()]
+            )
+            self._evict()
+
+    def _evict(self):
+        excess = self._conn.execute("SELECT COUNT(*) FROM pair_scores").fetchone()[0] - self.max_pair_scores
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM pair_scores WHERE rowid IN (SELECT rowid FROM pair_scores ORDER BY last_access ASC LIMIT ?)", (excess,)
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            submissions = self._conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+            pair_scores = self._conn.execute("SELECT COUNT(*) FROM pair_scores").fetchone()[0]
+        return {"submissions": submissions, "pair_scores": pair_scores}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def compare_submissions(store: SubmissionStore, query_ids: list, candidate_ids: list = None, match_mode: str = "greedy") -> tuple[list, dict]:
+    """
+    Scores every query submission against every candidate (one-vs-N, or
+    N-vs-M), or, without `candidate_ids`, every query against every other
+    query (N-vs-N). A pair is never compared with itself. The score is not
+    symmetric, since it is weighted by the query's functions, so N-vs-N
+    yields both directions.
+
+    Memoised pairs are answered from the store; for the rest each query is
+    scored against all of its outstanding candidates in one
+    `calculate_advanced_scores` call, and identical candidates (same digest)
+    are computed once. Returns the per-pair results, in query then
+    candidate order, and counters of how they were obtained.
+    """
+    query_ids = list(dict.fromkeys(query_ids))
+    candidate_ids = query_ids if candidate_ids is None else list(dict.fromkeys(candidate_ids))
+    submissions = store.get_many(query_ids + candidate_ids)
+    engines = sorted({submission["metadata"].get("engine", "llm") for submission in submissions.values()})
+    if len(engines) > 1:
+        raise ValueError(f"Cannot compare submissions fingerprinted with different engines ({', '.join(engines)})")
+    pairs = [(query_id, candidate_id) for query_id in query_ids for candidate_id in candidate_ids if query_id != candidate_id]
+    digest_pairs = [(submissions[a]["digest"], submissions[b]["digest"]) for a, b in pairs]
+
+    memoised = store.get_pair_scores(digest_pairs, match_mode, SCORING_VERSION)
+    computed = {}
+    outstanding = {}
+    for digest_a, digest_b in digest_pairs:
+        if (digest_a, digest_b) not in memoised:
+            outstanding.setdefault(digest_a, {})[digest_b] = None
+
+    # One representative submission per digest.
+    by_digest = {submission["digest"]: submission for submission in submissions.values()}
+    for digest_a, digests_b in outstanding.items():
+        query = by_digest[digest_a]
+        scores = calculate_advanced_scores(
+            query["fingerprints"], query["code_lengths"],
+            [by_digest[digest_b]["fingerprints"] for digest_b in digests_b], match_mode
+        )
+        for digest_b, (score, matches) in zip(digests_b, scores):
+            computed[(digest_a, digest_b)] = (float(score), [(float(s), int(i), int(j)) for s, i, j in matches])
+    if computed:
+        store.put_pair_scores(computed, match_mode, SCORING_VERSION)
+
+    results = []
+    for (query_id, candidate_id), key in zip(pairs, digest_pairs):
+        score, matches = memoised[key] if key in memoised else computed[key]
+        results.append({
+            "query_id": query_id,
+            "candidate_id": candidate_id,
+            "similarity_score": score,
+            "selected_matches": matches,
+            "memoised": key in memoised
+        })
+    stats = {"pairs": len(pairs), "memoised": sum(result["memoised"] for result in results), "computed": len(computed)}
+    return results, stats
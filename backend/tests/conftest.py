@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The backend modules import each other as top-level modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Module-level defaults read these on import, so point every store the server
+# opens at a scratch directory before any test imports a backend module.
+_state_dir = tempfile.mkdtemp(prefix="veritas-tests-")
+os.environ.setdefault("VERITAS_CACHE_PATH", os.path.join(_state_dir, "pipeline_cache.sqlite3"))
+os.environ.setdefault("VERITAS_INDEX_PATH", os.path.join(_state_dir, "fingerprint_index.npz"))
+os.environ.setdefault("VERITAS_SUBMISSIONS_PATH", os.path.join(_state_dir, "submissions.sqlite3"))
+os.environ.setdefault("VERITAS_JOBS_DIR", os.path.join(_state_dir, "jobs"))
+os.environ.setdefault("VERITAS_MODEL_WARMUP_RETRY_SECONDS", "3600")
+
+
+@pytest.fixture(scope="session")
+def server_client():
+    """A TestClient around the FastAPI app, started once for the session."""
+    from fastapi.testclient import TestClient
+    import server
+    with TestClient(server.app) as client:
+        yield client
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from extract_functions import extract_functions_from_content_js, extract_functions_from_content_python
+from function_boundaries import identify_function_boundaries_js, identify_function_boundaries_python
+from main import extract_functions_from_sources
+from minifier_code import obfuscate_code
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example_codes")
+EXAMPLE_NAMES = ["hits.py", "pagerank_v1_p1.py", "pagerank_v1_p2.py", "pagerank_v2.py", "pagerank_v2.js"]
+
+
+def read_example(name: str) -> tuple[str, str]:
+    with open(os.path.join(EXAMPLES, name)) as f:
+        return name, f.read()
+
+
+def concatenate_then_rescan(sources: list[tuple[str, str]]) -> tuple[list[str], dict]:
+    """The extraction extract_functions_from_files did before the single pass."""
+    content = ""
+    boundaries_dict = {}
+    for name, file in sources:
+        language = 'python' if name.endswith('.py') else 'javascript'
+        if language == 'python':
+            boundaries_dict[name] = identify_function_boundaries_python(file)
+        else:
+            boundaries_dict[name] = identify_function_boundaries_js(file)
+        content += file + "\n"
+
+    obfuscated_content = obfuscate_code(content, language=language)
+    if language == 'python':
+        return extract_functions_from_content_python(obfuscated_content), boundaries_dict
+    return [func["fullText"] for func in extract_functions_from_content_js(obfuscated_content)], boundaries_dict
+
+
+def trim_trailing_blank_lines(source: str, boundaries: list) -> list:
+    """The indentation scan let a function run on over the blank lines after it."""
+    lines = source.splitlines()
+    trimmed = []
+    for start, end in boundaries:
+        while end > start and not lines[end - 1].strip():
+            end -= 1
+        trimmed.append((start, end))
+    return trimmed
+
+
+def rstripped(functions: list[str]) -> list[str]:
+    """The line scan kept the newline that ended the last function."""
+    return [function.rstrip() for function in functions]
+
+
+@pytest.mark.parametrize("name", EXAMPLE_NAMES)
+def test_single_file_matches_concatenate_then_rescan(name):
+    source = read_example(name)
+    expected_functions, expected_boundaries = concatenate_then_rescan([source])
+    functions, boundaries = extract_functions_from_sources([source])
+
+    assert functions == rstripped(expected_functions)
+    assert boundaries[name] == trim_trailing_blank_lines(source[1], expected_boundaries[name])
+
+
+def test_files_are_extracted_independently():
+    sources = [read_example(name) for name in EXAMPLE_NAMES]
+    functions, boundaries = extract_functions_from_sources(sources)
+
+    expected_functions, expected_boundaries = [], {}
+    for source in sources:
+        file_functions, file_boundaries = extract_functions_from_sources([source])
+        expected_functions += file_functions
+        expected_boundaries.update(file_boundaries)
+    assert functions == expected_functions
+    assert dict(boundaries) == expected_boundaries
+    assert [len(b) for b in boundaries.values()] == [3, 2, 1, 2, 2]
+
+
+def test_mixed_archive_no_longer_uses_the_last_files_language():
+    sources = [read_example("hits.py"), read_example("pagerank_v2.js")]
+    # The old path parsed the Python file as JavaScript and gave up.
+    with pytest.raises(ValueError):
+        concatenate_then_rescan(sources)
+
+    functions, boundaries = extract_functions_from_sources(sources)
+    assert functions[:3] == rstripped(concatenate_then_rescan(sources[:1])[0])
+    assert functions[3:] == rstripped(concatenate_then_rescan(sources[1:])[0])
+    assert list(boundaries) == ["hits.py", "pagerank_v2.js"]
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+
+from fingerprint import PackedFingerprint
+from fingerprint_index import FingerprintIndex
+
+
+def random_fingerprint(rng, nbits=256):
+    return PackedFingerprint.from_bool_array(rng.random(nbits) < 0.5)
+
+
+def flip(fingerprint, positions):
+    bits = fingerprint.to_bool_array().copy()
+    bits[list(positions)] ^= True
+    return PackedFingerprint.from_bool_array(bits)
+
+
+def test_probe_masks_flip_exactly_one_sampled_bit():
+    rng = np.random.default_rng(0)
+    index = FingerprintIndex(num_bands=4, band_bits=12)
+    fingerprint = random_fingerprint(rng)
+    index.add("a", [fingerprint])
+    keys = index._band_keys(fingerprint.words[None, :])[0]
+    for j, position in enumerate(index.band_positions[0]):
+        flipped = index._band_keys(flip(fingerprint, [position]).words[None, :])[0]
+        assert flipped[0] == keys[0] ^ index._probe_masks[j]
+
+
+def test_multi_probe_finds_neighbour_one_flip_away_in_every_band():
+    rng = np.random.default_rng(1)
+    fingerprint = random_fingerprint(rng)
+    plain = FingerprintIndex(num_bands=4, band_bits=16, probe_flips=0)
+    probing = FingerprintIndex(num_bands=4, band_bits=16)
+    for index in (plain, probing):
+        index.add("a", [fingerprint])
+    # One sampled bit of every band differs, so no band key matches exactly.
+    query = flip(fingerprint, {int(band[0]) for band in probing.band_positions})
+
+    assert plain.search(query) == []
+    assert [hit["submission_id"] for hit in probing.search(query)] == ["a"]
+
+
+def test_search_does_not_scan_exhaustively_unless_asked():
+    rng = np.random.default_rng(2)
+    index = FingerprintIndex(num_bands=8, band_bits=16)
+    index.add("far", [random_fingerprint(rng)])
+
+    assert index.search(random_fingerprint(rng), top_k=5) == []
+    assert len(index.search(random_fingerprint(rng), top_k=5, exact=True)) == 1
+
+
+def test_search_many_matches_search():
+    rng = np.random.default_rng(3)
+    index = FingerprintIndex()
+    stored = [random_fingerprint(rng) for _ in range(20)]
+    index.add("a", stored)
+    queries = [flip(fp, rng.choice(256, size=20, replace=False)) for fp in stored[:5]] + [PackedFingerprint.from_bits("01")]
+
+    assert index.search_many(queries, top_k=3) == [index.search(query, top_k=3) for query in queries]
+    assert index.search_many(queries[-1:]) == [[]]
+
+
+def test_save_if_changed_only_writes_after_adds(tmp_path):
+    rng = np.random.default_rng(4)
+    path = str(tmp_path / "index.npz")
+    index = FingerprintIndex()
+
+    assert not index.save_if_changed(path)
+    index.add("a", [random_fingerprint(rng) for _ in range(3)])
+    assert index.save_if_changed(path)
+    assert not index.save_if_changed(path)
+    assert FingerprintIndex.load(path).submissions == {"a": 3}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
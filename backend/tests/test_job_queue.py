@@ -0,0 +1,133 @@
+import io
+import os
+import time
+import threading
+
+import pytest
+
+from job_queue import JobQueue, QueueFullError, QUEUED, RUNNING, SUCCEEDED, FAILED
+
+
+def read_upload(job_dir: str, params: dict) -> dict:
+    if params.get("fail"):
+        raise ValueError("bad archive")
+    with open(os.path.join(job_dir, "upload.bin"), "rb") as f:
+        return {"size": len(f.read()), "echo": params["echo"]}
+
+
+def wait_for(queue: JobQueue, job_id: str, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (SUCCEEDED, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_submit_and_run(tmp_path):
+    queue = JobQueue(read_upload, jobs_dir=str(tmp_path), workers=2)
+    job_id = queue.submit({"echo": "hi"}, {"upload.bin": io.BytesIO(b"12345")})
+    assert queue.get(job_id)["status"] == QUEUED
+    assert queue.get(job_id)["queue_position"] == 0
+    queue.start()
+    try:
+        job = wait_for(queue, job_id)
+        assert job["status"] == SUCCEEDED and job["params"] == {"echo": "hi"}
+        assert queue.result(job_id) == {"size": 5, "echo": "hi"}
+
+        failing = queue.submit({"fail": True})
+        job = wait_for(queue, failing)
+        assert job["status"] == FAILED and job["error"] == "bad archive"
+        assert queue.result(failing) is None
+    finally:
+        queue.stop()
+    assert queue.get("missing") is None
+
+
+def test_queued_jobs_survive_a_restart(tmp_path):
+    first = JobQueue(read_upload, jobs_dir=str(tmp_path))
+    job_id = first.submit({"echo": "later"}, {"upload.bin": io.BytesIO(b"abc")})
+
+    second = JobQueue(read_upload, jobs_dir=str(tmp_path))
+    second.start()
+    try:
+        assert wait_for(second, job_id)["status"] == SUCCEEDED
+        assert second.result(job_id) == {"size": 3, "echo": "later"}
+    finally:
+        second.stop()
+
+
+def test_running_jobs_of_live_workers_are_not_reclaimed(tmp_path):
+    first = JobQueue(read_upload, jobs_dir=str(tmp_path), stale_seconds=60)
+    job_id = first.submit({"echo": "x"}, {"upload.bin": io.BytesIO(b"x")})
+    assert first._claim_next()[0] == job_id  # running in `first`, heartbeat fresh
+
+    second = JobQueue(read_upload, jobs_dir=str(tmp_path), stale_seconds=60)
+    assert second.requeue_stale() == 0
+    assert second.get(job_id)["status"] == RUNNING
+
+    # `first` dies: once its heartbeat is stale the job is queued and run again.
+    first._execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 120, job_id))
+    second.start()
+    try:
+        assert wait_for(second, job_id)["status"] == SUCCEEDED
+    finally:
+        second.stop()
+    # A late finish from the old owner does not overwrite the new outcome.
+    first._finish(job_id, FAILED, "too late")
+    assert second.get(job_id)["status"] == SUCCEEDED
+
+
+def test_heartbeat_keeps_long_jobs_owned(tmp_path):
+    release = threading.Event()
+
+    def slow(job_dir, params):
+        release.wait(10)
+        return {}
+
+    queue = JobQueue(slow, jobs_dir=str(tmp_path), heartbeat_seconds=0.05, stale_seconds=0.3)
+    job_id = queue.submit({})
+    queue.start()
+    try:
+        time.sleep(0.8)
+        job = queue.get(job_id)
+        assert job["status"] == RUNNING
+        assert queue.requeue_stale() == 0
+        release.set()
+        assert wait_for(queue, job_id)["status"] == SUCCEEDED
+    finally:
+        release.set()
+        queue.stop()
+
+
+def test_queue_limit(tmp_path):
+    queue = JobQueue(read_upload, jobs_dir=str(tmp_path), max_queued=2)
+    queue.submit({"echo": 1})
+    queue.submit({"echo": 2})
+    with pytest.raises(QueueFullError):
+        queue.submit({"echo": 3}, {"upload.bin": io.BytesIO(b"x")})
+    assert queue.queued_count() == 2
+    # The rejected job leaves no directory behind.
+    assert len([name for name in os.listdir(tmp_path) if not name.startswith("jobs.sqlite3")]) == 2
+
+
+def test_queue_limit_holds_under_concurrent_submits(tmp_path):
+    queues = [JobQueue(read_upload, jobs_dir=str(tmp_path), max_queued=5) for _ in range(4)]
+    accepted, rejected = [], []
+    start = threading.Barrier(16)
+
+    def submit(queue):
+        start.wait()
+        try:
+            accepted.append(queue.submit({}))
+        except QueueFullError:
+            rejected.append(1)
+
+    threads = [threading.Thread(target=submit, args=(queues[i % 4],)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(accepted) == 5 and len(rejected) == 11
+    assert queues[0].queued_count() == 5
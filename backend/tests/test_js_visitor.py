@@ -0,0 +1,117 @@
+import os
+import sys
+import threading
+
+import esprima
+import pytest
+
+from extract_functions import JS_CHILD_FIELDS, JavaScriptFunctionVisitor, _outermost_js_functions, _parse_js
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example_codes")
+with open(os.path.join(EXAMPLES, "pagerank_v2.js")) as f:
+    EXAMPLE_JS = f.read()
+
+SOURCES = [
+    "function add(a, b = 2) { return a + b; }\nconst mul = (x, y) => x * y;\n",
+    # Nested functions, closures and functions hidden in expressions.
+    """
+    function outer(items) {
+      function inner(x) { const twice = function (y) { return y * 2; }; return twice(x); }
+      let seen = items.map((item) => { var local = () => item; return local(); });
+      return [inner, seen, { key: function named() { function deep() {} } }];
+    }
+    """,
+    # Classes, control flow, templates, destructuring and async code.
+    """
+    class Shape extends Base {
+      area() { const half = (v) => v / 2; return half(this.w * this.h); }
+      static make(...args) { return new Shape(...args); }
+    }
+    label: for (const [k, v] of Object.entries(obj)) {
+      switch (k) { case 'a': { function caseFn() {} break; } default: continue label; }
+    }
+    try { run(); } catch ({ message }) { const report = async (m) => { await send(`${m}!`); }; } finally { done(); }
+    var { a, b: [c] } = source, later = function* gen() { yield function yielded() {}; };
+    do { var tick = () => tick; } while (false);
+    """,
+]
+
+
+class RecursiveVisitor(JavaScriptFunctionVisitor):
+    """The recursive walk over vars(node) the visitor used before it was made iterative."""
+
+    def visit(self, node):
+        if not node or not isinstance(node, esprima.nodes.Node):
+            return
+        method_name = f'visit_{node.type}'
+        visitor = getattr(self, method_name, None)
+        if visitor is not None:
+            visitor(node)
+        self.generic_visit(node)
+
+    def generic_visit(self, node):
+        for value in vars(node).values():
+            if isinstance(value, list):
+                for item in value:
+                    self.visit(item)
+            else:
+                self.visit(value)
+
+
+def functions_of(visitor_class, code: str, tree=None, **kwargs) -> list:
+    visitor = visitor_class(code, **kwargs)
+    visitor.visit(tree or _parse_js(code, {'range': True, 'loc': True}))
+    return visitor.functions
+
+
+@pytest.mark.parametrize("code", SOURCES + [EXAMPLE_JS])
+def test_iterative_walk_matches_the_recursive_one(code):
+    expected = functions_of(RecursiveVisitor, code)
+    assert expected
+    assert functions_of(JavaScriptFunctionVisitor, code) == expected
+
+
+@pytest.mark.parametrize("code", SOURCES)
+def test_walk_without_nested_functions_keeps_the_outermost_ones(code):
+    outermost = functions_of(JavaScriptFunctionVisitor, code, nested=False)
+    assert [func['range'] for func in outermost] == [func['range'] for func in _outermost_js_functions(code)]
+    assert len(outermost) <= len(functions_of(JavaScriptFunctionVisitor, code))
+
+
+def test_every_esprima_node_type_has_children_listed():
+    # A type missing from JS_CHILD_FIELDS still works (through vars()), but slowly.
+    seen = set()
+    for code in SOURCES:
+        stack = [_parse_js(code, {'range': True})]
+        while stack:
+            node = stack.pop()
+            seen.add(node.type)
+            stack.extend(JavaScriptFunctionVisitor.iter_child_nodes(node))
+    assert seen <= set(JS_CHILD_FIELDS)
+
+
+def parse_deeply_nested(code: str):
+    """esprima's parser is itself recursive, so parse on a thread with room to recurse."""
+    result = {}
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(200000)
+    threading.stack_size(256 * 1024 * 1024)
+    try:
+        thread = threading.Thread(target=lambda: result.update(tree=_parse_js(code, {'range': True, 'loc': True})))
+        thread.start()
+    finally:
+        threading.stack_size(0)
+    thread.join()
+    sys.setrecursionlimit(limit)
+    return result["tree"]
+
+
+def test_deep_nesting_does_not_exhaust_the_stack():
+    depth = 2000
+    code = "if (x) {" * depth + "function g(a) { return a; }" + "}" * depth
+    tree = parse_deeply_nested(code)
+
+    with pytest.raises(RecursionError):
+        functions_of(RecursiveVisitor, code, tree)
+    functions = functions_of(JavaScriptFunctionVisitor, code, tree)
+    assert [(func['name'], func['lines']) for func in functions] == [("g", (1, 1))]
@@ -0,0 +1,140 @@
+import asyncio
+import io
+import logging
+import zipfile
+
+import pytest
+
+from metrics import (
+    CONTENT_TYPE, STAGE_ERRORS, STAGE_SECONDS, Counter, Gauge, Histogram, Registry, install_trace_logging, stage_timer,
+    trace, trace_id_var
+)
+
+
+def test_counter_text_format_escapes_labels():
+    counter = Counter("t_requests_total", "Requests.", ("path", "code"))
+    counter.inc(path='say "hi"\\\n', code=200)
+    counter.inc(2, path="/b", code=500)
+    counter.inc(path="/b", code=500)
+    assert counter.render() == [
+        "# HELP t_requests_total Requests.",
+        "# TYPE t_requests_total counter",
+        't_requests_total{path="/b",code="500"} 3',
+        't_requests_total{path="say \\"hi\\"\\\\\\n",code="200"} 1',
+    ]
+    assert counter.value(path="/b", code=500) == 3
+    with pytest.raises(ValueError, match="takes labels"):
+        counter.inc(path="/b")
+
+
+def test_gauge_without_labels():
+    gauge = Gauge("t_depth", "Depth.")
+    gauge.set(5)
+    gauge.inc(2)
+    gauge.dec()
+    assert gauge.render() == ["# HELP t_depth Depth.", "# TYPE t_depth gauge", "t_depth 6"]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("t_seconds", "Latency.", ("stage",), buckets=(1, 0.25))
+    for value in (0.125, 0.25, 0.5, 2):
+        histogram.observe(value, stage="parse")
+    assert histogram.buckets == (0.25, 1)
+    assert histogram.render() == [
+        "# HELP t_seconds Latency.",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{stage="parse",le="0.25"} 2',
+        't_seconds_bucket{stage="parse",le="1"} 3',
+        't_seconds_bucket{stage="parse",le="+Inf"} 4',
+        't_seconds_sum{stage="parse"} 2.875',
+        't_seconds_count{stage="parse"} 4',
+    ]
+    assert histogram.value(stage="parse") == {"count": 4, "sum": 2.875}
+    assert histogram.value(stage="other") == {"count": 0, "sum": 0.0}
+
+
+def test_registry_runs_collectors_at_scrape_time():
+    registry = Registry()
+    gauge = registry.register(Gauge("t_queue", "Queue."))
+    registry.add_collector(lambda: gauge.set(7))
+    assert registry.render().endswith("t_queue 7\n")
+
+
+def test_stage_timer_records_duration_and_errors():
+    before = STAGE_SECONDS.value(stage="test-stage")["count"]
+    with stage_timer("test-stage"):
+        pass
+    with pytest.raises(KeyError):
+        with stage_timer("test-stage"):
+            raise KeyError("boom")
+    assert STAGE_SECONDS.value(stage="test-stage")["count"] == before + 2
+    assert STAGE_ERRORS.value(stage="test-stage") == 1
+
+
+class RecordHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records():
+    install_trace_logging()
+    handler = RecordHandler()
+    root = logging.getLogger()
+    level = root.level
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    yield handler.records
+    root.removeHandler(handler)
+    root.setLevel(level)
+
+
+def test_trace_id_reaches_log_records_across_threads(records):
+    log = logging.getLogger("test_metrics")
+
+    async def handle():
+        with trace("abc123") as trace_id:
+            log.info("on the loop")
+            await asyncio.to_thread(log.info, "in a worker thread")
+            return trace_id
+
+    assert asyncio.run(handle()) == "abc123"
+    log.info("outside")
+    assert [(r.getMessage(), r.trace_id) for r in records] == [
+        ("on the loop", "abc123"), ("in a worker thread", "abc123"), ("outside", "-")
+    ]
+    with trace() as fresh:
+        assert len(fresh) == 16 and trace_id_var.get() == fresh
+    assert trace_id_var.get() == "-"
+
+
+def test_request_trace_id_is_echoed_and_logged(server_client, records):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("a.py", "def f(x):\n    return x + 1\n")
+    response = server_client.post(
+        "/analyze-zip/", params={"engine": "structural"}, headers={"X-Trace-Id": "req-42"},
+        files={"zip_file": ("a.zip", buffer.getvalue(), "application/zip")}
+    )
+    assert response.status_code == 200 and response.headers["x-trace-id"] == "req-42"
+    server_records = [r for r in records if r.name in ("server", "main")]
+    assert server_records and all(r.trace_id == "req-42" for r in server_records)
+
+    assert len(server_client.get("/healthz").headers["x-trace-id"]) == 16
+
+
+def test_metrics_endpoint_scrape(server_client):
+    server_client.get("/healthz")
+    response = server_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    text = response.text
+    assert "# TYPE veritas_http_request_seconds histogram" in text
+    assert 'veritas_http_request_seconds_count{method="GET",route="/healthz",status="200"}' in text
+    assert 'veritas_queue_depth{queue="jobs"}' in text
+    for line in text.splitlines():
+        assert line.startswith("#") or len(line.rsplit(" ", 1)) == 2
@@ -0,0 +1,62 @@
+import pytest
+
+from minifier_code import normalize_function_body, minify_js_fallback_regex
+from main import group_duplicate_functions
+
+# Pairs of functions that differ only in a method or attribute name or a literal.
+DIFFERENT_FUNCTIONS = [
+    ("def a(b):\n    b.append(1)", "def a(b):\n    b.extend(1)"),
+    ("def a(c):\n    return c.mean", "def a(c):\n    return c.median"),
+    ("def a(b):\n    return b == 'admin'", "def a(b):\n    return b == 'guest'"),
+    ("def a(b):\n    return b + 1", "def a(b):\n    return b + 2"),
+    ("def a(b):\n    return c(b)", "def a(b):\n    return a(b)"),
+    ("function a(b){b.push(1);}", "function a(b){b.pop(1);}"),
+    ("function a(b){return b==='admin';}", "function a(b){return b==='guest';}"),
+    ("function a(b){return b.length;}", "function a(b){return b.size;}"),
+]
+
+# Pairs of functions that only name their parameters and locals differently.
+RENAMED_FUNCTIONS = [
+    ("def foo(x, y):\n    z = x + y\n    return z", "def bar(u, v):\n    w = u + v\n    return w"),
+    ("def a(b):\n    return [c * 2 for c in b]", "def d(e):\n    return [f * 2 for f in e]"),
+    ("function foo(x,y){const z=x+y;return z;}", "function bar(u, v) {\n  const w = u + v;\n  return w;\n}"),
+    ("(b)=>{return b*2;}", "(c) => { return c * 2; }"),
+]
+
+
+@pytest.mark.parametrize("first, second", DIFFERENT_FUNCTIONS)
+def test_normalize_keeps_attributes_and_literals(first, second):
+    assert normalize_function_body(first) != normalize_function_body(second)
+
+
+@pytest.mark.parametrize("first, second", RENAMED_FUNCTIONS)
+def test_normalize_ignores_local_names(first, second):
+    assert normalize_function_body(first) == normalize_function_body(second)
+
+
+def test_normalize_returns_unparseable_code_unchanged():
+    assert normalize_function_body("foo(){ }") == "foo(){ }"
+
+
+def test_group_duplicate_functions_keeps_different_helpers_apart():
+    functions = [
+        "def a(b, c):\n    b.append(c)\n    return b",
+        "def d(b, c):\n    b.remove(c)\n    return b",
+        "def e(f, g):\n    f.append(g)\n    return f",
+    ]
+    assert group_duplicate_functions(functions, [0, 1, 2]) == {0: [0, 2], 1: [1]}
+
+
+@pytest.mark.parametrize("source, expected", [
+    # '/' after '++', '--', ')', ']' or a literal divides; j must still be renamed.
+    ("let z = i++ / 2 + j / 3;", "let a=b++/2+c/3;"),
+    ("let z = i-- / 2 + j / 3;", "let a=b--/2+c/3;"),
+    ("z = (i) / 2 + j / 3;", "a=(b)/2+c/3;"),
+    ("z = x[0] / 2 + j / 3;", "a=b[0]/2+c/3;"),
+    ("z = 'a' / 2 + j / 3;", "a='a'/2+b/3;"),
+    # Elsewhere it starts a regex literal, which is copied verbatim.
+    ("return /j+/g.test(s);", "return/j+/g.test(a);"),
+    ("s = t.replace(/a\\/b/g, x) / 2;", "a=b.replace(/a\\/b/g,c)/2;"),
+])
+def test_fallback_minifier_tells_division_from_regex(source, expected):
+    assert minify_js_fallback_regex(source) == expected
@@ -0,0 +1,25 @@
+import minifier_code
+import parallel_extract
+from parallel_extract import extract_sources, shutdown_executor
+
+SOURCES = [
+    (f"src/module{i}.js", f"function add{i}(first, second) {{\n  const total = first + second;\n  return total * {i};\n}}\n")
+    for i in range(6)
+] + [("src/broken.js", "function (\n")]
+
+
+def test_python_fallback_runs_in_the_workers_without_node(monkeypatch):
+    serial = extract_sources(SOURCES, workers=1)
+    assert [len(functions) for _, functions, _ in serial] == [1] * 6 + [0]
+
+    def parent_minifier(source):
+        raise AssertionError("the parent process must not run the Python minifier")
+
+    # Spawned workers import the real modules; only this process is patched.
+    monkeypatch.setattr(parallel_extract, "minify_js_node_many", lambda sources: [None] * len(sources))
+    monkeypatch.setattr(parallel_extract, "try_minify_js_python", parent_minifier)
+    monkeypatch.setattr(minifier_code, "minify_js_python", parent_minifier)
+    try:
+        assert extract_sources(SOURCES, workers=2) == serial
+    finally:
+        shutdown_executor()
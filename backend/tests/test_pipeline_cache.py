@@ -0,0 +1,37 @@
+import numpy as np
+
+from pipeline_cache import PipelineCache
+
+
+def test_running_totals_follow_puts_and_replacements(tmp_path):
+    cache = PipelineCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_pseudocode("a", "x" * 100, "v1")
+    cache.put_pseudocode("a", "x" * 40, "v1")
+    cache.put_embeddings([("b", np.zeros(8)), ("c", np.ones(8))], "v1")
+    assert (cache._count, cache._bytes) == (3, 40 + 64 + 64)
+    assert np.array_equal(cache.get_embedding("c"), np.ones(8))
+    cache.close()
+    # A new instance picks the totals up from the table.
+    reopened = PipelineCache(str(tmp_path / "cache.sqlite3"))
+    assert (reopened._count, reopened._bytes) == (3, 168)
+    assert reopened.stats()["entries"] == 3
+
+
+def test_evicts_least_recently_used_in_batches(tmp_path):
+    cache = PipelineCache(str(tmp_path / "cache.sqlite3"), max_entries=10, evict_to=0.5)
+    for i in range(10):
+        cache.put_pseudocode(f"k{i}", "code", "v1")
+    assert cache.evictions == 0
+    cache.get_pseudocode("k0")  # most recently used now
+    cache.put_pseudocode("k10", "code", "v1")
+    assert cache.evictions == 6
+    assert cache.stats()["entries"] == 5
+    assert cache.get_pseudocode("k0") == "code"
+    assert cache.get_pseudocode("k1") is None
+
+
+def test_byte_bound(tmp_path):
+    cache = PipelineCache(str(tmp_path / "cache.sqlite3"), max_bytes=1000, evict_to=0.9)
+    for i in range(20):
+        cache.put_pseudocode(f"k{i}", "x" * 100, "v1")
+    assert cache.stats()["bytes"] <= 1000
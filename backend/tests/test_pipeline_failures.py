@@ -0,0 +1,80 @@
+import json
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+
+from asi_client import ASIClient, RemoteAPIError
+from main import run_pipeline_for_files, FingerprintingError
+
+SOURCE = '''
+def first(x):
+    return x + "first"
+
+def failing(x):
+    return x + "FAIL"
+
+def slow(x):
+    return x + "SLOW"
+
+def second(x):
+    return [x, "second"]
+'''
+
+
+async def mock_chat_api(request: httpx.Request) -> httpx.Response:
+    """Stands in for the ASI chat API: 500 for code marked FAIL, a stalled answer for SLOW."""
+    prompt = json.loads(request.content)["messages"][1]["content"]
+    if "FAIL" in prompt:
+        return httpx.Response(500, text="upstream exploded")
+    if "SLOW" in prompt:
+        await asyncio.sleep(5)
+    return httpx.Response(200, json={"choices": [{"message": {"content": f"pseudocode of {prompt}"}}]})
+
+
+class MockChain:
+    """The part of the LangChain runnable the pipeline uses, backed by an ASIClient."""
+    def __init__(self, client: ASIClient):
+        self.client = client
+
+    async def ainvoke(self, inputs: dict) -> str:
+        return await self.client.achat(inputs.get("obfuscated_code") or inputs["obfuscated_functions"], "system", "mock-model")
+
+
+class MockEmbeddings:
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[1.0 if bit == "1" else -1.0 for bit in format(int(hashlib.sha256(text.encode()).hexdigest(), 16), "0256b")]
+                for text in texts]
+
+
+@pytest.fixture
+def client():
+    client = ASIClient("key", base_url="http://asi.test", transport=httpx.MockTransport(mock_chat_api),
+                       requests_per_second=0, max_retries=1)
+    yield client
+    client.close()
+
+
+def test_client_raises_after_retries(client):
+    with pytest.raises(RemoteAPIError) as error:
+        client.chat("FAIL", "system", "mock-model")
+    assert error.value.status_code == 500
+    assert client.stats["retries"] == 1
+
+
+def test_failed_and_timed_out_functions_are_left_out(client):
+    fingerprints, code_chunks, boundaries, stats = run_pipeline_for_files(
+        [("pkg/module.py", SOURCE)], MockChain(client), MockEmbeddings(), call_timeout=1.0, return_stats=True
+    )
+    assert len(fingerprints) == len(code_chunks) == 2
+    assert all("FAIL" not in chunk and "SLOW" not in chunk for chunk in code_chunks)
+    (entry,) = boundaries.values()
+    assert len(entry["boundaries"]) == len(entry["hashes"]) == 2
+    assert stats["functions_failed"] == 2
+    assert [failure["boundary"] for failure in stats["failed_functions"]] == [(5, 6), (8, 9)]
+
+
+def test_all_functions_failing_raises(client):
+    with pytest.raises(FingerprintingError):
+        run_pipeline_for_files([("bad.py", 'def a(x):\n    return "FAIL"\n')], MockChain(client), MockEmbeddings(), return_stats=True)
@@ -0,0 +1,48 @@
+import hashlib
+
+import pytest
+
+from main import run_pipeline_for_files
+from pipeline_cache import PipelineCache
+
+# Same file name in two directories, with different functions.
+SOURCES = [
+    ("a/util.py", "def helper(x):\n    return x + 1\n"),
+    ("b/util.py", "def first(x):\n    return x * 2\n\ndef second(y):\n    return [y]\n"),
+]
+
+
+class EchoChain:
+    async def ainvoke(self, inputs: dict) -> str:
+        return f"pseudocode of {inputs.get('obfuscated_code') or inputs['obfuscated_functions']}"
+
+
+class HashEmbeddings:
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[1.0 if bit == "1" else -1.0 for bit in format(int(hashlib.sha256(text.encode()).hexdigest(), 16), "0256b")]
+                for text in texts]
+
+
+def check_boundaries(fingerprints, boundaries):
+    assert list(boundaries) == ["a/util.py", "b/util.py"]
+    # Stored results come back from JSON with lists for tuples.
+    assert [tuple(b) for b in boundaries["a/util.py"]["boundaries"]] == [(1, 2)]
+    assert [tuple(b) for b in boundaries["b/util.py"]["boundaries"]] == [(1, 2), (4, 5)]
+    assert len(fingerprints) == 3
+
+
+def test_structural_engine_keeps_files_with_the_same_basename_apart():
+    fingerprints, _, boundaries = run_pipeline_for_files(SOURCES, None, None, engine="structural")
+    check_boundaries(fingerprints, boundaries)
+
+
+@pytest.mark.parametrize("runs", [1, 2])
+def test_stored_file_results_are_keyed_by_path(tmp_path, runs):
+    cache = PipelineCache(str(tmp_path / "cache.sqlite3"))
+    for _ in range(runs):
+        fingerprints, _, boundaries, stats = run_pipeline_for_files(
+            SOURCES, EchoChain(), HashEmbeddings(), cache=cache, return_stats=True
+        )
+        check_boundaries(fingerprints, boundaries)
+    assert stats["files_reused"] == (2 if runs == 2 else 0)
+    cache.close()
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from main import aiter_pseudocode, estimate_tokens, format_function_batch, parse_batched_pseudocode, plan_pseudocode_batches
+
+
+def test_parse_clean_answer():
+    response = "### PSEUDOCODE 1\nadd a and b\n\n### PSEUDOCODE 2\nreturn the max\n"
+    assert parse_batched_pseudocode(response, 2) == {0: "add a and b", 1: "return the max"}
+
+
+@pytest.mark.parametrize("response, expected", [
+    # Missing section: only 1 and 3 come back.
+    ("### PSEUDOCODE 1\nfirst\n### PSEUDOCODE 3\nthird", {0: "first", 2: "third"}),
+    # Out of range numbers are ignored.
+    ("### PSEUDOCODE 0\nzero\n### PSEUDOCODE 2\nsecond\n### PSEUDOCODE 4\nfourth", {1: "second"}),
+    # A duplicated number is ambiguous, so neither copy is trusted.
+    ("### PSEUDOCODE 1\nfirst\n### PSEUDOCODE 2\nsecond\n### PSEUDOCODE 2\nagain", {0: "first"}),
+    # Sections out of order are matched by number, not position.
+    ("### PSEUDOCODE 3\nthird\n### PSEUDOCODE 1\nfirst", {0: "first", 2: "third"}),
+    # Truncated reply: functions whose section never started are retried.
+    ("### PSEUDOCODE 1\nfirst\n### PSEUDOCODE 2\n", {0: "first"}),
+    # A header cut off mid-word cannot be told from body text and stays in
+    # the previous section; the functions after it are still retried.
+    ("### PSEUDOCODE 1\nfirst\n### PSEUDO", {0: "first\n### PSEUDO"}),
+    # No headers at all, or no answer.
+    ("Sure! Here is the pseudocode.", {}),
+    ("", {}),
+    (None, {}),
+])
+def test_parse_drops_missing_duplicate_and_out_of_range_sections(response, expected):
+    assert parse_batched_pseudocode(response, 3) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "### PSEUDOCODE 2", "  ###   pseudocode   2  ", "### Pseudocode 2:", "**PSEUDOCODE 2**", "PSEUDOCODE 2", "## PseudoCode 2 ##",
+])
+def test_parse_accepts_header_variants(header):
+    response = f"### PSEUDOCODE 1\nfirst\n{header}\nsecond"
+    assert parse_batched_pseudocode(response, 2) == {0: "first", 1: "second"}
+
+
+def test_parse_strips_code_fences():
+    response = "### PSEUDOCODE 1\n```\nfirst\n```\n### PSEUDOCODE 2\n```text\nsecond\n```"
+    assert parse_batched_pseudocode(response, 2) == {0: "first", 1: "second"}
+
+
+def code_of_tokens(tokens: int) -> str:
+    """Code whose estimate_tokens is exactly `tokens`."""
+    code = "x" * ((tokens - 1) * 4)
+    assert estimate_tokens(code) == tokens
+    return code
+
+
+def test_plan_packs_small_functions_up_to_the_token_budget():
+    codes = [code_of_tokens(40)] * 5
+    # 40 + 40 = 80 fits a budget of 80 exactly; a third would exceed it.
+    assert plan_pseudocode_batches(codes, token_budget=80, small_function_tokens=50, max_functions=10) == [[0, 1], [2, 3], [4]]
+
+
+def test_plan_stops_at_max_functions():
+    codes = [code_of_tokens(2)] * 7
+    assert plan_pseudocode_batches(codes, token_budget=1000, small_function_tokens=50, max_functions=3) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_plan_gives_large_functions_their_own_call():
+    codes = [code_of_tokens(10), code_of_tokens(50), code_of_tokens(51), code_of_tokens(10), code_of_tokens(10)]
+    # 50 tokens is still small; 51 is not and splits nothing around it.
+    assert plan_pseudocode_batches(codes, token_budget=75, small_function_tokens=50, max_functions=10) == [[2], [0, 1, 3], [4]]
+
+
+def test_plan_without_budget_sends_every_function_alone():
+    assert plan_pseudocode_batches([code_of_tokens(2)] * 3, token_budget=0) == [[0], [1], [2]]
+    assert plan_pseudocode_batches([]) == []
+
+
+class PartialBatchChain:
+    """Answers batched prompts for every function but the second; single prompts always work."""
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, inputs: dict) -> str:
+        if "obfuscated_code" in inputs:
+            self.calls.append(("single", inputs["obfuscated_code"]))
+            return f"alone {inputs['obfuscated_code']}"
+        self.calls.append(("batch", inputs["count"]))
+        functions = inputs["obfuscated_functions"].split("\n\n")
+        return "\n".join(
+            f"### PSEUDOCODE {n}\nbatched {function.splitlines()[1]}"
+            for n, function in enumerate(functions, start=1) if n != 2
+        )
+
+
+def test_aiter_pseudocode_retries_unparsed_functions_one_at_a_time():
+    codes = ["f0()", "f1()", "f2()"]
+    chain = PartialBatchChain()
+
+    async def collect():
+        return dict([pair async for pair in aiter_pseudocode(codes, chain, max_concurrency=2, batch_token_budget=100)])
+
+    results = asyncio.run(collect())
+    assert results == {0: "batched f0()", 1: "alone f1()", 2: "batched f2()"}
+    assert chain.calls == [("batch", 3), ("single", "f1()")]
+    assert format_function_batch(codes).count("### FUNCTION") == 3
@@ -0,0 +1,208 @@
+import gzip
+import importlib.util
+import io
+import json
+import zipfile
+
+import pytest
+
+import response_encoding
+from response_encoding import (
+    RESPONSE_COMPRESS_MIN_BYTES, UnsupportedFormatError, compact_analysis_response, encode_body, negotiate_encoding,
+    negotiate_format
+)
+
+HAS_MSGPACK = importlib.util.find_spec("msgpack") is not None
+HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+
+SOURCE = (
+    "def total(xs):\n    t = 0\n    for x in xs:\n        t += x\n    return t\n\n"
+    "def biggest(a, b):\n    return a if a > b else b\n"
+)
+
+
+@pytest.fixture
+def no_zstd(monkeypatch):
+    monkeypatch.setattr(response_encoding, "_zstandard", lambda: None)
+
+
+@pytest.fixture
+def no_msgpack(monkeypatch):
+    def missing():
+        raise UnsupportedFormatError("MessagePack responses require msgpack (pip install msgpack)")
+    monkeypatch.setattr(response_encoding, "_msgpack", missing)
+
+
+@pytest.mark.skipif(not HAS_ZSTD, reason="zstandard is not installed")
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, zstd", "zstd"),                 # equal q: zstd is preferred
+    ("zstd;q=0.5, gzip", "gzip"),
+    ("gzip;q=0.2, zstd;q=0.9", "zstd"),
+    ("*", "zstd"),
+    ("*;q=0.5, gzip;q=1", "gzip"),
+    ("zstd;q=0, *", "gzip"),                # an explicit q=0 beats the wildcard
+    ("br, deflate", None),
+    ("gzip;q=0, zstd;q=0", None),
+    ("", None),
+    (None, None),
+])
+def test_negotiate_encoding_q_values(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("zstd, gzip", "gzip"),
+    ("zstd", None),
+    ("*", "gzip"),
+    ("gzip;q=0, *", None),
+])
+def test_negotiate_encoding_falls_back_without_zstandard(no_zstd, header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, "json"),
+    ("*/*", "json"),
+    ("application/json", "json"),
+    ("application/msgpack", "msgpack"),
+    ("application/x-msgpack, application/json;q=0.5", "msgpack"),
+    ("application/msgpack;q=0.5, application/json", "json"),
+    ("application/msgpack;q=0.5, */*;q=0.5", "msgpack"),    # ties go to msgpack
+    ("application/msgpack;q=0, */*", "json"),
+    ("application/json;q=bogus, application/msgpack;q=0.1", "msgpack"),
+])
+def test_negotiate_format_from_accept(monkeypatch, accept, expected):
+    monkeypatch.setattr(response_encoding, "_msgpack", lambda: object())
+    assert negotiate_format(accept) == expected
+
+
+def test_negotiate_format_without_msgpack(no_msgpack):
+    # Accept is a preference, so JSON is sent instead; an explicit request is refused.
+    assert negotiate_format("application/msgpack") == "json"
+    with pytest.raises(UnsupportedFormatError):
+        negotiate_format("application/json", "msgpack")
+    with pytest.raises(ValueError, match="response_format"):
+        negotiate_format(None, "xml")
+    assert negotiate_format("application/msgpack", "json") == "json"
+
+
+def test_encode_body_compresses_only_large_bodies():
+    small, headers = encode_body({"a": 1}, "json", "gzip")
+    assert json.loads(small) == {"a": 1} and "Content-Encoding" not in headers
+    assert headers["Vary"] == "Accept, Accept-Encoding"
+
+    payload = {"hashes": ["0" * RESPONSE_COMPRESS_MIN_BYTES]}
+    body, headers = encode_body(payload, "json", "gzip")
+    assert headers == {"Content-Type": "application/json", "Content-Encoding": "gzip", "Vary": "Accept, Accept-Encoding"}
+    assert json.loads(gzip.decompress(body)) == payload
+    with pytest.raises(ValueError, match="Unknown content encoding"):
+        encode_body(payload, "json", "br")
+
+
+@pytest.mark.skipif(not HAS_ZSTD, reason="zstandard is not installed")
+def test_encode_body_zstd_round_trip():
+    import zstandard
+    payload = {"hashes": ["1" * RESPONSE_COMPRESS_MIN_BYTES]}
+    body, headers = encode_body(payload, "json", "zstd")
+    assert headers["Content-Encoding"] == "zstd"
+    assert json.loads(zstandard.ZstdDecompressor().decompressobj().decompress(body)) == payload
+
+
+def test_encode_body_msgpack_round_trip():
+    msgpack = pytest.importorskip("msgpack")
+    payload = {"hashes": ["AAEC"], "code_lengths": [3, 4]}
+    body, headers = encode_body(payload, "msgpack")
+    assert headers["Content-Type"] == "application/msgpack"
+    assert msgpack.unpackb(body, raw=False) == payload
+
+
+ANALYSIS = {
+    "status": "success",
+    "hashes": ["h1", "h2", "h3"],
+    "code_chunks": ["def a(): pass", "def b():\n    return 1", "x"],
+    "boundaries_json": [
+        {"filename": "a.py", "boundaries": [[1, 1], [3, 4]], "hashes": ["h1", "h2"]},
+        {"filename": "b.py", "boundaries": [[1, 1]], "hashes": ["h3"]},
+    ],
+}
+
+
+def test_compact_analysis_response():
+    assert compact_analysis_response(ANALYSIS) is ANALYSIS
+
+    compact = compact_analysis_response(ANALYSIS, include_code_chunks=False, include_boundary_hashes=False)
+    assert "code_chunks" not in compact and compact["code_lengths"] == [13, 21, 1]
+    assert compact["boundaries_json"] == [
+        {"filename": "a.py", "boundaries": [[1, 1], [3, 4]]}, {"filename": "b.py", "boundaries": [[1, 1]]}
+    ]
+    assert compact["hashes"] == ANALYSIS["hashes"]
+
+    # The original payload is left untouched.
+    assert len(ANALYSIS["code_chunks"]) == 3 and "hashes" in ANALYSIS["boundaries_json"][0]
+    assert compact_analysis_response(ANALYSIS, include_boundary_hashes=False)["code_chunks"] == ANALYSIS["code_chunks"]
+
+
+def analyze(client, params=None, headers=None):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("src/code.py", SOURCE)
+    return client.post(
+        "/analyze-zip/", params={"engine": "structural", **(params or {})}, headers=headers,
+        files={"zip_file": ("upload.zip", buffer.getvalue(), "application/zip")}
+    )
+
+
+def test_analyze_zip_identity_json(server_client):
+    response = analyze(server_client, headers={"Accept": "application/json", "Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["vary"].startswith("Accept, Accept-Encoding")
+    body = response.json()
+    assert len(body["hashes"]) == len(body["code_chunks"]) == 2
+    assert len(body["boundaries_json"][0]["hashes"]) == 2
+
+
+def test_analyze_zip_gzip_round_trip(server_client, no_zstd):
+    response = analyze(server_client, headers={"Accept-Encoding": "zstd;q=1, gzip;q=0.5"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["hashes"]) == 2
+
+
+@pytest.mark.skipif(not HAS_ZSTD, reason="zstandard is not installed")
+def test_analyze_zip_zstd_round_trip(server_client):
+    import zstandard
+    response = analyze(server_client, headers={"Accept-Encoding": "gzip;q=0.5, zstd"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "zstd"
+    # Not every httpx decodes zstd itself, so undo it here when it did not.
+    body = response.content
+    if body[:4] == b"\x28\xb5\x2f\xfd":
+        body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    assert len(json.loads(body)["hashes"]) == 2
+
+
+def test_analyze_zip_compact_response(server_client):
+    full = analyze(server_client).json()
+    compact = analyze(server_client, {"include_code_chunks": "false", "include_boundary_hashes": "false"}).json()
+    assert compact["hashes"] == full["hashes"]
+    assert compact["code_lengths"] == [len(chunk) for chunk in full["code_chunks"]]
+    assert "code_chunks" not in compact
+    assert all("hashes" not in entry for entry in compact["boundaries_json"])
+
+
+@pytest.mark.skipif(not HAS_MSGPACK, reason="msgpack is not installed")
+def test_analyze_zip_msgpack_round_trip(server_client):
+    import msgpack
+    as_json = analyze(server_client, {"hash_format": "b64"}).json()
+    response = analyze(server_client, {"hash_format": "b64"}, headers={"Accept": "application/msgpack, application/json;q=0.9"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content, raw=False)["hashes"] == as_json["hashes"]
+
+
+def test_analyze_zip_msgpack_unavailable(server_client, no_msgpack):
+    response = analyze(server_client, headers={"Accept": "application/msgpack"})
+    assert response.status_code == 200 and response.headers["content-type"] == "application/json"
+    assert analyze(server_client, {"response_format": "msgpack"}).status_code == 406
+    assert analyze(server_client, {"response_format": "xml"}).status_code == 400
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from fingerprint import PackedFingerprint
+from main import (
+    VISUALIZE_MATCH_THRESHOLD, calculate_advanced_score, calculate_advanced_scores, calculate_confidence_score,
+    calculate_score_matrix, hamming_distance, transform_numbers
+)
+
+
+def reference_score(fingerprints_a, code_chunks_a, fingerprints_b):
+    """The scalar loop calculate_advanced_score used before it was vectorised."""
+    reconstruction_scores = []
+    weights = []
+    candidate_score_matrix = []
+    for i, fp_a in enumerate(fingerprints_a):
+        weights.append(len(code_chunks_a[i]))
+        if not fingerprints_b:
+            reconstruction_scores.append(0.0)
+            continue
+        candidate_scores = [calculate_confidence_score(1.0 - (hamming_distance(fp_a, fp_b) / len(fp_a))) for fp_b in fingerprints_b]
+        candidate_score_matrix.append(candidate_scores)
+        reconstruction_scores.append(min(1.0, sum(candidate_scores)))
+
+    weighted_sum = sum(np.array(reconstruction_scores) * np.array(weights))
+    potential_matches = [
+        (score, i, j) for i, row in enumerate(candidate_score_matrix) for j, score in enumerate(row)
+        if score > VISUALIZE_MATCH_THRESHOLD
+    ]
+    potential_matches.sort(reverse=True, key=lambda x: x[0])
+    selected_matches, used_rows, used_cols = [], set(), set()
+    for score, row, col in potential_matches:
+        if row not in used_rows and col not in used_cols:
+            selected_matches.append((score, row, col))
+            used_rows.add(row)
+            used_cols.add(col)
+
+    final_score = transform_numbers(weighted_sum / sum(weights)) * 100
+    if final_score < 0.8:
+        selected_matches = []
+    return candidate_score_matrix, final_score, selected_matches
+
+
+def random_side(rng, count, nbits, base=None, mixed=False):
+    """Random fingerprints, or noisy copies of `base`; with `mixed` some have another length."""
+    fingerprints = []
+    for i in range(count):
+        if base is not None and i < len(base) and rng.random() < 0.7:
+            bits = base[i].to_bool_array() ^ (rng.random(len(base[i])) < rng.uniform(0, 0.3))
+        else:
+            bits = rng.random(nbits // 2 if mixed and rng.random() < 0.3 else nbits) < 0.5
+        fingerprints.append(PackedFingerprint.from_bool_array(bits))
+    return fingerprints
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_vectorised_scoring_matches_the_scalar_loop(seed):
+    rng = np.random.default_rng(seed)
+    nbits = int(rng.choice([16, 64, 256]))  # 16 bits gives plenty of tied scores
+    mixed = seed % 4 == 0
+    fingerprints_a = random_side(rng, int(rng.integers(1, 12)), nbits, mixed=mixed)
+    fingerprints_b = random_side(rng, int(rng.integers(0, 12)), nbits, base=fingerprints_a, mixed=mixed)
+    code_chunks_a = ["x" * int(rng.integers(1, 400)) for _ in fingerprints_a]
+
+    expected_matrix, expected_score, expected_matches = reference_score(fingerprints_a, code_chunks_a, fingerprints_b)
+    matrix = calculate_score_matrix(fingerprints_a, fingerprints_b)
+    score, matches = calculate_advanced_score(fingerprints_a, code_chunks_a, fingerprints_b, None)
+
+    if fingerprints_b:
+        assert matrix.tolist() == expected_matrix
+    assert score == expected_score
+    assert [(float(s), int(i), int(j)) for s, i, j in matches] == expected_matches
+
+    # The batched form splits one matrix per candidate and must agree too.
+    split = int(rng.integers(0, len(fingerprints_b) + 1))
+    candidates = [fingerprints_b[:split], fingerprints_b[split:]]
+    batched = calculate_advanced_scores(fingerprints_a, [len(chunk) for chunk in code_chunks_a], candidates)
+    for (batched_score, _), candidate in zip(batched, candidates):
+        assert batched_score == reference_score(fingerprints_a, code_chunks_a, candidate)[1]
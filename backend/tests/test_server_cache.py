@@ -0,0 +1,37 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import server
+
+
+@pytest.fixture
+def off_loop_calls(monkeypatch):
+    """Records, for each patched cache method, whether it ran outside the event loop."""
+    calls = {}
+
+    def record(name, method):
+        def wrapper(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                calls[name] = False
+            except RuntimeError:
+                calls[name] = True
+            return method(*args, **kwargs)
+        monkeypatch.setattr(server.pipeline_cache, name, wrapper)
+
+    record("stats", server.pipeline_cache.stats)
+    record("invalidate", server.pipeline_cache.invalidate)
+    return calls
+
+
+def test_cache_endpoints_run_off_the_event_loop(server_client, off_loop_calls):
+    server.pipeline_cache.put_embeddings([("k1", np.ones(4)), ("k2", np.zeros(4))], "old-prompt")
+
+    stats = server_client.get("/cache/stats/").json()
+    assert stats["entries"] >= 2 and stats["prompt_version"] == server.PROMPT_VERSION
+    assert server_client.post("/cache/invalidate/").json()["removed"] >= 2
+    assert server_client.get("/cache/stats/").json()["entries"] == 0
+
+    assert off_loop_calls == {"stats": True, "invalidate": True}
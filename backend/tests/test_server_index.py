@@ -0,0 +1,75 @@
+import hashlib
+import io
+import json
+import zipfile
+
+import pytest
+
+import server
+
+SOURCE = "def first(x):\n    return x * 2\n\ndef second(y):\n    return [y]\n"
+
+
+class EchoChain:
+    async def ainvoke(self, inputs: dict) -> str:
+        return f"pseudocode of {inputs.get('obfuscated_code') or inputs['obfuscated_functions']}"
+
+
+class HashEmbeddings:
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[1.0 if bit == "1" else -1.0 for bit in format(int(hashlib.sha256(text.encode()).hexdigest(), 16), "0256b")]
+                for text in texts]
+
+
+@pytest.fixture
+def local_models(monkeypatch):
+    monkeypatch.setattr(server, "get_models", lambda: (EchoChain(), HashEmbeddings()))
+
+
+def upload(client, path, engine="llm"):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("src/code.py", SOURCE)
+    return client.post(
+        path, params={"engine": engine, "hash_format": "b64"},
+        files={"zip_file": ("upload.zip", buffer.getvalue(), "application/zip")}
+    )
+
+
+def test_analysed_submissions_are_not_indexed_by_default(server_client, local_models):
+    body = upload(server_client, "/analyze-zip/").json()
+    assert body["indexed"] is False
+    assert body["submission_id"] not in server.fingerprint_index.submissions
+
+    # The manual step the endpoint documents.
+    registered = server_client.post("/index/register/", json={"submission_id": body["submission_id"], "hashes": body["hashes"]})
+    assert registered.json()["functions_added"] == 2
+    assert server.fingerprint_index.submissions[body["submission_id"]] == 2
+
+
+@pytest.mark.parametrize("path", ["/analyze-zip/", "/analyze-zip/stream/"])
+def test_auto_register_indexes_llm_submissions(server_client, local_models, monkeypatch, path):
+    monkeypatch.setattr(server, "INDEX_AUTO_REGISTER", True)
+    response = upload(server_client, path)
+    body = response.json() if path == "/analyze-zip/" else json.loads(response.text.splitlines()[-1])
+    assert body["indexed"] is True
+    assert server.fingerprint_index.submissions[body["submission_id"]] == 2
+
+    hits = server.fingerprint_index.search_many(body["hashes"], radius=0)
+    assert [{hit["submission_id"] for hit in function_hits} >= {body["submission_id"]} for function_hits in hits] == [True, True]
+
+
+def test_auto_register_skips_structural_submissions(server_client, monkeypatch):
+    monkeypatch.setattr(server, "INDEX_AUTO_REGISTER", True)
+    body = upload(server_client, "/analyze-zip/", engine="structural").json()
+    assert body["indexed"] is False
+    assert body["submission_id"] not in server.fingerprint_index.submissions
+
+
+def test_auto_register_from_a_queued_job(tmp_path, local_models, monkeypatch):
+    monkeypatch.setattr(server, "INDEX_AUTO_REGISTER", True)
+    with zipfile.ZipFile(tmp_path / server.JOB_ARCHIVE_NAME, "w") as zf:
+        zf.writestr("src/code.py", SOURCE)
+    result = server.run_analysis_job(str(tmp_path), {"engine": "llm", "hash_format": "b64", "filename": "upload.zip"})
+    assert result["indexed"] is True
+    assert server.fingerprint_index.submissions[result["submission_id"]] == 2
@@ -0,0 +1,69 @@
+import hashlib
+import io
+import json
+import zipfile
+
+import pytest
+
+import server
+
+# A function repeated across files exercises the fan-out of shared fingerprints.
+SOURCES = {
+    "a/util.py": "def helper(x):\n    return x + 1\n\ndef twice(x):\n    return x * 2\n",
+    "b/util.py": "def twice(x):\n    return x * 2\n",
+    "web/app.js": "function greet(name) { return 'hi ' + name; }\nconst add = (a, b) => a + b;\n",
+}
+
+
+class EchoChain:
+    async def ainvoke(self, inputs: dict) -> str:
+        return f"pseudocode of {inputs.get('obfuscated_code') or inputs['obfuscated_functions']}"
+
+
+class HashEmbeddings:
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[1.0 if bit == "1" else -1.0 for bit in format(int(hashlib.sha256(text.encode()).hexdigest(), 16), "0256b")]
+                for text in texts]
+
+
+def upload(client, path, engine):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name, content in SOURCES.items():
+            zf.writestr(name, content)
+    return client.post(
+        path, params={"engine": engine, "hash_format": "b64"},
+        files={"zip_file": ("upload.zip", buffer.getvalue(), "application/zip")}
+    )
+
+
+@pytest.mark.parametrize("engine", ["llm", "structural"])
+def test_stream_matches_the_blocking_endpoint(server_client, monkeypatch, engine):
+    monkeypatch.setattr(server, "get_models", lambda: (EchoChain(), HashEmbeddings()))
+
+    # Same cache state for both runs, so the reuse counters agree too.
+    server.pipeline_cache.invalidate()
+    expected = upload(server_client, "/analyze-zip/", engine).json()
+    server.pipeline_cache.invalidate()
+    response = upload(server_client, "/analyze-zip/stream/", engine)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [event["event"] for event in events[:1 + len(SOURCES)]] == ["started"] + ["boundaries"] * len(SOURCES)
+    assert events[0]["files"] == list(SOURCES)
+    summary = dict(events[-1])
+    assert summary.pop("event") == "summary"
+    # Only the id of the stored submission differs; its digest does not.
+    del summary["submission_id"], expected["submission_id"]
+    assert summary == expected
+
+    # Every function gets exactly one hash event, agreeing with the summary.
+    boundaries = {entry["filename"]: entry for entry in expected["boundaries_json"]}
+    assert [(e["filename"], e["boundaries"]) for e in events[1:1 + len(SOURCES)]] == [
+        (name, boundaries[name]["boundaries"]) for name in SOURCES
+    ]
+    hashes = [event for event in events if event["event"] == "hash"]
+    assert sorted(event["index"] for event in hashes) == list(range(len(expected["hashes"])))
+    for event in hashes:
+        assert event["fingerprint"] == expected["hashes"][event["index"]]
+        assert event["fingerprint"] == boundaries[event["filename"]]["hashes"][event["position"]]
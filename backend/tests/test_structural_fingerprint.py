@@ -0,0 +1,78 @@
+import hashlib
+
+from main import run_pipeline_for_files
+from structural_fingerprint import STRUCTURAL_FINGERPRINT_BITS, prefilter_candidates, structural_fingerprint, structural_fingerprints
+
+SUM = "def total(xs):\n    t = 0\n    for x in xs:\n        t += x\n    return t\n"
+SUM_RENAMED = "def add_all(values):\n    acc = 0\n    for v in values:\n        acc += v\n    return acc\n"
+SUM_JS = "function total(xs) { let t = 0; for (const x of xs) { t += x; } return t; }"
+SUM_JS_RENAMED = "function addAll(values) {\n  let acc = 0;\n  for (const v of values) {\n    acc += v;\n  }\n  return acc;\n}"
+UNRELATED = [
+    "def parse(text):\n    try:\n        data = json.loads(text)\n    except ValueError as e:\n        raise RuntimeError(str(e))\n    return {k: v for k, v in data.items() if v}\n",
+    "def read(path):\n    with open(path) as f:\n        return [line.strip().split(',') for line in f if line]\n",
+    "def biggest(a, b):\n    return a if a > b else b\n",
+]
+
+
+def test_identical_and_renamed_functions_collide():
+    assert structural_fingerprint(SUM) == structural_fingerprint(SUM)
+    assert structural_fingerprint(SUM) == structural_fingerprint(SUM_RENAMED)
+    assert structural_fingerprint(SUM_JS, "javascript") == structural_fingerprint(SUM_JS_RENAMED, "javascript")
+    assert len(structural_fingerprint(SUM)) == STRUCTURAL_FINGERPRINT_BITS
+
+
+def test_unrelated_functions_are_far_apart():
+    fingerprints = structural_fingerprints([SUM] + UNRELATED)
+    for i, first in enumerate(fingerprints):
+        for second in fingerprints[i + 1:]:
+            assert first.hamming(second) > STRUCTURAL_FINGERPRINT_BITS // 6
+
+
+def test_prefilter_candidates_marks_functions_with_a_neighbour():
+    queries = structural_fingerprints([SUM_RENAMED, UNRELATED[0]])
+    references = structural_fingerprints([SUM, UNRELATED[1]])
+    close_a, close_b = prefilter_candidates(queries, references, max_distance=16)
+    assert close_a.tolist() == [True, False]
+    assert close_b.tolist() == [True, False]
+    assert prefilter_candidates(queries, [], 16)[0].tolist() == [False, False]
+
+
+class RecordingChain:
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, inputs: dict) -> str:
+        code = inputs.get("obfuscated_code") or inputs["obfuscated_functions"]
+        self.prompts.append(code)
+        return f"pseudocode of {code}"
+
+
+class HashEmbeddings:
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[1.0 if bit == "1" else -1.0 for bit in format(int(hashlib.sha256(text.encode()).hexdigest(), 16), "0256b")]
+                for text in texts]
+
+
+def test_pipeline_prefilter_only_sends_close_functions_to_the_llm():
+    source = SUM_RENAMED + "\n" + UNRELATED[0]
+    chain = RecordingChain()
+    fingerprints, code_chunks, boundaries, stats = run_pipeline_for_files(
+        [("upload/code.py", source)], chain, HashEmbeddings(), return_stats=True,
+        prefilter=[structural_fingerprint(SUM).to_base64()]
+    )
+
+    assert len(fingerprints) == len(code_chunks) == 1
+    assert len(chain.prompts) == 1 and "for" in chain.prompts[0] and "json" not in chain.prompts[0]
+    assert stats["functions_prefiltered"] == 1 and stats["functions_failed"] == 0
+    assert stats["prefiltered_functions"] == [{"filename": "upload/code.py", "boundary": (7, 12)}]
+    assert [tuple(b) for b in boundaries["upload/code.py"]["boundaries"]] == [(1, 5)]
+
+
+def test_pipeline_prefilter_with_no_close_functions_skips_the_llm_entirely():
+    chain = RecordingChain()
+    fingerprints, _, _, stats = run_pipeline_for_files(
+        [("upload/code.py", UNRELATED[0])], chain, HashEmbeddings(), return_stats=True,
+        prefilter=[structural_fingerprint(SUM)]
+    )
+    assert fingerprints == [] and chain.prompts == []
+    assert stats["functions_prefiltered"] == 1
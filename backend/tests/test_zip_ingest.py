@@ -0,0 +1,88 @@
+import io
+import zipfile
+
+import pytest
+
+from zip_ingest import ZipIngestError, ZipLimitError, is_ignored, read_zip_sources
+
+
+def make_zip(members: dict, compression=zipfile.ZIP_DEFLATED) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression) as zf:
+        for name, content in members.items():
+            zf.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+def test_reads_sources_in_archive_order():
+    archive = make_zip({"b/main.py": "def f():\n    pass\n", "a/app.js": "function g() {}", "README.md": "# hi"})
+    sources, report = read_zip_sources(archive)
+    assert sources == [("b/main.py", "def f():\n    pass\n"), ("a/app.js", "function g() {}")]
+    assert report["members"] == 3 and report["sources"] == 2 and report["unsupported"] == 1
+
+
+def test_identical_files_are_kept_once():
+    archive = make_zip({"a/util.py": "x = 1\n", "b/util.py": "x = 1\n", "c/util.py": "x = 2\n"})
+    sources, report = read_zip_sources(archive)
+    assert [name for name, _ in sources] == ["a/util.py", "c/util.py"]
+    assert report["duplicates"] == 1
+
+
+def test_ignored_members_are_reported():
+    archive = make_zip({
+        "src/app.py": "a = 1\n",
+        "node_modules/lib/index.js": "b = 2",
+        "project/.venv/lib/site-packages/pkg/mod.py": "c = 3\n",
+        "static/app.min.js": "d=4",
+        "__MACOSX/src/._app.py": "e = 5\n",
+    })
+    sources, report = read_zip_sources(archive)
+    assert [name for name, _ in sources] == ["src/app.py"]
+    assert report["ignored"] == 4
+    assert report["ignored_members"] == [
+        "node_modules/lib/index.js", "project/.venv/lib/site-packages/pkg/mod.py", "static/app.min.js", "__MACOSX/src/._app.py"
+    ]
+
+
+@pytest.mark.parametrize("name", ["build/steps.py", "dist/cli.py", "env/config.py", "vendor/client.js", "src/build.py"])
+def test_common_source_directory_names_are_not_ignored(name):
+    assert not is_ignored(name)
+
+
+def test_ignore_patterns_match_whole_path_components():
+    assert is_ignored("a/node_modules/b.js")
+    assert is_ignored("a\\__pycache__\\b.py")
+    assert not is_ignored("my_node_modules_notes/b.js")
+    assert is_ignored("lib/thing.js", ignore_patterns=("lib",))
+
+
+def test_per_member_limit():
+    archive = make_zip({"small.py": "a = 1\n", "big.py": "x" * 101})
+    with pytest.raises(ZipLimitError, match="big.py"):
+        read_zip_sources(archive, max_member_bytes=100)
+    archive.seek(0)
+    assert len(read_zip_sources(archive, max_member_bytes=101)[0]) == 2
+
+
+def test_total_uncompressed_limit():
+    # Highly compressible members: a few hundred bytes on disk, 3 x 1000 inflated.
+    archive = make_zip({f"m{i}.py": str(i) * 1000 for i in range(3)})
+    assert len(archive.getvalue()) < 1000
+    with pytest.raises(ZipLimitError, match="total limit"):
+        read_zip_sources(archive, max_total_bytes=2500)
+    archive.seek(0)
+    assert read_zip_sources(archive, max_total_bytes=3000)[1]["bytes_read"] == 3000
+
+
+def test_member_count_limit():
+    archive = make_zip({f"m{i}.txt": "" for i in range(6)})
+    with pytest.raises(ZipLimitError, match="6 files"):
+        read_zip_sources(archive, max_members=5)
+
+
+def test_invalid_and_empty_archives():
+    with pytest.raises(ZipIngestError, match="Invalid ZIP"):
+        read_zip_sources(io.BytesIO(b"not a zip"))
+    with pytest.raises(ZipIngestError, match="No Python or JavaScript"):
+        read_zip_sources(make_zip({"notes.txt": "hello"}))
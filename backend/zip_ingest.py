@@ -0,0 +1,106 @@
+import os
+import hashlib
+import fnmatch
+import zipfile
+
+# --- CONFIGURATION ---
+SUPPORTED_EXTENSIONS = ('.py', '.js')
+ZIP_MAX_MEMBER_BYTES = int(os.getenv("VERITAS_ZIP_MAX_MEMBER_BYTES", str(2 * 1024 ** 2)))
+ZIP_MAX_TOTAL_BYTES = int(os.getenv("VERITAS_ZIP_MAX_TOTAL_BYTES", str(64 * 1024 ** 2)))
+ZIP_MAX_MEMBERS = int(os.getenv("VERITAS_ZIP_MAX_MEMBERS", "20000"))
+# Matched against every directory name and the file name of a member path.
+# Only names that always mean installed dependencies, tooling or generated
+# bundles: common source directory names (build, dist, env, vendor) are not
+# skipped by default.
+ZIP_IGNORE_PATTERNS = tuple(
+    pattern.strip() for pattern in os.getenv(
+        "VERITAS_ZIP_IGNORE_PATTERNS",
+        "node_modules,bower_components,site-packages,dist-packages,.venv,"
+        "__pycache__,.git,.hg,.svn,__MACOSX,*.min.js,*.bundle.js"
+    ).split(",") if pattern.strip()
+)
+# Ignored member names listed in the ingest report, beyond which only the count grows.
+ZIP_REPORT_MAX_IGNORED = int(os.getenv("VERITAS_ZIP_REPORT_MAX_IGNORED", "100"))
+
+
+class ZipIngestError(ValueError):
+    """The archive is not a valid ZIP or holds no usable source files."""
+
+
+class ZipLimitError(ZipIngestError):
+    """The archive exceeds a size limit (per member or in total)."""
+
+
+def is_ignored(member_name: str, ignore_patterns: tuple = ZIP_IGNORE_PATTERNS) -> bool:
+    parts = [part for part in member_name.replace("\\", "/").split("/") if part]
+    return any(fnmatch.fnmatch(part, pattern) for part in parts for pattern in ignore_patterns)
+
+
+def read_zip_sources(
+    archive,
+    extensions: tuple = SUPPORTED_EXTENSIONS,
+    ignore_patterns: tuple = ZIP_IGNORE_PATTERNS,
+    max_member_bytes: int = ZIP_MAX_MEMBER_BYTES,
+    max_total_bytes: int = ZIP_MAX_TOTAL_BYTES,
+    max_members: int = ZIP_MAX_MEMBERS
+) -> tuple[list[tuple[str, str]], dict]:
+    """
+    Reads the source files of a ZIP archive (a path or a seekable binary file
+    object) straight from its central directory, without extracting anything
+    to disk.
+
+    Members are filtered by extension and ignore patterns before any data is
+    decompressed. Declared sizes are checked against the limits up front and
+    the actual decompressed size is checked again while reading, so a member
+    that lies about its size cannot inflate past the limit. Files with the
+    same content are kept once. Returns [(member name, text)] in archive
+    order and a report of what was read and skipped; the source files the
+    ignore patterns dropped are named in "ignored_members".
+    """
+    sources = []
+    seen_digests = set()
+    report = {"members": 0, "sources": 0, "ignored": 0, "unsupported": 0, "duplicates": 0, "bytes_read": 0, "ignored_members": []}
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            members = [info for info in zf.infolist() if not info.is_dir()]
+            report["members"] = len(members)
+            if len(members) > max_members:
+                raise ZipLimitError(f"Archive holds {len(members)} files, the limit is {max_members}")
+            for info in members:
+                if not info.filename.endswith(extensions):
+                    report["unsupported"] += 1
+                    continue
+                if is_ignored(info.filename, ignore_patterns):
+                    report["ignored"] += 1
+                    if len(report["ignored_members"]) < ZIP_REPORT_MAX_IGNORED:
+                        report["ignored_members"].append(info.filename)
+                    continue
+                if info.file_size > max_member_bytes:
+                    raise ZipLimitError(f"'{info.filename}' is {info.file_size} bytes, the per-file limit is {max_member_bytes}")
+                if report["bytes_read"] + info.file_size > max_total_bytes:
+                    raise ZipLimitError(f"Source files exceed the total limit of {max_total_bytes} bytes")
+
+                with zf.open(info) as member:
+                    data = member.read(max_member_bytes + 1)
+                if len(data) > max_member_bytes:
+                    raise ZipLimitError(f"'{info.filename}' inflates past the per-file limit of {max_member_bytes} bytes")
+                report["bytes_read"] += len(data)
+                if report["bytes_read"] > max_total_bytes:
+                    raise ZipLimitError(f"Source files exceed the total limit of {max_total_bytes} bytes")
+
+                digest = hashlib.sha256(data).digest()
+                if digest in seen_digests:
+                    report["duplicates"] += 1
+                    continue
+                seen_digests.add(digest)
+                sources.append((info.filename, data.decode("utf-8", errors="replace")))
+    except zipfile.BadZipFile:
+        raise ZipIngestError("Invalid ZIP file")
+    except (RuntimeError, NotImplementedError) as e:
+        # Encrypted members or unsupported compression methods.
+        raise ZipIngestError(f"Cannot read ZIP file: {e}")
+
+    if not sources:
+        raise ZipIngestError("No Python or JavaScript files found in ZIP")
+    report["sources"] = len(sources)
+    return sources, report